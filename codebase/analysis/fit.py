@@ -3,6 +3,8 @@ import importlib
 import inspect
 import os
 from collections import defaultdict
+from copy import deepcopy
+from functools import lru_cache
 
 import numpy as np
 import lmfit
@@ -10,8 +12,20 @@ from lmfit import minimize, Parameters
 
 from qcrew.codebase.analysis import fit_funcs
 
+# a warm-started live fit is considered diverged if its relative residual grows
+# by more than this factor with respect to the previous converged fit
+DIVERGENCE_FACTOR = 10
+
+# 2D fits with more points than this are first done on a subsampled grid
+COARSE_FIT_MAX_POINTS = 4096
+
 FIT_FUNCS = {}
 
+# fit funcs may define a direct `solve(xs, ys)` returning (values, stderrs)
+# it is the final answer if the module sets EXACT_SOLVE = True, else it is used
+# as the starting point of the nonlinear minimisation instead of the guess
+FAST_SOLVERS = {}
+
 for name in os.listdir(os.path.dirname(fit_funcs.__file__)):
     if name == "__init__.py" or not name.endswith(".py"):
         continue
@@ -21,18 +35,34 @@ for name in os.listdir(os.path.dirname(fit_funcs.__file__)):
     func = getattr(mod, "func")
     guess = getattr(mod, "guess")
     FIT_FUNCS[name] = func, guess
+    if hasattr(mod, "solve"):
+        FAST_SOLVERS[name] = mod.solve, getattr(mod, "EXACT_SOLVE", False)
 del name, mod, func, guess
 
 
-def eval_fit(fit_func, params, xs, ys=None):
+@lru_cache(maxsize=None)
+def get_func_args(fit_func):
+    return inspect.getargspec(fit_func)[0]
+
+
+def eval_fit(fit_func, params, xs, ys=None, out=None):
+    """
+    Evaluate fit_func with the given params. If an `out` array is given, the
+    result is written into it, in place if fit_func itself accepts `out`.
+    """
     if isinstance(fit_func, str):
         fit_func = FIT_FUNCS[fit_func][0]
-    func_args = inspect.getargspec(fit_func)[0]
+    func_args = get_func_args(fit_func)
     kwargs = {k: p.value for k, p in params.items()}
     kwargs["params"] = params
     kwargs["xs"] = xs
     kwargs["ys"] = ys
-    return fit_func(**{k: v for k, v in kwargs.items() if k in func_args})
+    kwargs["out"] = out
+    values = fit_func(**{k: v for k, v in kwargs.items() if k in func_args})
+    if out is not None and values is not out:
+        np.copyto(out, values)
+        return out
+    return values
 
 
 def params_from_guess(guess):
@@ -58,31 +88,67 @@ def get_guess(fit_func, xs, ys, zs=None):
     return params_from_guess(guess_fn(**guess_args))
 
 
+def params_from_solution(values, stderrs=None):
+    params = Parameters()
+    for name, value in values.items():
+        params.add(name, value)
+        if stderrs is not None:
+            params[name].stderr = stderrs[name]
+    return params
+
+
+def get_fast_init_guess(solve, guess_func, xs, ys):
+    """Guess dict with the values from the fast solver, keeping guess bounds."""
+    guess = guess_func(xs=xs, ys=ys)
+    solution = solve(xs, ys)
+    if solution is None:
+        return guess
+    for name, value in solution[0].items():
+        if not np.isfinite(value):
+            continue
+        if isinstance(guess.get(name), tuple):
+            init, min, max = guess[name]
+            if min != max and min <= value <= max:
+                guess[name] = value, min, max
+        else:
+            guess[name] = value
+    return guess
+
+
 def do_fit(
     fit_func, xs, ys, zs=None, guess_func=None, init_params=None, fixed_params=None
 ):
+    if zs is not None:
+        return do_fit_2d(
+            fit_func, xs, ys, zs, guess_func, init_params, fixed_params
+        )
+
+    solver = None  # fast path, only for builtin fit funcs with default guesses
     if isinstance(fit_func, str):
+        if guess_func is None and init_params is None:
+            solver = FAST_SOLVERS.get(fit_func)
         fit_func, _guess = FIT_FUNCS[fit_func]
         if guess_func is None:
             guess_func = _guess
-    if zs is None:
-        assert xs.ndim == 1
-        assert ys.ndim == 1
-        eval_args = dict(xs=xs)
-        guess_args = dict(xs=xs, ys=ys)
-        data = ys
-    else:
-        assert xs.ndim == 2
-        assert ys.ndim == 2
-        assert zs.ndim == 2
-        eval_args = dict(xs=xs, ys=ys)
-        guess_args = dict(xs=xs, ys=ys, zs=zs)
-        data = zs
+    assert xs.ndim == 1
+    assert ys.ndim == 1
+    eval_args = dict(xs=xs)
+    guess_args = dict(xs=xs, ys=ys)
+    data = ys
     if init_params is None and guess_func is None:
         raise ValueError(
             "If not using builtin fit function, must "
             "supply either a guess_func or init_params"
         )
+    if solver is not None:
+        solve, is_exact = solver
+        if is_exact and fixed_params is None:
+            solution = solve(xs, ys)
+            if solution is not None:
+                return params_from_solution(*solution)
+        init_params = params_from_guess(
+            get_fast_init_guess(solve, guess_func, xs, ys)
+        )
     if init_params is None:
         init_params = params_from_guess(guess_func(**guess_args))
 
@@ -101,6 +167,179 @@ def do_fit(
         return init_params
 
 
+def get_grids(xs, ys) -> tuple:
+    """
+    Coordinate grids for a 2D fit, such that zs[i, j] is sampled at
+    (xs_grid[i, j], ys_grid[i, j]) after broadcasting. 1D sweep axes become
+    sparse open grids of shape (len(xs), 1) and (1, len(ys)), which avoids
+    allocating full meshgrids. 2D grids are returned as they are.
+    """
+    if xs.ndim == 1 and ys.ndim == 1:
+        return xs[:, np.newaxis], ys[np.newaxis, :]
+    return xs, ys
+
+
+def do_fit_2d(
+    fit_func,
+    xs,
+    ys,
+    zs,
+    guess_func=None,
+    init_params=None,
+    fixed_params=None,
+    mask=None,
+    coarse_max_points=COARSE_FIT_MAX_POINTS,
+):
+    """
+    Fit zs sampled on a 2D grid given by xs and ys, which are either 1D sweep
+    axes or 2D coordinate grids. Coordinate grids are built once per fit, and
+    the model is evaluated into a preallocated buffer on every residual call.
+
+    `mask` is an optional boolean array of zs.shape selecting the points to fit.
+    Datasets larger than `coarse_max_points` are first fit on an evenly
+    subsampled grid, and the result is then polished at full resolution.
+    """
+    if isinstance(fit_func, str):
+        fit_func, _guess = FIT_FUNCS[fit_func]
+        if guess_func is None:
+            guess_func = _guess
+    if init_params is None and guess_func is None:
+        raise ValueError(
+            "If not using builtin fit function, must "
+            "supply either a guess_func or init_params"
+        )
+    if init_params is None:
+        init_params = params_from_guess(guess_func(xs=xs, ys=ys, zs=zs))
+
+    if fixed_params is not None:
+        for k, v in fixed_params.items():
+            init_params[k].value = v
+            init_params[k].vary = False
+
+    xs_grid, ys_grid = get_grids(xs, ys)
+    if np.broadcast(xs_grid, ys_grid).shape != zs.shape:
+        raise ValueError("Shape of zs does not match the xs and ys grids")
+
+    stride = int(np.ceil(np.sqrt(zs.size / coarse_max_points)))
+    if stride > 1:  # coarse stage on a subsampled grid
+        coarse = (slice(None, None, stride), slice(None, None, stride))
+        init_params = _minimize_2d(
+            fit_func,
+            init_params,
+            xs_grid[coarse],
+            ys_grid[coarse],
+            zs[coarse],
+            mask[coarse] if mask is not None else None,
+        )
+    return _minimize_2d(fit_func, init_params, xs_grid, ys_grid, zs, mask)
+
+
+def _minimize_2d(fit_func, init_params, xs_grid, ys_grid, zs, mask):
+    model = np.empty(zs.shape)  # reused by every residual evaluation
+    data = zs[mask] if mask is not None else zs.ravel()
+
+    def resids(params):
+        eval_fit(fit_func, params, xs_grid, ys_grid, out=model)
+        return data - (model[mask] if mask is not None else model.ravel())
+
+    result = minimize(resids, init_params)
+    return result.params
+
+
+class LiveFitter:
+    """
+    Stateful 1D fitter for live plotting, where the data changes only slightly
+    between successive calls as more repetitions are averaged.
+
+    Each fit is warm-started from the parameters of the previous converged fit.
+    The guess function is only used for the first fit and as a fallback when a
+    warm-started fit diverges. Refits are skipped altogether when the data has
+    moved by less than its standard error since the last fit.
+    """
+
+    def __init__(self, fit_func, guess_func=None, fixed_params=None):
+        self.fit_func = fit_func
+        self.guess_func = guess_func
+        self.fixed_params = fixed_params
+
+        self.params = None  # parameters of the last converged fit
+        self.num_fits = 0  # number of fits actually performed
+        self.num_skips = 0  # number of calls where the refit was skipped
+
+        self._xs = None  # data the last fit was performed on
+        self._ys = None
+        self._rel_resid = None  # relative residual of the last fit
+
+    def reset(self):
+        """Forget the last fit, the next call to fit() starts from the guess."""
+        self.params = None
+        self._xs, self._ys, self._rel_resid = None, None, None
+
+    def fit(self, xs, ys, err=None):
+        """
+        Fit the latest data and return the fit parameters. `err` is the current
+        standard error of ys, if it is None the rms residual of the last fit is
+        used as the noise estimate instead.
+        """
+        if self.params is not None and not self._has_changed(xs, ys, err):
+            self.num_skips += 1
+            return self.params
+
+        if self.params is None:
+            params, rel_resid = self._fit_from_guess(xs, ys)
+        else:
+            params = self._fit(xs, ys, init_params=deepcopy(self.params))
+            rel_resid = self._get_rel_resid(params, xs, ys)
+            if self._has_diverged(params, rel_resid):
+                guess_params, guess_rel_resid = self._fit_from_guess(xs, ys)
+                if guess_rel_resid < rel_resid or not np.isfinite(rel_resid):
+                    params, rel_resid = guess_params, guess_rel_resid
+
+        self.params = params
+        self._xs, self._ys, self._rel_resid = np.copy(xs), np.copy(ys), rel_resid
+        return params
+
+    def _fit(self, xs, ys, init_params=None):
+        self.num_fits += 1
+        return do_fit(
+            self.fit_func,
+            xs,
+            ys,
+            guess_func=self.guess_func,
+            init_params=init_params,
+            fixed_params=self.fixed_params,
+        )
+
+    def _fit_from_guess(self, xs, ys):
+        params = self._fit(xs, ys)
+        return params, self._get_rel_resid(params, xs, ys)
+
+    def _get_rel_resid(self, params, xs, ys):
+        # residual sum of squares normalised by the total sum of squares
+        resid = ys - eval_fit(self.fit_func, params, xs)
+        total = np.sum((ys - np.mean(ys)) ** 2)
+        return np.sum(resid ** 2) / total if total else np.sum(resid ** 2)
+
+    def _has_diverged(self, params, rel_resid):
+        if not all(np.isfinite(p.value) for p in params.values()):
+            return True
+        if not np.isfinite(rel_resid):
+            return True
+        return rel_resid > DIVERGENCE_FACTOR * max(self._rel_resid, np.finfo(float).eps)
+
+    def _has_changed(self, xs, ys, err):
+        if np.shape(xs) != np.shape(self._xs) or not np.allclose(xs, self._xs):
+            return True  # sweep points changed, always refit
+
+        if err is None:  # estimate noise from the residuals of the last fit
+            resid = self._ys - eval_fit(self.fit_func, self.params, self._xs)
+            err = np.sqrt(np.mean(resid ** 2))
+        err = np.where(np.asarray(err) > 0, err, np.finfo(float).eps)
+
+        # rms change of the data in units of its standard error
+        return np.sqrt(np.mean(((ys - self._ys) / err) ** 2)) >= 1
+
+
 def map_fit(results, dsname, fit_func, thresh=True, mean=True, fit_axis=0):
     ds = results[dsname]
     if thresh:
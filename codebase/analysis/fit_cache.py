@@ -0,0 +1,279 @@
+"""
+Opt-in memoisation layer around fit.do_fit() and fit.eval_fit().
+
+Analysis notebooks tend to re-run the same fits on the same saved datasets over
+and over. A FitCache returns the result of an identical earlier fit instantly.
+Fits are keyed on a content hash of the data (xs, ys, zs), the fit model, the
+guess function, the initial and the fixed parameters. The hash of the fit_funcs
+sources is part of every key, so editing a fit function invalidates all fits
+cached with the old version.
+
+Fit results are kept in an in-memory LRU cache, and optionally in an on-disk
+json store (e.g. next to the hdf5 data file) so they persist across sessions.
+The store is an LRU cache too, capped at disk_maxsize fits. It records the
+fit_funcs source hash its fits were made with and drops them all once the
+sources change, as they can never be hit again. New fits are written to disk in
+batches of WRITE_BATCH_SIZE, and the rest by flush(), which also runs when the
+cache is garbage collected or the interpreter exits. Evaluated fit curves are
+only cached in memory.
+
+Usage:
+    cache = FitCache.for_datafile(db.filename)
+    params = cache.do_fit("sine", xs, ys)
+    fit_ys = cache.eval_fit("sine", params, xs)
+"""
+from collections import OrderedDict
+from copy import deepcopy
+from pathlib import Path
+import atexit
+import hashlib
+import inspect
+import json
+import os
+import weakref
+
+import numpy as np
+from lmfit import Parameters
+
+from qcrew.codebase.analysis import fit, fit_funcs, solvers, spectral
+
+DEFAULT_MAXSIZE = 256  # max number of fit results held in memory
+DEFAULT_DISK_MAXSIZE = 4096  # max number of fit results held in the disk store
+WRITE_BATCH_SIZE = 16  # number of new fits after which the disk store is written
+DISK_STORE_SUFFIX = ".fitcache.json"  # appended to the data file name
+
+# changes to any of these sources invalidate all cached fits
+SOURCE_PATHS = [
+    Path(fit_funcs.__file__).parent,
+    Path(fit.__file__),
+    Path(solvers.__file__),
+    Path(spectral.__file__),
+]
+
+
+def _hash_source_paths() -> str:
+    """Content hash of all the python sources in SOURCE_PATHS."""
+    files = []
+    for path in SOURCE_PATHS:
+        files.extend(sorted(path.glob("*.py")) if path.is_dir() else [path])
+    # only re-read the sources if a file has been modified since the last call
+    stamp = tuple((str(f), os.stat(f).st_mtime_ns) for f in files)
+    if stamp != _hash_source_paths.stamp:
+        digest = hashlib.sha1()
+        for file in files:
+            digest.update(file.read_bytes())
+        _hash_source_paths.stamp = stamp
+        _hash_source_paths.digest = digest.hexdigest()
+    return _hash_source_paths.digest
+
+
+_hash_source_paths.stamp = None
+_hash_source_paths.digest = None
+
+
+def _hash_array(digest, array):
+    if array is None:
+        digest.update(b"none")
+        return
+    array = np.ascontiguousarray(array)
+    digest.update(str((array.dtype.str, array.shape)).encode())
+    digest.update(array.tobytes())
+
+
+def _hash_callable(digest, func):
+    if func is None or isinstance(func, str):
+        digest.update(str(func).encode())
+        return
+    digest.update(getattr(func, "__module__", "").encode())
+    digest.update(getattr(func, "__qualname__", repr(func)).encode())
+    try:
+        digest.update(inspect.getsource(func).encode())
+    except (OSError, TypeError):
+        pass  # source not available e.g. for functions defined in a shell
+
+
+def _hash_params(digest, params):
+    if params is None:
+        digest.update(b"none")
+    elif isinstance(params, Parameters):
+        digest.update(params.dumps(sort_keys=True).encode())
+    else:  # dict of fixed param values
+        digest.update(json.dumps(params, sort_keys=True, default=float).encode())
+
+
+class FitCache:
+    """
+    Memoises do_fit() and eval_fit(), which it exposes with the same signatures
+    as the fit module. Cached Parameters are copied on the way in and out, so
+    callers are free to modify the returned objects.
+    """
+
+    def __init__(
+        self, maxsize: int = DEFAULT_MAXSIZE, path=None,
+        disk_maxsize: int = DEFAULT_DISK_MAXSIZE,
+    ):
+        """
+        Args:
+            maxsize (int): max number of fit results held in memory.
+            path (str or Path): json file to persist fit results in, None to
+            keep them in memory only.
+            disk_maxsize (int): max number of fit results held in the json file.
+        """
+        self.maxsize = maxsize
+        self.disk_maxsize = disk_maxsize
+        self.path = Path(path) if path is not None else None
+        self.hits = 0
+        self.misses = 0
+
+        self._fits = OrderedDict()  # key -> Parameters, in LRU order
+        self._evals = OrderedDict()  # key -> np.ndarray, in LRU order
+        # key -> Parameters json string, in LRU order, for fits made with the
+        # fit_funcs sources of hash self._store_source_hash
+        for cache in list(_CACHES):  # so that this cache sees their unsaved fits
+            if self.path is not None and cache.path == self.path:
+                cache.flush()
+        self._store_source_hash, self._store = self._load_store()
+        self._num_unsaved = 0  # fits added to the store since it was last written
+        _CACHES.add(self)
+
+    @classmethod
+    def for_datafile(
+        cls, datafile, maxsize: int = DEFAULT_MAXSIZE,
+        disk_maxsize: int = DEFAULT_DISK_MAXSIZE,
+    ):
+        """Get a FitCache whose disk store lives next to the given data file."""
+        datafile = Path(datafile)
+        path = datafile.with_name(datafile.name + DISK_STORE_SUFFIX)
+        return cls(maxsize, path, disk_maxsize)
+
+    def do_fit(
+        self, fit_func, xs, ys, zs=None, guess_func=None, init_params=None,
+        fixed_params=None,
+    ):
+        key = self._get_fit_key(
+            fit_func, xs, ys, zs, guess_func, init_params, fixed_params
+        )
+
+        if key in self._fits:
+            self.hits += 1
+            self._fits.move_to_end(key)
+            return deepcopy(self._fits[key])
+
+        if key in self._store:
+            self.hits += 1
+            self._store.move_to_end(key)
+            params = Parameters().loads(self._store[key])
+            self._remember(self._fits, key, params)
+            return deepcopy(params)
+
+        self.misses += 1
+        if init_params is not None:  # do_fit() modifies init_params in place
+            init_params = deepcopy(init_params)
+        params = fit.do_fit(
+            fit_func, xs, ys, zs, guess_func, init_params, fixed_params
+        )
+        self._remember(self._fits, key, deepcopy(params))
+        if self.path is not None:
+            self._add_to_store(key, params.dumps())
+        return params
+
+    def eval_fit(self, fit_func, params, xs, ys=None):
+        digest = hashlib.sha1(b"eval")
+        digest.update(_hash_source_paths().encode())
+        _hash_callable(digest, fit_func)
+        _hash_params(digest, params)
+        _hash_array(digest, xs)
+        _hash_array(digest, ys)
+        key = digest.hexdigest()
+
+        if key in self._evals:
+            self.hits += 1
+            self._evals.move_to_end(key)
+            return np.copy(self._evals[key])
+
+        self.misses += 1
+        values = fit.eval_fit(fit_func, params, xs, ys)
+        self._remember(self._evals, key, np.copy(values))
+        return values
+
+    def flush(self):
+        """Write the fits not yet saved to the disk store."""
+        if self.path is not None and self._num_unsaved:
+            self._save_store()
+
+    def clear(self, disk: bool = False):
+        """Empty the in-memory cache, and also the disk store if disk is True."""
+        self._fits.clear()
+        self._evals.clear()
+        if disk:
+            self._store = OrderedDict()
+            self._num_unsaved = 0
+            if self.path is not None and self.path.exists():
+                self.path.unlink()
+
+    def __del__(self):
+        self.flush()
+
+    def _get_fit_key(
+        self, fit_func, xs, ys, zs, guess_func, init_params, fixed_params
+    ) -> str:
+        digest = hashlib.sha1(b"fit")
+        digest.update(_hash_source_paths().encode())
+        _hash_callable(digest, fit_func)
+        _hash_callable(digest, guess_func)
+        _hash_params(digest, init_params)
+        _hash_params(digest, fixed_params)
+        for array in (xs, ys, zs):
+            _hash_array(digest, array)
+        return digest.hexdigest()
+
+    def _remember(self, lru: OrderedDict, key: str, value, maxsize: int = None):
+        maxsize = self.maxsize if maxsize is None else maxsize
+        lru[key] = value
+        lru.move_to_end(key)
+        while len(lru) > maxsize:
+            lru.popitem(last=False)  # evict least recently used entry
+
+    def _add_to_store(self, key: str, params_json: str):
+        source_hash = _hash_source_paths()
+        if source_hash != self._store_source_hash:  # stored fits can't be hit again
+            self._store_source_hash = source_hash
+            self._store = OrderedDict()
+        self._remember(self._store, key, params_json, self.disk_maxsize)
+        self._num_unsaved += 1
+        if self._num_unsaved >= WRITE_BATCH_SIZE:
+            self._save_store()
+
+    def _load_store(self) -> tuple:
+        """(source hash, fits) of the disk store, fits are empty if they are stale."""
+        source_hash = _hash_source_paths()
+        if self.path is None or not self.path.exists():
+            return source_hash, OrderedDict()
+        try:
+            with self.path.open("r") as store_file:
+                store = json.load(store_file, object_pairs_hook=OrderedDict)
+        except ValueError:
+            print("Corrupt fit cache store at " + str(self.path) + ", ignoring it")
+            return source_hash, OrderedDict()
+        if store.get("source_hash") != source_hash:
+            return source_hash, OrderedDict()
+        return source_hash, store.get("fits", OrderedDict())
+
+    def _save_store(self):
+        store = {"source_hash": self._store_source_hash, "fits": self._store}
+        # write to a temporary file first so a crash never corrupts the store
+        temp_path = self.path.with_name(self.path.name + ".tmp")
+        with temp_path.open("w") as store_file:
+            json.dump(store, store_file)
+        os.replace(temp_path, self.path)
+        self._num_unsaved = 0
+
+
+# caches whose unsaved fits are written to disk when the interpreter exits
+_CACHES = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_caches():
+    for cache in list(_CACHES):
+        cache.flush()
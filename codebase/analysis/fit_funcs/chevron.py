@@ -1,9 +1,23 @@
 import numpy as np
 
-def func(xs, ys, x0, f0, ofs0,ofs1, amp, t0, alpha):
-
-    xv, yv = np.meshgrid(xs, ys, sparse=False, indexing='xy')
-    return ofs0+f0**2/(((xv.T-x0)/1e3)**2+f0**2) * (amp*np.sin(2*np.pi*(f0**2+((xv.T-x0)/1e3)**2)**alpha*(yv.T-t0))+ofs1)
+from qcrew.codebase.analysis import spectral
+
+def func(xs, ys, x0, f0, ofs0,ofs1, amp, t0, alpha, out=None):
+
+    if np.ndim(xs) == 1 and np.ndim(ys) == 1:  # sweep axes, use an open grid
+        xs, ys = xs[:, np.newaxis], ys[np.newaxis, :]
+    # detuning terms only vary along xs, evaluate them before broadcasting
+    dx2 = ((xs-x0)/1e3)**2
+    lorentz = f0**2/(dx2+f0**2)
+    rabi = 2*np.pi*(f0**2+dx2)**alpha
+    # full size terms are computed in place in the output buffer
+    out = np.multiply(rabi, ys-t0, out=out)
+    np.sin(out, out=out)
+    out *= amp
+    out += ofs1
+    out *= lorentz
+    out += ofs0
+    return out
 
 def guess(xs, ys, zs):
 
@@ -15,13 +29,12 @@ def guess(xs, ys, zs):
     x0 = xs[idx_max]
     ofs0 = np.min(zs[idx_min,:])
         
-    fs = np.fft.rfftfreq(len(xs), ys[1] - ys[0])
-    fft = np.fft.rfft(zx - np.mean(zx))[1:]
-    idx = np.argmax(abs(fft))+1
-    f0 = fs[idx]/2
+    f = spectral.get_dominant_freq(ys, zx)
+    _, phi, _ = spectral.fit_sine(ys, zx, f)
+    f0 = f/2
     ofs1 = np.mean(zs[idx_max,:]-ofs0)
     amp = np.std(zs[idx_max,:] - np.mean(zs[idx_max,:]))*2**0.5
-    t0 = -np.angle(fft[idx])*f0*1e3
+    t0 = -phi*f0*1e3
     alpha = 0.5
 
     return {
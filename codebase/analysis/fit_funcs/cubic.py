@@ -1,5 +1,9 @@
 import numpy as np
 
+from qcrew.codebase.analysis import solvers
+
+EXACT_SOLVE = True
+
 def func(xs, a=1, b=1, c=1, d=1):
     return a * xs**3 + b * xs**2 + c*xs + d
 
@@ -7,3 +11,9 @@ def guess(xs, ys):
     p = np.polyfit(xs, ys, 3)
     return dict(a=p[0], b=p[1], c=p[2], d=p[3])
 
+def solve(xs, ys):
+    p, perr = solvers.polyfit(xs, ys, 3)
+    return (
+        dict(a=p[0], b=p[1], c=p[2], d=p[3]),
+        dict(a=perr[0], b=perr[1], c=perr[2], d=perr[3]),
+    )
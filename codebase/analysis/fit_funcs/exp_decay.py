@@ -1,5 +1,7 @@
 import numpy as np
 
+from qcrew.codebase.analysis import solvers
+
 def func(xs, A=1, tau=1, ofs=0):
     return A * np.exp(-xs / tau)+ofs
 def guess(xs, ys):
@@ -12,5 +14,13 @@ def guess(xs, ys):
         ofs=yofs,
     )
 
+def solve(xs, ys):
+    # linearised estimate, refined by the nonlinear fit
+    estimate = solvers.exp_decay(xs, ys)
+    if estimate is None:
+        return None
+    A, tau, ofs = estimate
+    return dict(A=A, tau=tau, ofs=ofs), None
+
 TEST_RANGE = 0, 100
 TEST_PARAMS = dict(A=-5, tau=10)
@@ -1,5 +1,9 @@
 import numpy as np
 
+from qcrew.codebase.analysis import solvers
+
+EXACT_SOLVE = True
+
 def func(xs, a=1, b=1):
     return a * xs + b
 
@@ -7,3 +11,6 @@ def guess(xs, ys):
     p = np.polyfit(xs, ys, 1)
     return dict(a=p[0], b=p[1])
 
+def solve(xs, ys):
+    p, perr = solvers.polyfit(xs, ys, 1)
+    return dict(a=p[0], b=p[1]), dict(a=perr[0], b=perr[1])
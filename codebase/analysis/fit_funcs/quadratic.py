@@ -1,5 +1,9 @@
 import numpy as np
 
+from qcrew.codebase.analysis import solvers
+
+EXACT_SOLVE = True
+
 def func(xs, a=1, b=1, c=0):
     return a * xs**2 + b * xs + c
 
@@ -7,3 +11,6 @@ def guess(xs, ys):
     p = np.polyfit(xs, ys, 2)
     return dict(a=p[0], b=p[1], c=p[2])
 
+def solve(xs, ys):
+    p, perr = solvers.polyfit(xs, ys, 2)
+    return dict(a=p[0], b=p[1], c=p[2]), dict(a=perr[0], b=perr[1], c=perr[2])
@@ -0,0 +1,87 @@
+"""
+Direct (non-iterative) solvers for fit models that are linear in their
+parameters, or that can be linearised.
+
+These back the optional `solve(xs, ys)` functions of the fit_funcs modules.
+fit.do_fit() uses a solve() as the final answer for models flagged with
+EXACT_SOLVE = True, and as a high quality starting point for the nonlinear
+least squares minimisation otherwise.
+"""
+import numpy as np
+from numpy.polynomial import polynomial
+
+
+def polyfit(xs, ys, deg: int) -> tuple:
+    """
+    Least squares polynomial fit with standard errors.
+
+    The fit is done on xs mapped to [-1, 1] for numerical conditioning, and the
+    coefficients and their covariance are then mapped back to the xs domain.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: coefficients and their standard errors,
+        both ordered from the highest power to the constant term like np.polyfit.
+    """
+    xs, ys = np.asarray(xs, dtype=float), np.asarray(ys, dtype=float)
+    num_coeffs = deg + 1
+    center = (xs.max() + xs.min()) / 2
+    halfspan = (xs.max() - xs.min()) / 2 or 1.0
+    ts = (xs - center) / halfspan
+
+    design = np.vander(ts, num_coeffs, increasing=True)
+    coeffs, _, rank, _ = np.linalg.lstsq(design, ys, rcond=None)
+
+    dof = len(ys) - num_coeffs
+    if dof > 0 and rank == num_coeffs:
+        resid = ys - design @ coeffs
+        cov = np.sum(resid ** 2) / dof * np.linalg.inv(design.T @ design)
+    else:  # exactly determined or degenerate, no error estimate available
+        cov = np.full((num_coeffs, num_coeffs), np.nan)
+
+    # coefficients in xs are a linear map of the coefficients in ts
+    # column i of the map holds the xs coefficients of the ts basis poly ts**i
+    basis_map = np.zeros((num_coeffs, num_coeffs))
+    shift = polynomial.Polynomial([-center / halfspan, 1 / halfspan])
+    for i in range(num_coeffs):
+        coef = (shift ** i).coef
+        basis_map[: len(coef), i] = coef
+    coeffs = basis_map @ coeffs
+    stderrs = np.sqrt(np.abs(np.diag(basis_map @ cov @ basis_map.T)))
+
+    return coeffs[::-1], stderrs[::-1]
+
+
+def exp_decay(xs, ys) -> tuple:
+    """
+    Non-iterative estimate of ys = amp * exp(-xs / tau) + ofs.
+
+    Uses successive integration: integrating the model's differential equation
+    gives ys = c0 + c1 * xs - (1 / tau) * cumulative_integral(ys), which is
+    linear in (c0, c1, 1 / tau). Unlike Prony's method, this works for non-
+    uniformly spaced xs and is robust to noise because integration averages it
+    out. Once tau is known, amp and ofs follow from linear least squares.
+
+    Returns:
+        tuple[float, float, float] | None: (amp, tau, ofs), or None if the data
+        does not look like an exponential (e.g. too few points, no decay).
+    """
+    xs, ys = np.asarray(xs, dtype=float), np.asarray(ys, dtype=float)
+    if len(xs) < 4:
+        return None
+
+    order = np.argsort(xs)
+    xs_, ys_ = xs[order], ys[order]
+    integral = np.concatenate(
+        ([0.0], np.cumsum(np.diff(xs_) * (ys_[1:] + ys_[:-1]) / 2))
+    )
+    design = np.column_stack((np.ones_like(xs_), xs_ - xs_[0], integral))
+    (_, _, slope), *_ = np.linalg.lstsq(design, ys_, rcond=None)
+    if not np.isfinite(slope) or slope == 0:
+        return None
+    tau = -1 / slope
+
+    design = np.column_stack((np.exp(-xs / tau), np.ones_like(xs)))
+    (amp, ofs), *_ = np.linalg.lstsq(design, ys, rcond=None)
+    if not np.all(np.isfinite((amp, ofs))):
+        return None
+    return amp, tau, ofs
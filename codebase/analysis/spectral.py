@@ -0,0 +1,139 @@
+"""
+Spectral guess engine for the sine family of fit funcs (sine, exp_decay_sine,
+chevron, ...).
+
+The dominant frequency is first located on a coarse spectrum. For uniformly
+spaced sweep points, this is a zero-padded rfft whose frequency grids are
+cached per (length, spacing). Otherwise, it is a Lomb-Scargle periodogram, and
+this fallback also covers e.g. sweeps with a nonlinear time axis. The peak is
+then refined to sub-bin accuracy with a least squares sine periodogram
+evaluated around it, followed by parabolic peak interpolation. Amplitude, phase
+and offset at that frequency follow from linear least squares, so they match
+the `ofs + amp * sin(2*pi*f0*xs + phi)` convention of the fit funcs exactly.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+PAD_FACTOR = 8  # zero-padding factor for the coarse spectrum
+UNIFORM_RTOL = 1e-3  # max relative deviation of spacings for a uniform sweep
+NUM_REFINE_POINTS = 21  # periodogram points evaluated to refine the peak
+MAX_PERIODOGRAM_SIZE = 2 ** 22  # max elements of a vectorised periodogram
+
+
+@lru_cache(maxsize=64)
+def _get_rfft_freqs(num_fft: int, spacing: float) -> np.ndarray:
+    freqs = np.fft.rfftfreq(num_fft, spacing)
+    freqs.flags.writeable = False  # shared between callers
+    return freqs
+
+
+def is_uniform(xs) -> bool:
+    """True if xs are equally spaced (in either direction)."""
+    spacings = np.diff(xs)
+    if len(spacings) == 0 or spacings[0] == 0:
+        return False
+    return np.allclose(spacings, spacings[0], rtol=UNIFORM_RTOL, atol=0)
+
+
+def get_nyquist_freq(xs) -> float:
+    """Highest frequency resolvable by the sweep points xs."""
+    spacings = np.abs(np.diff(np.sort(xs)))
+    spacings = spacings[spacings > 0]
+    return 0.5 / np.median(spacings) if len(spacings) else 0.0
+
+
+def get_periodogram(xs, ys, freqs) -> np.ndarray:
+    """
+    Least squares (floating mean Lomb-Scargle) periodogram of ys sampled at xs.
+    This is the reduction in the residual sum of squares obtained by fitting
+    `a * sin(2*pi*f*xs) + b * cos(2*pi*f*xs) + c` at every frequency f in freqs.
+    """
+    xs = np.asarray(xs, dtype=float)
+    ys = np.asarray(ys, dtype=float) - np.mean(ys)
+    freqs = np.asarray(freqs, dtype=float)
+    chunk_size = max(1, MAX_PERIODOGRAM_SIZE // len(xs))
+    power = np.empty(len(freqs))
+    for start in range(0, len(freqs), chunk_size):
+        phases = 2 * np.pi * np.outer(freqs[start : start + chunk_size], xs)
+        sines, cosines = np.sin(phases), np.cos(phases)
+        sines -= sines.mean(axis=1, keepdims=True)
+        cosines -= cosines.mean(axis=1, keepdims=True)
+        ss = np.einsum("ij,ij->i", sines, sines)
+        cc = np.einsum("ij,ij->i", cosines, cosines)
+        sc = np.einsum("ij,ij->i", sines, cosines)
+        ys_ = sines @ ys
+        yc = cosines @ ys
+        det = ss * cc - sc ** 2
+        det = np.where(det > 0, det, np.inf)  # degenerate at f = 0
+        power[start : start + chunk_size] = (
+            cc * ys_ ** 2 - 2 * sc * ys_ * yc + ss * yc ** 2
+        ) / det
+    return power
+
+
+def _interpolate_peak(values, idx) -> float:
+    """Sub-bin offset of the peak at idx from a parabola through 3 points."""
+    if idx <= 0 or idx >= len(values) - 1:
+        return 0.0
+    left, center, right = values[idx - 1 : idx + 2]
+    curvature = left - 2 * center + right
+    return 0.5 * (left - right) / curvature if curvature < 0 else 0.0
+
+
+def _get_coarse_peak(xs, ys, pad_factor) -> tuple:
+    """Returns (peak frequency, bin width) of the coarse spectrum."""
+    span = np.max(xs) - np.min(xs)
+    num_fft = 1 << int(np.ceil(np.log2(pad_factor * len(xs))))
+
+    if is_uniform(xs):
+        freqs = _get_rfft_freqs(num_fft, abs(xs[1] - xs[0]))
+        spectrum = np.abs(np.fft.rfft(ys - np.mean(ys), num_fft))
+    else:
+        freqs = np.linspace(0, get_nyquist_freq(xs), num_fft // 2 + 1)
+        spectrum = get_periodogram(xs, ys, freqs)
+
+    idx = np.argmax(spectrum[1:]) + 1  # ignore dc
+    offset = _interpolate_peak(np.log(spectrum + np.finfo(float).tiny), idx)
+    return freqs[idx] + offset * freqs[1], 1 / span
+
+
+def get_dominant_freq(xs, ys, pad_factor: int = PAD_FACTOR) -> float:
+    """Frequency of the strongest oscillation in ys, with sub-bin accuracy."""
+    xs, ys = np.asarray(xs, dtype=float), np.asarray(ys, dtype=float)
+    if len(xs) < 4:
+        return 0.0
+
+    coarse_freq, bin_width = _get_coarse_peak(xs, ys, pad_factor)
+
+    # refine the coarse peak on a least squares periodogram around it
+    start = max(coarse_freq - bin_width / 2, 0.0)
+    freqs = np.linspace(start, coarse_freq + bin_width / 2, NUM_REFINE_POINTS)
+    power = get_periodogram(xs, ys, freqs)
+    idx = np.argmax(power)
+    return freqs[idx] + _interpolate_peak(power, idx) * (freqs[1] - freqs[0])
+
+
+def fit_sine(xs, ys, freq) -> tuple:
+    """
+    Linear least squares fit of `ofs + amp * sin(2*pi*freq*xs + phi)` at the
+    given freq. Returns (amp, phi, ofs), with amp >= 0 and phi in (-pi, pi].
+    """
+    phases = 2 * np.pi * freq * np.asarray(xs, dtype=float)
+    design = np.column_stack((np.sin(phases), np.cos(phases), np.ones_like(phases)))
+    (a, b, ofs), *_ = np.linalg.lstsq(design, ys, rcond=None)
+    return np.hypot(a, b), np.arctan2(b, a), ofs
+
+
+def get_sine_guess(xs, ys) -> dict:
+    """Guess dict for `ofs + amp * sin(2*pi*f0*xs + phi)` in fit funcs format."""
+    f0 = get_dominant_freq(xs, ys)
+    amp, phi, ofs = fit_sine(xs, ys, f0)
+    ymin, ymax = np.min(ys), np.max(ys)
+    fmax = get_nyquist_freq(xs)
+    return {
+        "f0": (np.clip(f0, 0, fmax), 0, fmax),
+        "ofs": (np.clip(ofs, ymin, ymax), ymin, ymax),
+        "amp": (np.clip(amp, 0, ymax - ymin), 0, ymax - ymin),
+        "phi": (phi, -2 * np.pi, 2 * np.pi),
+    }
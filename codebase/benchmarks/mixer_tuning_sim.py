@@ -0,0 +1,272 @@
+"""
+Mixer tuning benchmark on the simulated backends.
+
+A standalone reimplementation of the LO and sideband leakage minimisations of
+the coax_test MixerTuner, that is Nelder-Mead on the contrast of Sa124.power_at()
+over the noise floor and the ParaboloidTuner on the raw power, with the same
+defaults. It does not drive the MixerTuner itself, which needs a QM config and
+stage, so changes to the tuner's objectives or defaults must be mirrored here.
+The minimisations run against a simulated mixer with known offsets, and the
+benchmark reports the number of measurements, the wall time at the given sweep
+latency and how far the tuned offsets are from the true ones. It then tunes the
+LO and image leakage of two mixers one after the other and interleaved by a
+TuningScheduler, and compares the sweeps and time taken. Each sweep costs the
+sweep latency plus BIN_LATENCY per frequency bin, so wide sweeps are not free.
+Interleaving only pays off when the leakage tones of the mixers are close enough
+to share narrow sweeps, as for two mixers on neighbouring LOs. For mixers far
+apart every tone still needs its own sweep. Finally it drifts a tuned mixer and
+retunes it as the MixerTuner does a drifted calibration: from the stored offsets,
+with the stored bowl curvature and down to the stored leakage. Needs no hardware,
+the backends are selected before importing the drivers.
+
+Run with `python mixer_tuning_sim.py [sweep_latency_ms] [seed]`.
+"""
+
+import os
+import sys
+import time
+
+os.environ["QCREW_BACKEND"] = "simulated"  # must be set before importing drivers
+
+import numpy as np
+from scipy.optimize import minimize
+
+from qcrew.codebase.instruments.signal_hound import sa_api
+from qcrew.codebase.instruments.signal_hound.sa124 import Sa124
+from qcrew.codebase.instruments.simulated.landscape import (
+    LANDSCAPE,
+    SimulatedQM,
+    get_correction_matrix,
+)
+from qcrew.codebase.utils.paraboloid_tuner import ParaboloidTuner
+from qcrew.codebase.utils.tuning_scheduler import TuningScheduler
+
+SWEEP_LATENCY = 0.01  # in s, fixed cost of a SA124 sweep
+BIN_LATENCY = 5e-6  # in s, added cost per frequency bin of a sweep
+SEED = 0
+LO_FREQ = 7.2e9
+INT_FREQ = -50e6
+# mixers for the parallel tuning benchmark, (element, LO freq, IF)
+CLOSE_MIXERS = [("rr", LO_FREQ, INT_FREQ), ("rr2", LO_FREQ + 2e6, INT_FREQ - 1e6)]
+FAR_MIXERS = [("rr", LO_FREQ, INT_FREQ), ("qubit", 5.0e9, -60e6)]
+# drift of the mixer offsets between a tuning and a warm retuning
+DRIFT = {"DC": complex(0.003, -0.002), "G": 0.004, "P": -0.003}
+RBW = 50e3  # FINE_SWEEP_RBW of the MixerTuner
+
+# MixerTuner Nelder-Mead defaults
+INIT_SIMPLEX = np.array([[0.0, 0.0], [0.0, 0.1], [0.1, 0.0]])
+XATOL = 0.0001
+FATOL = 1
+MAXITER = 100
+
+# MixerTuner paraboloid tuner probe scales
+SCALES = {"LO": 0.1, "SB": 0.05}
+
+
+def add_random_mixer(seed: int, element="rr", lo_freq=LO_FREQ, int_freq=INT_FREQ):
+    rng = np.random.default_rng(seed)
+    i_offset, q_offset = rng.uniform(-0.03, 0.03, 2)
+    gain_offset, phase_offset = rng.uniform(-0.05, 0.05, 2)
+    return LANDSCAPE.add_mixer(
+        "mixer_" + element,
+        element=element,
+        lo_freq=lo_freq,
+        int_freq=int_freq,
+        i_offset=i_offset,
+        q_offset=q_offset,
+        gain_offset=gain_offset,
+        phase_offset=phase_offset,
+    )
+
+
+def nelder_mead(objective_fn, floor: float, scale: float) -> np.ndarray:
+    result = minimize(
+        lambda x: abs(objective_fn(x) - floor),  # contrast, as in MixerTuner
+        [0, 0],
+        method="Nelder-Mead",
+        options={"xatol": XATOL, "fatol": FATOL, "initial_simplex": INIT_SIMPLEX,
+                 "maxiter": MAXITER},  # fmt: skip
+    )
+    return result.x
+
+
+def paraboloid(objective_fn, floor: float, scale: float) -> np.ndarray:
+    tuner = ParaboloidTuner([0, 0], scale, floor=floor, xatol=XATOL, ftol=FATOL)
+    while not tuner.is_done:
+        offsets = tuner.ask()
+        tuner.tell(offsets, objective_fn(offsets))
+    return tuner.best[0]
+
+
+def get_lo_apply_fn(qm: SimulatedQM, mixer):
+    def apply_fn(offsets):
+        qm.set_output_dc_offset_by_element(mixer.element, "I", offsets[0])
+        qm.set_output_dc_offset_by_element(mixer.element, "Q", offsets[1])
+
+    return apply_fn
+
+
+def get_sb_apply_fn(qm: SimulatedQM, mixer):
+    def apply_fn(offsets):
+        correction = get_correction_matrix(offsets[0], offsets[1]).ravel()
+        qm.set_mixer_correction(mixer.name, mixer.int_freq, mixer.lo_freq, correction)
+
+    return apply_fn
+
+
+def get_lo_objective(sa: Sa124, qm: SimulatedQM, mixer):
+    apply_fn = get_lo_apply_fn(qm, mixer)
+
+    def objective_fn(offsets):
+        apply_fn(offsets)
+        return sa.power_at(mixer.lo_freq, RBW)
+
+    return objective_fn
+
+
+def get_sb_objective(sa: Sa124, qm: SimulatedQM, mixer):
+    apply_fn = get_sb_apply_fn(qm, mixer)
+
+    def objective_fn(offsets):
+        apply_fn(offsets)
+        return sa.power_at(mixer.lo_freq - mixer.int_freq, RBW)
+
+    return objective_fn
+
+
+def run_tuner(name: str, tune, sa: Sa124, qm: SimulatedQM, mixer, floor: float):
+    """Runs tune(objective_fn, floor, scale) for the LO and sideband, reports them."""
+    print(f"{name}:")
+    for kind, get_objective, truth in (
+        ("LO", get_lo_objective, (mixer.offsets["I"], mixer.offsets["Q"])),
+        ("SB", get_sb_objective, (mixer.offsets["G"], mixer.offsets["P"])),
+    ):
+        objective_fn = get_objective(sa, qm, mixer)
+        num_sweeps = sa_api.salib.num_sweeps
+        start_time = time.perf_counter()
+        offsets = tune(objective_fn, floor, SCALES[kind])
+        elapsed_time = time.perf_counter() - start_time
+        num_measurements = sa_api.salib.num_sweeps - num_sweeps
+        leakage = objective_fn(offsets)
+        print(
+            f"  {kind}: {num_measurements:4} measurements, {elapsed_time:6.2f}s, "
+            f"leakage {leakage:7.2f}dBm, offsets {np.round(offsets, 5)}, "
+            f"true {np.round(truth, 5)}"
+        )
+
+
+def run(sweep_latency: float = SWEEP_LATENCY, seed: int = SEED, tuners: dict = None):
+    """Tunes the same simulated mixer with each tuner."""
+    if tuners is None:
+        tuners = {"Nelder-Mead": nelder_mead, "paraboloid": paraboloid}
+    sa = Sa124(name="sa", serial_number=1)
+    sa_api.salib.sweep_latency = sweep_latency
+    sa_api.salib.bin_latency = BIN_LATENCY
+    qm = SimulatedQM(LANDSCAPE)
+    for name, tune in tuners.items():
+        LANDSCAPE.mixers.clear()
+        mixer = add_random_mixer(seed)
+        job = qm.execute()
+        freqs, amps = sa.sweep(center=LO_FREQ, span=LO_FREQ * 1e-3, rbw=RBW)
+        run_tuner(name, tune, sa, qm, mixer, floor=np.mean(amps))
+        job.halt()
+    run_parallel(sa, qm, seed, CLOSE_MIXERS, "on neighbouring LOs")
+    run_parallel(sa, qm, seed, FAR_MIXERS, "far apart")
+    run_warm_start(sa, qm, seed)
+    sa.disconnect()
+
+
+def run_parallel(sa: Sa124, qm: SimulatedQM, seed: int, specs: list, label: str):
+    """
+    Tunes the mixers given as (element, LO freq, IF) one after the other, then
+    interleaved, with the paraboloid tuner.
+    """
+    LANDSCAPE.mixers.clear()
+    mixers = [
+        add_random_mixer(seed + index, element, lo_freq, int_freq)
+        for index, (element, lo_freq, int_freq) in enumerate(specs)
+    ]
+    job = qm.execute()
+    floor = np.mean(sa.sweep(center=LO_FREQ, span=LO_FREQ * 1e-3, rbw=RBW)[1])
+
+    print(f"Two mixers {label}, LO and SB:")
+    num_sweeps = sa_api.salib.num_sweeps
+    start_time = time.perf_counter()
+    for mixer in mixers:
+        for kind, get_objective in (("LO", get_lo_objective), ("SB", get_sb_objective)):
+            paraboloid(get_objective(sa, qm, mixer), floor, SCALES[kind])
+    elapsed_time = time.perf_counter() - start_time
+    num_measurements = sa_api.salib.num_sweeps - num_sweeps
+    print(f"  one after the other: {num_measurements:4} sweeps, {elapsed_time:6.2f}s")
+
+    scheduler = TuningScheduler(sa, RBW)
+    for mixer in mixers:
+        for kind, freq, apply_fn in (
+            ("LO", mixer.lo_freq, get_lo_apply_fn(qm, mixer)),
+            ("SB", mixer.lo_freq - mixer.int_freq, get_sb_apply_fn(qm, mixer)),
+        ):
+            tuner = ParaboloidTuner(
+                [0, 0], SCALES[kind], floor=floor, xatol=XATOL, ftol=FATOL
+            )
+            scheduler.add(mixer.element + " " + kind, tuner, freq, apply_fn)
+    start_time = time.perf_counter()
+    results = scheduler.run()
+    elapsed_time = time.perf_counter() - start_time
+    print(
+        f"  interleaved:         {scheduler.num_sweeps:4} sweeps, "
+        f"{elapsed_time:6.2f}s, {scheduler.num_rounds} rounds"
+    )
+    for name, (offsets, power) in results.items():
+        print(f"    {name}: leakage {power:7.2f}dBm")
+    job.halt()
+
+
+def run_warm_start(sa: Sa124, qm: SimulatedQM, seed: int):
+    """
+    Tunes a mixer with the paraboloid tuner, drifts it and retunes it from the
+    previous results, as the MixerTuner retunes a drifted stored calibration.
+    """
+    LANDSCAPE.mixers.clear()
+    mixer = add_random_mixer(seed)
+    job = qm.execute()
+    floor = np.mean(sa.sweep(center=LO_FREQ, span=LO_FREQ * 1e-3, rbw=RBW)[1])
+    objectives = {
+        "LO": get_lo_objective(sa, qm, mixer),
+        "SB": get_sb_objective(sa, qm, mixer),
+    }
+
+    print("Retuning a drifted mixer, LO and SB:")
+    calibrations = {}  # kind: (offsets, leakage, hessian), as in the store
+    for label in ("cold start", "warm start"):
+        num_sweeps = sa_api.salib.num_sweeps
+        for kind, objective_fn in objectives.items():
+            if kind in calibrations:
+                offsets, leakage, hessian = calibrations[kind]
+                # the MixerTuner drift check measures the stored offsets first
+                tuner = ParaboloidTuner(
+                    offsets, SCALES[kind], floor=max(floor, leakage), xatol=XATOL,
+                    ftol=FATOL, hessian=hessian,
+                )  # fmt: skip
+                tuner.tell(offsets, objective_fn(offsets))
+            else:
+                tuner = ParaboloidTuner(
+                    [0, 0], SCALES[kind], floor=floor, xatol=XATOL, ftol=FATOL
+                )
+            while not tuner.is_done:
+                offsets = tuner.ask()
+                tuner.tell(offsets, objective_fn(offsets))
+            calibrations[kind] = (*tuner.best, tuner.hessian)
+        num_measurements = sa_api.salib.num_sweeps - num_sweeps
+        leakages = ", ".join(
+            f"{kind} {leakage:7.2f}dBm" for kind, (_, leakage, _) in calibrations.items()
+        )
+        print(f"  {label}: {num_measurements:4} measurements, leakage {leakages}")
+        mixer.dc_offset += DRIFT["DC"]
+        mixer.offsets["G"] += DRIFT["G"]
+        mixer.offsets["P"] += DRIFT["P"]
+    job.halt()
+
+
+if __name__ == "__main__":
+    latency = float(sys.argv[1]) / 1e3 if len(sys.argv) > 1 else SWEEP_LATENCY
+    run(latency, int(sys.argv[2]) if len(sys.argv) > 2 else SEED)
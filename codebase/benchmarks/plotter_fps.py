@@ -0,0 +1,76 @@
+"""
+Live plotting frames per second benchmark.
+
+Compares the immediate mode refresh (clear the axis and redraw everything) with
+the retained mode refresh of Plotter.live_plot(), with and without blitting. A
+frame is one live_plot() call on a noisy sweep with errorbars and a sine fit,
+plus rendering the figure to an Agg canvas, which is what the IPython display
+or the GUI window does with it.
+
+Run with `python plotter_fps.py [num_points] [num_frames]`.
+"""
+import sys
+import time
+
+import matplotlib
+
+matplotlib.use("Agg")  # render off screen so the benchmark runs headless
+
+import numpy as np
+
+from qcrew.codebase.utils.plotter import Plotter
+
+NUM_POINTS = 1000
+NUM_FRAMES = 50
+
+
+class CanvasDisplay:
+    """Stand-in for the IPython display handle that renders the figure to its canvas."""
+
+    def update(self, fig):
+        fig.canvas.draw()
+
+
+class BlittingPlotter(Plotter):
+    """Plotter that blits to its Agg canvas as it would to a GUI window."""
+
+    @property
+    def can_blit(self) -> bool:
+        return True
+
+
+def get_frames(num_points: int, num_frames: int):
+    """Yields (xs, ys, err, n) of a sine averaged over more and more repetitions."""
+    rng = np.random.default_rng(seed=0)
+    xs = np.linspace(0, 10, num_points)
+    signal = 0.5 + 0.3 * np.sin(2 * np.pi * 0.25 * xs + 0.4)
+    total = np.zeros(num_points)
+    for n in range(1, num_frames + 1):
+        total += signal + rng.normal(0, 0.3, num_points)
+        err = np.full(num_points, 0.3 / np.sqrt(n))
+        yield xs, total / n, err, n
+
+
+def get_fps(plotter: Plotter, num_points: int, num_frames: int, fit_fn) -> float:
+    plotter.hdisplay = CanvasDisplay()
+    start_time = time.perf_counter()
+    for xs, ys, err, n in get_frames(num_points, num_frames):
+        plotter.live_plot(xs, ys, n, fit_fn=fit_fn, err=err)
+    return num_frames / (time.perf_counter() - start_time)
+
+
+def run(num_points: int = NUM_POINTS, num_frames: int = NUM_FRAMES):
+    plotters = {
+        "redraw": lambda: Plotter("Benchmark", "x", retained=False),
+        "retained": lambda: Plotter("Benchmark", "x"),
+        "retained + blit": lambda: BlittingPlotter("Benchmark", "x"),
+    }
+    print(f"{num_points} points with errorbars, {num_frames} frames")
+    for fit_fn in (None, "sine"):
+        for name, get_plotter in plotters.items():
+            fps = get_fps(get_plotter(), num_points, num_frames, fit_fn)
+            print(f"{name:>16} (fit = {fit_fn}): {fps:7.1f} frames per second")
+
+
+if __name__ == "__main__":
+    run(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,110 @@
+"""
+Sa124.sweep() overhead benchmark.
+
+Measures the host side cost per sweep, that is everything except the time the
+device spends sweeping, by running the driver against a stub sa_api DLL that
+returns instantly. Compares the current sweep(), which reuses the sweep info,
+frequency axis and amplitude buffers of the sweep configuration and returns
+copies of them, and the zero-copy sweep_view() with the previous
+implementation, which queried the sweep info, built the frequency axis in a
+Python list comprehension and allocated new buffers on every sweep.
+
+Run with `python sa124_sweep.py [sweep_length] [num_sweeps]`.
+"""
+from ctypes import c_int
+from unittest import mock
+import sys
+import time
+
+import numpy as np
+
+SWEEP_LENGTH = 4096  # number of frequency bins, ~ fine mixer tuner sweep
+NUM_SWEEPS = 1000
+SERIAL_NUMBER = 12345678
+
+
+class StubFunction:
+    """Stands in for a DLL function, accepts argtypes and restype like one."""
+
+    def __init__(self, call=None):
+        self.argtypes = None
+        self.restype = c_int
+        self._call = call
+
+    def __call__(self, *args):
+        return self._call(*args) if self._call is not None else 0  # status ok
+
+
+class StubLibrary:
+    """Stands in for the sa_api and LabBrick DLLs, every call returns instantly."""
+
+    def __init__(self, path, sweep_length: int = SWEEP_LENGTH):
+        self.sweep_length = sweep_length
+        self.saQuerySweepInfo = StubFunction(self._query_sweep_info)
+        self.saGetSweep_64f = StubFunction(self._get_sweep)
+
+    def __getattr__(self, name):
+        function = StubFunction()
+        setattr(self, name, function)
+        return function
+
+    def _query_sweep_info(self, device, sweep_length, start_freq, bin_size):
+        # arguments are byref() pointers, the pointed to objects are in _obj
+        sweep_length._obj.value = self.sweep_length
+        start_freq._obj.value = 5e9
+        bin_size._obj.value = 1e3
+        return 0
+
+    def _get_sweep(self, device, sweep_min, sweep_max):
+        sweep_min.fill(-90.0)
+        sweep_max.fill(-90.0)
+        return 0
+
+
+def legacy_sweep(sa, sa_api):
+    """Sa124.sweep() as it was before sweep buffers were reused."""
+    sweep_info = sa_api.sa_query_sweep_info(sa._device_handle)
+    frequencies = [
+        sweep_info["start_freq"] + i * sweep_info["bin_size"]
+        for i in range(sweep_info["sweep_length"])
+    ]
+    amplitudes = sa_api.sa_get_sweep_64f(sa._device_handle)["max"]
+    return (np.array(frequencies), np.array(amplitudes))
+
+
+def get_time_per_sweep(sweep, num_sweeps: int) -> float:
+    start_time = time.perf_counter()
+    for _ in range(num_sweeps):
+        sweep()
+    return (time.perf_counter() - start_time) / num_sweeps
+
+
+def run(sweep_length: int = SWEEP_LENGTH, num_sweeps: int = NUM_SWEEPS):
+    with mock.patch("ctypes.CDLL", StubLibrary):
+        from qcrew.codebase.instruments.signal_hound import sa_api
+        from qcrew.codebase.instruments.signal_hound.sa124 import Sa124
+
+    if not isinstance(sa_api.salib, StubLibrary):
+        raise RuntimeError("sa_api was already loaded, run in a fresh process")
+    sa_api.salib.sweep_length = sweep_length
+
+    sa = Sa124(name="sa", serial_number=SERIAL_NUMBER)
+    new_freqs, _ = sa.sweep()
+    old_freqs, _ = legacy_sweep(sa, sa_api)
+    if not np.array_equal(new_freqs, old_freqs):
+        raise RuntimeError("Sweep frequencies differ from the legacy sweep")
+
+    legacy_time = get_time_per_sweep(lambda: legacy_sweep(sa, sa_api), num_sweeps)
+    current_time = get_time_per_sweep(sa.sweep, num_sweeps)
+    view_time = get_time_per_sweep(sa.sweep_view, num_sweeps)
+    sa.disconnect()
+
+    print(f"{sweep_length} bins, {num_sweeps} sweeps, host overhead per sweep:")
+    print(f"  legacy sweep(): {legacy_time * 1e6:9.1f} us")
+    print(f"  sweep():        {current_time * 1e6:9.1f} us")
+    print(f"  sweep_view():   {view_time * 1e6:9.1f} us")
+    print(f"  speedup:        {legacy_time / current_time:9.1f}x")
+
+
+if __name__ == "__main__":
+    run(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,101 @@
+"""
+Arbitrary waveform compression benchmark.
+
+Compresses the long arbitrary waveforms used in this repo, and a few other
+smooth envelopes, with pulselib.compress_samples() at the config builder's
+DEFAULT_MAX_ALLOWED_ERROR. Reports the stored samples, compression ratio, error
+and time taken for each. Each compressed waveform is played back independently of
+pulselib, stored sample i at i * k ns, linearly interpolated in between and the
+last one held until the end of the pulse, and the played waveform is checked to be
+within the error bound of the original. The waveforms the builder compresses (at
+least MIN_COMPRESSION_LENGTH samples) are also checked to reach the ratios
+expected of them.
+
+Truncated gaussians compress little: the last stored sample is held over the final
+k - 1 ns, where the edge of the gaussian is steep.
+
+Run with `python waveform_compression.py`.
+"""
+
+import time
+
+import numpy as np
+
+from qcrew.codebase.instruments.quantum_machines.qm_config_builder import (
+    DEFAULT_MAX_ALLOWED_ERROR,
+    MIN_COMPRESSION_LENGTH,
+)
+from qcrew.codebase.utils import pulselib
+
+# (name, func, func params, min expected ratio)
+WAVEFORMS = [
+    ("DEFAULT_GAUSS_WF", "gauss_fn", pulselib.DEFAULT_GAUSS_WF.func_params, 2),
+    (
+        "gauss 0.25 2000 4",
+        "gauss_fn",
+        dict(max_amp=0.25, sigma=2000, multiple_of_sigma=4),
+        5,
+    ),
+    (
+        "gauss 0.4 1000 4",
+        "gauss_fn",
+        dict(max_amp=0.4, sigma=1000, multiple_of_sigma=4),
+        2,
+    ),
+    ("cosine 0.25 2000", "cosine_fn", dict(max_amp=0.25, length=2000), 16),
+    (
+        "flat top gauss",
+        "flat_top_gauss_fn",
+        dict(max_amp=0.25, flat_length=2000, sigma=100, multiple_of_sigma=4),
+        1,
+    ),
+    # sample_B qubit pi pulse and its DRAG quadrature, too short to be compressed
+    ("gauss pi", "gauss_fn", dict(max_amp=0.45, sigma=125, multiple_of_sigma=4), 1),
+    (
+        "drag pi",
+        "drag_fn",
+        dict(max_amp=0.45, sigma=125, multiple_of_sigma=4, drag=47),
+        1,
+    ),
+]
+
+
+def play(stored, decimation: int, num_samples: int) -> np.ndarray:
+    """The waveform at 1 GS/s the OPX plays from samples stored every decimation ns."""
+    played = np.zeros(num_samples)
+    for time_ in range(num_samples):
+        index, step = divmod(time_, decimation)
+        if index + 1 < len(stored):
+            fraction = step / decimation
+            start, stop = stored[index], stored[index + 1]
+            played[time_] = (1 - fraction) * start + fraction * stop
+        else:  # the last stored sample is held over the final partial step
+            played[time_] = stored[-1]
+    return played
+
+
+def run(max_error: float = DEFAULT_MAX_ALLOWED_ERROR):
+    print(f"max error {max_error}V:")
+    failures = list()
+    for name, func, func_params, min_ratio in WAVEFORMS:
+        samples = pulselib.func_map[func](**func_params)
+        start_time = time.perf_counter()
+        compressed = pulselib.compress_samples(samples, max_error)
+        elapsed_time = time.perf_counter() - start_time
+        played = play(compressed.samples, compressed.decimation, len(samples))
+        played_error = np.max(np.abs(played - samples))
+        print(
+            f"  {name:20} {len(samples):6} -> {len(compressed.samples):5} samples, "
+            f"ratio {compressed.ratio:5.1f}, played error {played_error:.2e}V, "
+            f"{elapsed_time * 1e3:6.2f} ms"
+        )
+        if played_error > max_error:
+            failures.append(f"{name} played error {played_error:.3g} > {max_error}")
+        if len(samples) >= MIN_COMPRESSION_LENGTH and compressed.ratio < min_ratio:
+            failures.append(f"{name} ratio {compressed.ratio:.4g} < {min_ratio}")
+    if failures:
+        raise RuntimeError("Compression below expectations: " + "; ".join(failures))
+
+
+if __name__ == "__main__":
+    run()
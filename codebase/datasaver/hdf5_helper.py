@@ -14,6 +14,8 @@ from pathlib import Path
 from typing import Union, Optional, Dict, List
 import logging
 
+from qcrew.codebase.datasaver.snapshot import SnapshotExporter
+
 log = logging.getLogger(__name__)
 ########################################
 #          helper function
@@ -567,25 +569,44 @@ def initialise_database(
 
 
 class DataSaver:
-    def __init__(self, database: h5py.File) -> None:
+    def __init__(
+        self, database: h5py.File, snapshot_interval: Optional[float] = None
+    ) -> None:
+        """
+        Arguments:
+            database (h5py.File): the hdf5 datafile to save to
+            snapshot_interval (float): if given, a png snapshot of the live plot is written next to the datafile every snapshot_interval seconds, see DataHandle.exporter
+        """
         self.db = database
+        self.exporter = None
+        if snapshot_interval is not None:
+            self.exporter = SnapshotExporter.for_datafile(
+                database.filename, snapshot_interval
+            )
 
     def __enter__(self) -> None:
         # check if the hdf5 file is open or not
         if not self.db.__bool__():
             self.db = h5py.File(self.db.filename, "a")
 
-        return DataHandle(database=self.db)
+        if self.exporter is not None:
+            self.exporter.start()
+        return DataHandle(database=self.db, exporter=self.exporter)
 
     def __exit__(self, type, value, traceback) -> None:
+        if self.exporter is not None:
+            self.exporter.stop()  # writes the final snapshot
         self.db.flush()
         self.db.close()
         print("The database hdf5 file is closed")
 
 
 class DataHandle:
-    def __init__(self, database: h5py.File):
+    def __init__(
+        self, database: h5py.File, exporter: Optional[SnapshotExporter] = None
+    ):
         self.db = database
+        self.exporter = exporter  # assign to plotter.exporter to get snapshots
 
     def update_result(self, name: str, data: np.ndarray, group: Optional[str]) -> None:
 
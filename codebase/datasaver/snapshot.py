@@ -0,0 +1,182 @@
+"""
+Headless PNG snapshots of live runs.
+
+A SnapshotExporter renders the latest live plot data to a PNG file next to the
+hdf5 data file at a fixed interval, so the progress of a run can be checked on
+headless lab PCs or from a file share. Rendering happens in a worker process
+with the Agg backend, so it never blocks the acquisition loop. The data is sent
+to the worker over a queue rather than read back from the hdf5 file, which the
+measurement process keeps open for writing.
+
+Usage:
+    with DataSaver(db, snapshot_interval=30) as datasaver:
+        plotter.exporter = datasaver.exporter
+        ...  # every plotter.live_plot() now also feeds the exporter
+"""
+from pathlib import Path
+import multiprocessing
+import os
+import queue
+import time
+
+import numpy as np
+
+DEFAULT_INTERVAL = 30.0  # seconds between snapshots
+SNAPSHOT_SUFFIX = ".png"  # replaces the data file suffix
+STOP_TIMEOUT = 30.0  # seconds to wait for the worker to write the last snapshot
+ARRAY_KEYS = ("x", "y", "err", "xs", "ys", "zs")  # snapshot data copied when sent
+
+
+class SnapshotExporter:
+    """
+    Sends the latest plot data to a worker process that writes it to a PNG at most once every `interval` seconds. Data submitted in between is coalesced on the sending side, so only the latest state is copied, pickled and sent. stop() sends the last submitted data and waits for it to be written, so the final snapshot shows the complete run.
+
+    Submitted arrays are only referenced until they are sent, when they are copied, so a snapshot shows their contents at the time it is sent.
+    """
+
+    def __init__(self, path, interval: float = DEFAULT_INTERVAL):
+        """
+        Args:
+            path (str or Path): png file to write the snapshots to.
+            interval (float): min time between snapshots in seconds.
+        """
+        self.path = Path(path)
+        self.interval = interval
+        self.num_submitted = 0  # number of snapshots submitted
+        self.num_sent = 0  # number of snapshots sent to the worker
+
+        self._latest = None  # latest snapshot not yet sent to the worker
+        self._last_send_time = -np.inf
+        self._queue = None
+        self._process = None
+
+    @classmethod
+    def for_datafile(cls, datafile, interval: float = DEFAULT_INTERVAL):
+        """Get a SnapshotExporter writing next to the given data file."""
+        return cls(Path(datafile).with_suffix(SNAPSHOT_SUFFIX), interval)
+
+    @property
+    def is_running(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    def start(self):
+        if self.is_running:
+            return
+        self._queue = multiprocessing.Queue()
+        self._process = multiprocessing.Process(
+            target=_export_snapshots, args=(self._queue, str(self.path)), daemon=True
+        )
+        self._process.start()
+
+    def stop(self, timeout: float = STOP_TIMEOUT):
+        """Writes the last submitted snapshot and shuts down the worker."""
+        if not self.is_running:
+            return
+        self._send()
+        self._queue.put(None)  # tells the worker to exit after rendering
+        self._process.join(timeout)
+        if self._process.is_alive():
+            print(f"Snapshot exporter did not stop in {timeout}s, terminating it")
+            self._process.terminate()
+        self._process = None
+
+    def submit_plot(self, title: str, xlabel: str, ylabel: str, x, y, err=None):
+        """Submits x-y data, with optional errorbars, for the next snapshot."""
+        self._submit(
+            kind="plot", title=title, xlabel=xlabel, ylabel=ylabel, x=x, y=y, err=err
+        )
+
+    def submit_heatmap(
+        self, title: str, xlabel: str, ylabel: str, zlabel: str, xs, ys, zs
+    ):
+        """Submits zs, with shape (len(ys), len(xs)), for the next snapshot."""
+        self._submit(
+            kind="heatmap", title=title, xlabel=xlabel, ylabel=ylabel,
+            zlabel=zlabel, xs=xs, ys=ys, zs=zs,
+        )
+
+    def _submit(self, **snapshot):
+        self._latest = snapshot
+        self.num_submitted += 1
+        if time.perf_counter() - self._last_send_time >= self.interval:
+            self._send()
+
+    def _send(self):
+        if self._latest is None or not self.is_running:
+            return
+        # the queue pickles in a background thread, copy before the caller moves on
+        snapshot = {
+            key: np.array(value) if key in ARRAY_KEYS and value is not None else value
+            for key, value in self._latest.items()
+        }
+        self._queue.put(snapshot)
+        self._latest = None
+        self._last_send_time = time.perf_counter()
+        self.num_sent += 1
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
+
+
+def _export_snapshots(snapshots: multiprocessing.Queue, path: str):
+    """Worker process loop, renders every snapshot received until it gets None."""
+    # imported here so the worker never touches the parent's pyplot backend
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    is_running = True
+    while is_running:
+        snapshot = snapshots.get()
+        # skip to the newest snapshot if the worker has fallen behind
+        while True:
+            try:
+                newer = snapshots.get_nowait()
+            except queue.Empty:
+                break
+            if newer is None:
+                is_running = False
+                break
+            snapshot = newer
+        if snapshot is None:
+            break
+
+        fig = Figure(figsize=(9, 6))
+        FigureCanvasAgg(fig)
+        try:
+            _render_snapshot(fig, snapshot)
+            _write_png(fig, path)
+        except Exception as e:  # a bad snapshot must not kill the exporter
+            print(f"Failed to write snapshot to {path}: {e}")
+
+
+def _render_snapshot(fig, snapshot: dict):
+    ax = fig.add_subplot(1, 1, 1)
+    if snapshot["kind"] == "heatmap":
+        xs, ys = snapshot["xs"], snapshot["ys"]
+        mesh = ax.pcolormesh(xs, ys, snapshot["zs"], shading="nearest")
+        fig.colorbar(mesh, ax=ax, label=snapshot["zlabel"])
+    elif snapshot["err"] is not None:
+        ax.errorbar(
+            snapshot["x"], snapshot["y"], yerr=snapshot["err"], ls="none", lw=1,
+            ecolor="b", marker="o", ms=4, mfc="b", mec="b", capsize=3,
+            fillstyle="none",
+        )
+    else:
+        ax.plot(snapshot["x"], snapshot["y"], color="b", lw=2)
+
+    ax.set_title(snapshot["title"])
+    ax.set_xlabel(snapshot["xlabel"])
+    ax.set_ylabel(snapshot["ylabel"])
+    stamp = time.strftime("%Y-%m-%d %H:%M:%S")
+    fig.text(0.99, 0.01, f"snapshot {stamp}", ha="right", va="bottom", fontsize=8)
+
+
+def _write_png(fig, path: str):
+    # write to a temporary file first so viewers never see a half written png
+    temp_path = path + ".tmp"
+    fig.savefig(temp_path, format="png")
+    os.replace(temp_path, path)
@@ -12,26 +12,46 @@ explicitly declared before defining public methods.
 
 Dc offsets are set to 0.0 and and mixer correction matrix is set to identity by
 default. These values are instead to be changed during mixer tuning via the QM
-API.
+API. If the element's mixer has a correction_table, as built by the mixer
+tuner's IF sweep, the mixer gets one correction entry per IF in the table, plus
+one at the element's IF, so that IF sweeps need no retuning.
+
+Waveforms with equal samples (same type, func and params) are deduplicated, the
+config holds their samples once and their pulses all refer to it. Samples are
+cached as numpy arrays by pulselib and only converted to python floats here.
+Arbitrary waveforms of at least MIN_COMPRESSION_LENGTH samples are stored at the
+lowest sampling rate that reproduces them within DEFAULT_MAX_ALLOWED_ERROR.
+Integration weights of all measurement pulses go into the config as segments.
+Weights that share a name but differ between pulses are named per pulse.
 
 Here's where this module is not comprehensive:
 1. No support for building digital_outputs in controllers config
 2. No support for building digitalInputs, singleInputCollection,
 outputPulseParameters, hold_offset, measurement_qe, frequency in elements
 config.
-3. 
+3.
+
+QmConfigBuilder builds the same config incrementally. It caches the config
+fragment of each element, mixer, pulse and waveform, keyed on the state of the
+object it was built from, and only rebuilds fragments whose source changed.
+After each build, its diff lists which entries of which sections changed.
 """
+
 from copy import deepcopy
 from pathlib import Path
 import yaml
 
+import numpy as np
+
 from codebase.instruments import QuantumElement
+from codebase.utils.mixer_correction_table import get_mixer_config_entries
 from codebase.utils.pulselib import (
     Pulse,
     MeasurementPulse,
     Waveform,
     ConstantWaveform,
     ArbitraryWaveform,
+    freeze,
 )
 
 # --------------------------------- Globals ------------------------------------
@@ -46,8 +66,9 @@ MIXER_PREFIX = "mixer_"  # mixer naming convention is MIXER_PREFIX + element.nam
 NUM_MIXERS_PER_ELEMENT = 1
 DEFAULT_DIGITAL_MARKER = "ON"
 DEFAULT_DIGITAL_ON_SAMPLES = [(1, 0)]  # must be list of tuples
-DEFAULT_SAMPLING_RATE = 1  # for arbitrary waveforms, in gigacycles per second
-DEFAULT_MAX_ALLOWED_ERROR = 1e3  # for auto-compression of arbitrary waveforms
+DEFAULT_MAX_ALLOWED_ERROR = 1e-4  # in V, for compression of arbitrary waveforms
+# in samples, shorter arbitrary waveforms are kept as is
+MIN_COMPRESSION_LENGTH = 1000
 
 # ------------------------------- Base config ----------------------------------
 # base config must be in the same directory as this module
@@ -56,6 +77,7 @@ CONFIG_SCHEMA_PATH = Path(__file__).resolve().parent / CONFIG_SCHEMA_FILENAME
 with open(CONFIG_SCHEMA_PATH, "r") as base_config_file:
     QM_CONFIG_SCHEMA = yaml.safe_load(base_config_file)
 
+
 # ------------------------------ Public method ---------------------------------
 def build_qm_config(elements: set[QuantumElement]) -> dict:
     """
@@ -73,6 +95,105 @@ def build_qm_config(elements: set[QuantumElement]) -> dict:
     return qm_config
 
 
+class QmConfigBuilder:
+    """
+    Memoised, incremental version of build_qm_config(). Each element, mixer, pulse and
+    waveform fragment is cached with a snapshot of the parameters it was built from, and
+    reused as long as they are unchanged, so that changing one IF or one pulse amplitude
+    rebuilds only that fragment. Arbitrary waveform samples, the costliest part of the
+    config, are only regenerated when their function or its parameters change.
+
+    Cached fragments are shared between the configs returned by successive builds, so
+    treat the configs as read only.
+
+    Usage:
+        builder = QmConfigBuilder()
+        config = builder.build(elements)
+        qubit.int_freq = -60e6
+        config = builder.build(elements)
+        builder.diff  # {"elements": ["qubit"], "mixers": ["mixer_qubit"]}
+    """
+
+    def __init__(self):
+        self.config = None  # latest config built
+        self.diff = dict()  # section: names of the entries changed by the latest build
+        self.num_fragments_built = 0  # fragments built by the latest build
+        self._cache = dict()  # (section, name): (state, fragment)
+
+    @property
+    def changed_sections(self) -> list:
+        """Top-level config sections changed by the latest build."""
+        return list(self.diff)
+
+    def build(self, elements: set[QuantumElement]) -> dict:
+        """Builds the qm config of the elements, reusing unchanged fragments."""
+        self.num_fragments_built = 0
+        qm_config = dict()
+        qm_config["version"] = QM_CONFIG_SCHEMA["version"]
+        qm_config["elements"] = {
+            element.name: self._get_fragment(
+                "elements", element.name, _get_element_state(element),
+                _build_element_fragment, element,
+            )
+            for element in elements
+        }  # fmt: skip
+        _build_controllers_config(elements, qm_config)
+        qm_config["mixers"] = {
+            MIXER_PREFIX + element.name: self._get_fragment(
+                "mixers", MIXER_PREFIX + element.name, _get_mixer_state(element),
+                _build_mixer_fragment, element,
+            )
+            for element in elements
+            if "I" in element.ports and "Q" in element.ports
+        }  # fmt: skip
+        self._build_pulses_and_waveforms(elements, qm_config)
+        _build_digital_waveforms_config(qm_config)
+
+        self.diff = _get_config_diff(self.config or dict(), qm_config)
+        self.config = qm_config
+        return qm_config
+
+    def _get_fragment(self, section: str, name: str, state, build_fn, *args):
+        """The cached fragment if its state is unchanged, else build_fn(*args)."""
+        cached = self._cache.get((section, name))
+        if cached is not None and cached[0] == state:
+            return cached[1]
+        fragment = build_fn(*args)
+        self._cache[(section, name)] = (state, fragment)
+        self.num_fragments_built += 1
+        return fragment
+
+    def _build_pulses_and_waveforms(self, elements: set, qm_config: dict):
+        pulses_config = dict()
+        waveforms_config = dict()
+        waveform_names = _get_waveform_names(elements)
+        weights_names = _get_integration_weights_names(elements)
+        for element in elements:
+            for pulse in element.operations.values():
+                if pulse.name in pulses_config:  # only add unique pulses
+                    continue
+                pulse_schema, integration_weights = self._get_fragment(
+                    "pulses", pulse.name,
+                    _get_pulse_state(pulse, waveform_names, weights_names),
+                    _build_pulse_fragment, pulse, waveform_names, weights_names,
+                )  # fmt: skip
+                pulses_config[pulse.name] = pulse_schema
+                if integration_weights is not None:
+                    weights_config = qm_config.setdefault("integration_weights", dict())
+                    weights_config.update(integration_weights)
+                for waveform in pulse.waveforms.values():
+                    name = waveform_names.get(waveform.name, waveform.name)
+                    if name not in waveforms_config:
+                        waveform_schema = self._get_fragment(
+                            "waveforms", name, _get_waveform_state(waveform),
+                            _build_waveform_fragment, waveform,
+                        )  # fmt: skip
+                        if waveform_schema is not None:
+                            waveforms_config[name] = waveform_schema
+        qm_config["pulses"] = pulses_config
+        qm_config["waveforms"] = waveforms_config
+
+
 # ------------------------- Private helper methods -----------------------------
 def _build_elements_config(elements: set, qm_config: dict):
     elements_config = dict()
@@ -171,7 +292,13 @@ def _build_mixers_config(elements: set, qm_config: dict):
     qm_config["mixers"] = mixers_config
 
 
-def _build_mixer_config(element: QuantumElement, mixer_schema: dict):
+def _build_mixer_config(element: QuantumElement, mixer_schema: list):
+    table = getattr(getattr(element, "mixer", None), "correction_table", None)
+    if table:  # one entry per tuned IF
+        int_freqs = {row[0] for row in table} | {element.int_freq}
+        mixer_schema[:] = get_mixer_config_entries(table, element.lo_freq, int_freqs)
+        return
+
     for i in range(NUM_MIXERS_PER_ELEMENT):
         mixer_schema[i]["intermediate_frequency"] = element.int_freq
         mixer_schema[i]["lo_frequency"] = element.lo_freq
@@ -181,72 +308,151 @@ def _build_mixer_config(element: QuantumElement, mixer_schema: dict):
 def _build_pulses_and_waveforms_config(elements: set, qm_config: dict):
     pulses_config = dict()
     waveforms_config = dict()
+    waveform_names = _get_waveform_names(elements)
+    weights_names = _get_integration_weights_names(elements)
     for element in elements:
         for pulse in element.operations.values():
             if pulse.name not in pulses_config:  # only add unique pulses
                 pulse_schema = deepcopy(QM_CONFIG_SCHEMA["pulses"]["pulse_name"])
-                _build_pulse_config(pulse, pulse_schema, qm_config)
+                _build_pulse_config(
+                    pulse, pulse_schema, qm_config, waveform_names, weights_names
+                )
                 pulses_config[pulse.name] = pulse_schema
                 for waveform in pulse.waveforms.values():
-                    if waveform.name not in waveforms_config:
-                        _build_waveform_config(waveform, waveforms_config)
+                    name = waveform_names.get(waveform.name, waveform.name)
+                    if name not in waveforms_config:
+                        _build_waveform_config(waveform, waveforms_config, name)
     qm_config["pulses"] = pulses_config
     qm_config["waveforms"] = waveforms_config
 
 
-def _build_pulse_config(pulse: Pulse, pulse_schema: dict, qm_config: dict):
+def _get_waveform_names(elements: set) -> dict:
+    """
+    Maps the name of each waveform played by the elements to the name under which its
+    samples appear in the config. Waveforms with equal samples, that is of the same type
+    with the same func and params, share the first of their names in alphabetical order.
+    """
+    names_by_key = dict()  # (waveform type, waveform key): names
+    for element in elements:
+        for pulse in getattr(element, "operations", dict()).values():
+            for waveform in getattr(pulse, "waveforms", dict()).values():
+                key = (type(waveform).__name__, waveform.key)
+                names_by_key.setdefault(key, set()).add(waveform.name)
+    return {name: min(names) for names in names_by_key.values() for name in names}
+
+
+def _get_integration_weights_names(elements: set) -> dict:
+    """
+    Maps (pulse name, integration weights name) of each measurement pulse played by the
+    elements to the name of its weights in the config. Weights keep their name if all
+    pulses that have weights of that name have equal ones, else each distinct set of
+    weights is named after the first of its pulses in alphabetical order, e.g.
+    "iw1_readout_pulse".
+    """
+    pulses_by_key = dict()  # weights name: {weights key: pulse names}
+    for element in elements:
+        for pulse in getattr(element, "operations", dict()).values():
+            if isinstance(pulse, MeasurementPulse):
+                for iw_name, weights in pulse.integration_weights.items():
+                    pulses = pulses_by_key.setdefault(iw_name, dict())
+                    pulses.setdefault(weights.key, set()).add(pulse.name)
+
+    names = dict()
+    for iw_name, pulses in pulses_by_key.items():
+        for pulse_names in pulses.values():
+            name = iw_name if len(pulses) == 1 else iw_name + "_" + min(pulse_names)
+            names.update({(pulse_name, iw_name): name for pulse_name in pulse_names})
+    return names
+
+
+def _build_pulse_config(
+    pulse: Pulse,
+    pulse_schema: dict,
+    qm_config: dict,
+    waveform_names: dict = None,
+    weights_names: dict = None,
+):
     if not hasattr(pulse, "waveforms"):
         raise RuntimeError("No waveforms defined for pulse " + pulse.name)
 
-    _build_pulse_waveform_config(pulse, pulse_schema)
+    _build_pulse_waveform_config(pulse, pulse_schema, waveform_names or dict())
     pulse_schema["length"] = pulse.length
 
     if isinstance(pulse, MeasurementPulse):
         pulse_schema["operation"] = "measurement"
-        _build_meas_pulse_config(pulse, pulse_schema, qm_config)
+        _build_meas_pulse_config(
+            pulse, pulse_schema, qm_config, weights_names or dict()
+        )
     else:
         pulse_schema["operation"] = "control"
         del pulse_schema["digital_marker"], pulse_schema["integration_weights"]
 
 
-def _build_pulse_waveform_config(pulse: Pulse, pulse_schema: dict):
+def _build_pulse_waveform_config(
+    pulse: Pulse, pulse_schema: dict, waveform_names: dict
+):
+    # pulses refer to waveforms by their deduplicated names
+    names = {
+        key: waveform_names.get(waveform.name, waveform.name)
+        for key, waveform in pulse.waveforms.items()
+    }
     if "single" in pulse.waveforms:  # single input
-        pulse_schema["waveforms"]["single"] = pulse.waveforms["single"].name
+        pulse_schema["waveforms"]["single"] = names["single"]
         del pulse_schema["waveforms"]["I"], pulse_schema["waveforms"]["Q"]
     elif "I" in pulse.waveforms and "Q" in pulse.waveforms:  # mixed inputs
-        pulse_schema["waveforms"]["I"] = pulse.waveforms["I"].name
-        pulse_schema["waveforms"]["Q"] = pulse.waveforms["Q"].name
+        pulse_schema["waveforms"]["I"] = names["I"]
+        pulse_schema["waveforms"]["Q"] = names["Q"]
         del pulse_schema["waveforms"]["single"]
 
 
-def _build_meas_pulse_config(pulse: Pulse, pulse_schema: dict, qm_config: dict):
+def _build_meas_pulse_config(
+    pulse: Pulse, pulse_schema: dict, qm_config: dict, weights_names: dict
+):
     pulse_schema["digital_marker"] = DEFAULT_DIGITAL_MARKER
-    for iw_name in pulse.integration_weights.keys():
-        pulse_schema["integration_weights"][iw_name] = iw_name
-    _build_integration_weights_config(pulse, qm_config)
-
-
-def _build_integration_weights_config(pulse: MeasurementPulse, qm_config: dict):
-    qm_config["integration_weights"] = pulse.integration_weights
-
-
-def _build_waveform_config(waveform: Waveform, waveforms_config: dict):
+    integration_weights = pulse.integration_weights
+    for iw_name in integration_weights.keys():
+        name = weights_names.get((pulse.name, iw_name), iw_name)
+        pulse_schema["integration_weights"][iw_name] = name
+    _build_integration_weights_config(integration_weights, pulse_schema, qm_config)
+
+
+def _build_integration_weights_config(
+    integration_weights: dict, pulse_schema: dict, qm_config: dict
+):
+    # all measurement pulses add their weights to the section, under config names
+    weights_config = qm_config.setdefault("integration_weights", dict())
+    for iw_name, weights in integration_weights.items():
+        weights_config[pulse_schema["integration_weights"][iw_name]] = (
+            weights.get_config()
+        )
+
+
+def _build_waveform_config(
+    waveform: Waveform, waveforms_config: dict, name: str = None
+):
+    # samples are cached as numpy arrays in pulselib, the config gets python floats
+    name = waveform.name if name is None else name
     if isinstance(waveform, ConstantWaveform):
         const_wf_schema = deepcopy(QM_CONFIG_SCHEMA["waveforms"]["constant_wf"])
         const_wf_schema["type"] = "constant"
-        const_wf_schema["sample"] = waveform.get_samples()
-        waveforms_config[waveform.name] = const_wf_schema
+        const_wf_schema["sample"] = float(waveform.get_samples())
+        waveforms_config[name] = const_wf_schema
     elif isinstance(waveform, ArbitraryWaveform):
         arb_wf_schema = deepcopy(QM_CONFIG_SCHEMA["waveforms"]["arbitrary_wf"])
         arb_wf_schema["type"] = "arbitrary"
 
         # we cannot set max_allowed_error and sampling_rate at the same time
-        # for now, we'll simply not set these and follow qm's default behaviour
-        # arb_wf_schema['max_allowed_error'] = DEFAULT_MAX_ALLOWED_ERROR
-        # arb_wf_schema['sampling_rate'] = DEFAULT_SAMPLING_RATE
+        # we compress long waveforms ourselves, to a lower sampling_rate within
+        # DEFAULT_MAX_ALLOWED_ERROR, so that we know and control the result
+        samples = waveform.get_samples()
+        if len(samples) >= MIN_COMPRESSION_LENGTH:
+            compressed = waveform.get_compressed_samples(DEFAULT_MAX_ALLOWED_ERROR)
+            if compressed.decimation > 1:
+                samples = compressed.samples
+                arb_wf_schema["sampling_rate"] = compressed.sampling_rate
 
-        arb_wf_schema["samples"] = waveform.get_samples()
-        waveforms_config[waveform.name] = arb_wf_schema
+        arb_wf_schema["samples"] = np.asarray(samples).tolist()
+        waveforms_config[name] = arb_wf_schema
 
 
 def _build_digital_waveforms_config(qm_config: dict):
@@ -260,3 +466,113 @@ def _build_digital_waveforms_config(qm_config: dict):
     digital_waveform_schema["samples"] = DEFAULT_DIGITAL_ON_SAMPLES
     digital_waveforms_config[DEFAULT_DIGITAL_MARKER] = digital_waveform_schema
     qm_config["digital_waveforms"] = digital_waveforms_config
+
+
+# ------------------ Incremental builder fragments and states ------------------
+def _get_element_state(element: QuantumElement):
+    operations = getattr(element, "operations", dict())
+    return freeze(
+        (
+            getattr(element, "ports", None),
+            getattr(element, "lo_freq", None),
+            getattr(element, "int_freq", None),
+            {op_name: pulse.name for op_name, pulse in operations.items()},
+            hasattr(element, "time_of_flight") or hasattr(element, "smearing"),
+            getattr(element, "time_of_flight", None),
+            getattr(element, "smearing", None),
+        )
+    )
+
+
+def _get_mixer_state(element: QuantumElement):
+    table = getattr(getattr(element, "mixer", None), "correction_table", None)
+    return freeze((element.lo_freq, element.int_freq, table))
+
+
+def _get_pulse_state(pulse: Pulse, waveform_names: dict, weights_names: dict):
+    waveforms = getattr(pulse, "waveforms", dict())
+    weights = dict()
+    if isinstance(pulse, MeasurementPulse):
+        weights = {
+            iw_name: (weights_names.get((pulse.name, iw_name), iw_name), iw.key)
+            for iw_name, iw in pulse.integration_weights.items()
+        }
+    return freeze(
+        (
+            type(pulse).__name__,
+            pulse.length,
+            {
+                key: waveform_names.get(waveform.name, waveform.name)
+                for key, waveform in waveforms.items()
+            },
+            weights,
+        )
+    )
+
+
+def _get_waveform_state(waveform: Waveform):
+    return (type(waveform).__name__, waveform.key)
+
+
+def _build_element_fragment(element: QuantumElement) -> dict:
+    element_schema = deepcopy(QM_CONFIG_SCHEMA["elements"]["element_name"])
+    _build_element_config(element, element_schema)
+    if "I" in element.ports and "Q" in element.ports:
+        element_schema["mixInputs"]["mixer"] = MIXER_PREFIX + element.name
+    return element_schema
+
+
+def _build_mixer_fragment(element: QuantumElement) -> list:
+    mixer_schema = deepcopy(QM_CONFIG_SCHEMA["mixers"]["mixer_name"])
+    _build_mixer_config(element, mixer_schema)
+    return mixer_schema
+
+
+def _build_pulse_fragment(
+    pulse: Pulse, waveform_names: dict, weights_names: dict
+) -> tuple:
+    """Returns (pulse config, integration weights config of the pulse or None)."""
+    pulse_schema = deepcopy(QM_CONFIG_SCHEMA["pulses"]["pulse_name"])
+    weights_config = dict()  # measurement pulses build their integration weights in it
+    _build_pulse_config(
+        pulse, pulse_schema, weights_config, waveform_names, weights_names
+    )
+    return pulse_schema, weights_config.get("integration_weights")
+
+
+def _build_waveform_fragment(waveform: Waveform):
+    """Returns the waveform config, or None for unsupported waveform types."""
+    waveforms_config = dict()
+    _build_waveform_config(waveform, waveforms_config)
+    return waveforms_config.get(waveform.name)
+
+
+def _get_config_diff(old_config: dict, new_config: dict) -> dict:
+    """
+    section: sorted names of the entries added, removed or changed between the configs.
+    Cached fragments are compared by identity, the others by value.
+    """
+    diff = dict()
+    for section in old_config.keys() | new_config.keys():
+        old, new = old_config.get(section), new_config.get(section)
+        if not isinstance(old, dict) or not isinstance(new, dict):
+            if old != new:
+                diff[section] = []
+            continue
+        changed = [
+            name
+            for name in old.keys() | new.keys()
+            if name not in old or name not in new or not _is_same(old[name], new[name])
+        ]
+        if changed:
+            diff[section] = sorted(changed, key=str)
+    return diff
+
+
+def _is_same(old, new) -> bool:
+    if old is new:
+        return True
+    try:
+        return bool(old == new)
+    except ValueError:  # fragments holding numpy arrays
+        return False
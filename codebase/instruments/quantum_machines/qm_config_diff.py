@@ -0,0 +1,227 @@
+"""
+A utility for updating a running Quantum Machine to a new config without
+re-opening it. Re-opening a QM with qmm.open_qm(config) takes seconds and halts
+its running jobs, but most config changes made between experiments are
+parameter updates that the QM API can apply at runtime in milliseconds.
+
+ConfigDiff compares two QM configs, such as those built by qm_config_builder
+before and after a parameter change, and maps each difference to a QM API call:
+1. DC offsets of analog outputs and inputs, via set_output_dc_offset_by_element
+and set_input_dc_offset_by_element, for ports used by an element.
+2. Intermediate frequencies of elements, via set_intermediate_frequency.
+3. Mixer correction matrices, via set_mixer_correction. Mixer entries dropped
+from the new config are left on the QM, as they do no harm.
+
+Everything else (elements, ports, LO frequencies, operations, pulses,
+waveforms, integration weights) is structural and needs the QM to be re-opened.
+
+Usage:
+    diff = ConfigDiff(old_config, new_config)
+    if diff.requires_reopen:
+        print(diff.structural_changes)
+        qm = qmm.open_qm(new_config)
+    else:
+        diff.apply(qm)
+
+or simply qm = update_qm(qmm, qm, old_config, new_config).
+"""
+
+import numpy as np
+
+# sections whose every change is structural
+STRUCTURAL_SECTIONS = (
+    "version",
+    "pulses",
+    "waveforms",
+    "digital_waveforms",
+    "integration_weights",
+)
+
+
+# ---------------------------------- Class -------------------------------------
+class ConfigDiff:
+    """
+    Differences between two QM configs. `updates` lists the QM API calls, as (method
+    name, args) tuples, that take a QM opened with the old config to the new one, and
+    `structural_changes` describes the differences that no API call can apply.
+    """
+
+    def __init__(self, old_config: dict, new_config: dict):
+        self.updates = list()  # (qm method name, args)
+        self.structural_changes = list()  # descriptions of changes needing a reopen
+        self._diff_configs(old_config, new_config)
+
+    @property
+    def requires_reopen(self) -> bool:
+        return bool(self.structural_changes)
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.updates and not self.structural_changes
+
+    def apply(self, qm):
+        """Applies the updates to the qm, which must be open with the old config."""
+        if self.requires_reopen:
+            raise RuntimeError(
+                "Config changes need the QM to be re-opened: "
+                + "; ".join(self.structural_changes)
+            )
+        for method_name, args in self.updates:
+            getattr(qm, method_name)(*args)
+
+    def _diff_configs(self, old_config: dict, new_config: dict):
+        for section in STRUCTURAL_SECTIONS:
+            old, new = old_config.get(section), new_config.get(section)
+            for name in _get_changed_names(old, new):
+                self.structural_changes.append(f"{section} '{name}' changed")
+
+        old_elements = old_config.get("elements", dict())
+        new_elements = new_config.get("elements", dict())
+        self._diff_elements(old_elements, new_elements)
+        if not self.requires_reopen:  # ports are only mapped to unchanged elements
+            self._diff_controllers(
+                old_config.get("controllers", dict()),
+                new_config.get("controllers", dict()),
+                new_elements,
+            )
+        self._diff_mixers(
+            old_config.get("mixers", dict()), new_config.get("mixers", dict())
+        )
+
+    def _diff_elements(self, old_elements: dict, new_elements: dict):
+        for name in _get_changed_names(old_elements, new_elements):
+            old, new = old_elements.get(name), new_elements.get(name)
+            if old is None or new is None:
+                self.structural_changes.append(f"element '{name}' added or removed")
+                continue
+            for key in _get_changed_names(old, new):
+                if key == "intermediate_frequency":
+                    args = (name, new[key])
+                    self.updates.append(("set_intermediate_frequency", args))
+                else:
+                    self.structural_changes.append(f"element '{name}' {key} changed")
+
+    def _diff_controllers(
+        self, old_controllers: dict, new_controllers: dict, elements: dict
+    ):
+        for controller in _get_changed_names(old_controllers, new_controllers):
+            old, new = old_controllers.get(controller), new_controllers.get(controller)
+            if old is None or new is None:
+                self.structural_changes.append(
+                    f"controller '{controller}' added or removed"
+                )
+                continue
+            for key in _get_changed_names(old, new):
+                if key == "analog_outputs":
+                    self._diff_ports(controller, old[key], new[key], elements, True)
+                elif key == "analog_inputs":
+                    self._diff_ports(controller, old[key], new[key], elements, False)
+                else:
+                    self.structural_changes.append(
+                        f"controller '{controller}' {key} changed"
+                    )
+
+    def _diff_ports(self, controller, old_ports, new_ports, elements, is_output):
+        kind = "analog output" if is_output else "analog input"
+        for port in _get_changed_names(old_ports, new_ports):
+            old, new = old_ports.get(port), new_ports.get(port)
+            if old is None or new is None or old.keys() != new.keys():
+                self.structural_changes.append(f"{kind} {port} added or removed")
+                continue
+            user = _get_port_user(elements, (controller, port), is_output)
+            if user is None:
+                self.structural_changes.append(
+                    f"{kind} {port} is not used by any element"
+                )
+                continue
+            element, input = user
+            if is_output:
+                method_name = "set_output_dc_offset_by_element"
+            else:
+                method_name = "set_input_dc_offset_by_element"
+            self.updates.append((method_name, (element, input, new["offset"])))
+
+    def _diff_mixers(self, old_mixers: dict, new_mixers: dict):
+        for name in _get_changed_names(old_mixers, new_mixers):
+            if name not in new_mixers:
+                continue  # the mixer of a removed element, which is structural
+            old_entries = {
+                _get_mixer_key(entry): entry["correction"]
+                for entry in old_mixers.get(name, list())
+            }
+            for entry in new_mixers[name]:
+                int_freq, lo_freq = _get_mixer_key(entry)
+                correction = entry["correction"]
+                old_correction = old_entries.get((int_freq, lo_freq))
+                if old_correction is None or not _is_equal(old_correction, correction):
+                    args = (name, int_freq, lo_freq, tuple(correction))
+                    self.updates.append(("set_mixer_correction", args))
+
+
+# ------------------------------ Public method ---------------------------------
+def update_qm(qmm, qm, old_config: dict, new_config: dict):
+    """
+    Brings qm, opened with old_config, up to new_config through runtime API calls if
+    possible, else re-opens it with qmm. Returns the up to date QM.
+    """
+    diff = ConfigDiff(old_config, new_config)
+    if diff.requires_reopen:
+        print("Re-opening QM, as " + "; ".join(diff.structural_changes))
+        return qmm.open_qm(new_config)
+    diff.apply(qm)
+    return qm
+
+
+# ------------------------- Private helper methods -----------------------------
+def _get_mixer_key(entry: dict) -> tuple:
+    """(IF, LO frequency) that a mixer correction entry applies to."""
+    return entry["intermediate_frequency"], entry["lo_frequency"]
+
+
+def _get_changed_names(old, new) -> list:
+    """Keys of the dicts old and new whose values differ, or only one of them has."""
+    if old is new:
+        return list()
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return list() if _is_equal(old, new) else ["*"]
+    return sorted(
+        (
+            name
+            for name in old.keys() | new.keys()
+            if name not in old or name not in new or not _is_equal(old[name], new[name])
+        ),
+        key=str,
+    )
+
+
+def _is_equal(old, new) -> bool:
+    """Deep equality that also handles numpy arrays, as in integration weights."""
+    if old is new:
+        return True
+    if isinstance(old, dict) and isinstance(new, dict):
+        if old.keys() != new.keys():
+            return False
+        return all(_is_equal(old[key], new[key]) for key in old)
+    if isinstance(old, np.ndarray) or isinstance(new, np.ndarray):
+        return np.array_equal(old, new)
+    if isinstance(old, (list, tuple)) and isinstance(new, (list, tuple)):
+        if len(old) != len(new):
+            return False
+        return all(_is_equal(x, y) for x, y in zip(old, new))
+    return old == new
+
+
+def _get_port_user(elements: dict, port: tuple, is_output: bool):
+    """(element name, input or output name) of an element using the controller port."""
+    for name, element in elements.items():
+        if is_output:
+            for input in ("I", "Q"):
+                if tuple(element.get("mixInputs", dict()).get(input) or ()) == port:
+                    return name, input
+            if tuple(element.get("singleInput", dict()).get("port") or ()) == port:
+                return name, "single"
+        else:
+            for output, output_port in element.get("outputs", dict()).items():
+                if tuple(output_port) == port:
+                    return name, output
+    return None
@@ -3,11 +3,17 @@ Python driver for Signal Hound USB-SA124B spectrum analyser.
 
 Based on the API provided by the vendor.
 
-Currently, this driver only supports swept analysis mode, that is, frequency
-domain sweeps. A frequency domain sweep displays amplitude on the vertical axis
-and frequency on the horizontal axis.
+This driver supports swept analysis mode, that is, frequency domain sweeps. A
+frequency domain sweep displays amplitude on the vertical axis and frequency on
+the horizontal axis. It also supports IQ streaming mode, which delivers a
+continuous stream of complex baseband samples around a center frequency, see
+Sa124.start_iq_stream(), and real-time mode, which delivers gap free spectra of
+a narrow span at the device frame rate, see Sa124.start_real_time().
 """
+
 # --------------------------------- Imports ------------------------------------
+import threading
+
 import numpy as np
 
 from qcrew.codebase.instruments.instrument import PhysicalInstrument
@@ -15,22 +21,30 @@ from qcrew.codebase.instruments.signal_hound.sa_api import (
     SA_AVERAGE,
     SA_FALSE,
     SA_IDLE,
+    SA_IQ,
     SA_LOG_SCALE,
     SA_LOG_UNITS,
     SA_RBW_SHAPE_FLATTOP,
+    SA_REAL_TIME,
     SA_REF_EXTERNAL_IN,
     SA_SWEEPING,
     SA_TRUE,
     sa_close_device,
     sa_config_acquisition,
     sa_config_center_span,
+    sa_config_IQ,
     sa_config_level,
     sa_config_proc_units,
+    sa_config_real_time,
     sa_config_RBW_shape,
     sa_config_sweep_coupling,
+    sa_get_IQ_data_unpacked,
+    sa_get_real_time_frame,
     sa_get_sweep_64f,
     sa_initiate,
     sa_open_device_by_serial,
+    sa_query_real_time_frame_info,
+    sa_query_stream_info,
     sa_query_sweep_info,
     sa_set_timebase,
 )
@@ -97,6 +111,25 @@ REF_POWER = "ref_power"  # gettable and settable
 DEFAULT_REF_POWER = 0
 MAX_REF_POWER = 20  # in dBm, set by vendor in sa_api.h
 
+# span of the narrow sweeps used by power_at(), in units of their rbw
+POWER_AT_SPAN_RBWS = 4
+
+# ------------------------------ IQ streaming ----------------------------------
+# the IQ sample rate is 486.111kS/s divided by the decimation, which must be a
+# power of two between 1 and 128. The bandwidth of the IQ filter must be below
+# the decimated sample rate, see saConfigIQ in the vendor manual.
+DEFAULT_DECIMATION = 1
+MAX_DECIMATION = 128  # set by vendor in sa_api.h
+DEFAULT_IQ_BANDWIDTH = 250e3  # in Hz
+IQ_BLOCK_SIZE = 16384  # complex samples fetched from the device per call
+IQ_RING_SIZE = 2**22  # complex samples held in the ring buffer, ~8s at 486kS/s
+
+# ------------------------------- Real-time ------------------------------------
+MAX_REAL_TIME_SPAN = 250e3  # in Hz, set by vendor in sa_api.h
+DEFAULT_FRAME_SCALE = 100.0  # height of the persistence frame in dB
+DEFAULT_FRAME_RATE = 30  # frames per second
+
+
 # ---------------------------------- Class -------------------------------------
 class Sa124(PhysicalInstrument):
     """
@@ -124,7 +157,11 @@ class Sa124(PhysicalInstrument):
         self._center = center
         self._span = span
         self._rbw = rbw
+        self._requested_rbw = rbw  # see _configure_sweep()
         self._ref_power = ref_power
+        # frequencies, min and max buffers of the current sweep configuration
+        self._sweep_buffers = None
+        self._stream = None  # set while the device streams IQ or real-time data
         self._initialize()
 
     def _create_yaml_map(self):
@@ -199,6 +236,7 @@ class Sa124(PhysicalInstrument):
         # device must be in idle mode before it is configured
         # the third argument is an inconsequential flag that can be ignored
         sa_initiate(self._device_handle, SA_IDLE, SA_FALSE)
+        self._sweep_buffers = None  # sweep info may change with the new config
 
         if "center" in sweep_parameters:
             new_center = sweep_parameters["center"]
@@ -223,6 +261,9 @@ class Sa124(PhysicalInstrument):
 
         sa_config_center_span(self._device_handle, self._center, self._span)
 
+        # an invalid rbw is replaced by DEFAULT_RBW, remember what was asked for under
+        # this center and span so that asking for it again is not seen as a change
+        self._requested_rbw = sweep_parameters.get("rbw", self._rbw)
         if "rbw" in sweep_parameters:
             new_rbw = sweep_parameters["rbw"]
             if self._is_valid_rbw(new_rbw):
@@ -245,25 +286,246 @@ class Sa124(PhysicalInstrument):
         # device is ready to sweep
         sa_initiate(self._device_handle, SA_SWEEPING, SA_FALSE)
 
-        #print("Configured sweep! Sweep info: ")
-        #print(self.parameters)
+        # print("Configured sweep! Sweep info: ")
+        # print(self.parameters)
+
+    def _get_sweep_buffers(self):
+        # sweep info, frequencies and buffers only change when the sweep is
+        # reconfigured, so they are created once per sweep configuration
+        if self._sweep_buffers is None:
+            sweep_info = sa_query_sweep_info(self._device_handle)
+            sweep_length = sweep_info["sweep_length"]
+            frequencies = (
+                sweep_info["start_freq"]
+                + np.arange(sweep_length) * sweep_info["bin_size"]
+            )
+            frequencies.flags.writeable = False  # shared by all sweeps
+            self._sweep_buffers = (
+                frequencies,
+                np.zeros(sweep_length),  # min amplitudes
+                np.zeros(sweep_length),  # max amplitudes
+            )
+        return self._sweep_buffers
+
+    def _is_configured(self, **sweep_parameters):
+        current_parameters = {
+            CENTER: self._center,
+            SPAN: self._span,
+            RBW: self._requested_rbw,
+            REF_POWER: self._ref_power,
+        }
+        return all(
+            current_parameters.get(key) == value
+            for key, value in sweep_parameters.items()
+        )
 
     def sweep(self, **sweep_parameters):
-        if sweep_parameters:
+        """
+        Returns (frequencies, amplitudes) of one sweep, after configuring the sweep with
+        the given sweep parameters, if any. Both are new arrays owned by the caller, use
+        sweep_view() to avoid the copies in a tight loop.
+        """
+        frequencies, amplitudes = self.sweep_view(**sweep_parameters)
+        return (frequencies.copy(), amplitudes.copy())
+
+    def sweep_view(self, **sweep_parameters):
+        """
+        Like sweep(), but returns read-only views of buffers that are reused by all
+        sweeps with the same configuration, so the amplitudes are overwritten by the
+        next sweep. Copy them if you need to keep them.
+        """
+        self._check_is_sweeping()
+        if sweep_parameters and not self._is_configured(**sweep_parameters):
             self._configure_sweep(**sweep_parameters)
 
+        frequencies, sweep_min, sweep_max = self._get_sweep_buffers()
+        sa_get_sweep_64f(self._device_handle, sweep_min, sweep_max)
+        amplitudes = sweep_max.view()
+        amplitudes.flags.writeable = False
+        return (frequencies, amplitudes)
+
+    def power_at(self, freq: float, rbw: float = None, averages: int = 1):
+        """
+        Returns the power in dBm at freq, averaged in linear units over `averages`
+        sweeps. Each sweep is narrowed to POWER_AT_SPAN_RBWS resolution bandwidths
+        around freq, using the current rbw if none is given. The power is the max over
+        the bins within rbw / 2 of freq, so it does not depend on where freq falls
+        between bins.
+
+        The device is only reconfigured when freq or rbw change, so repeated calls in an
+        optimisation loop cost just the narrow sweeps.
+        """
+        return self.powers_at([freq], rbw, averages)[0]
+
+    def powers_at(self, freqs, rbw: float = None, averages: int = 1) -> np.ndarray:
+        """
+        Returns the power in dBm at each of freqs, like power_at(), from one sweep per
+        average that spans all of them plus POWER_AT_SPAN_RBWS resolution bandwidths.
+        Use it to measure several tones that are close together at the cost of a single
+        sweep.
+        """
+        if averages < 1:
+            raise ValueError("Averages must be at least 1, got " + str(averages))
+        self._check_is_sweeping()
+
+        freqs = np.asarray(freqs, dtype=float)
+        rbw = self._rbw if rbw is None else rbw
+        sweep_parameters = {
+            CENTER: (freqs.min() + freqs.max()) / 2,
+            SPAN: np.ptp(freqs) + POWER_AT_SPAN_RBWS * rbw,
+            RBW: rbw,
+        }
+        if not self._is_configured(**sweep_parameters):
+            self._configure_sweep(**sweep_parameters)
+
+        frequencies, sweep_min, sweep_max = self._get_sweep_buffers()
+        windows = []  # bins within rbw / 2 of each freq, or the nearest bin
+        for freq in freqs:
+            start = np.searchsorted(frequencies, freq - self._rbw / 2)
+            stop = np.searchsorted(frequencies, freq + self._rbw / 2, side="right")
+            if start == stop:
+                start = np.argmin(np.abs(frequencies - freq))
+                stop = start + 1
+            windows.append(slice(start, stop))
+
+        total_powers = np.zeros(len(freqs))  # in mW
+        for _ in range(averages):
+            sa_get_sweep_64f(self._device_handle, sweep_min, sweep_max)
+            for index, window in enumerate(windows):
+                total_powers[index] += 10 ** (np.max(sweep_max[window]) / 10)
+        return 10 * np.log10(total_powers / averages)
+
+    def _check_is_sweeping(self):
+        if self._stream is not None:
+            raise RuntimeError("Stop streaming before sweeping")
+
+    def _check_center(self, center: float):
+        if not MIN_CENTER <= center <= MAX_CENTER:
+            raise ValueError(
+                "Center out of bounds, must be between "
+                + str(MIN_CENTER)
+                + "-"
+                + str(MAX_CENTER)
+            )
+
+    def start_iq_stream(
+        self,
+        center: float,
+        decimation: int = DEFAULT_DECIMATION,
+        bandwidth: float = DEFAULT_IQ_BANDWIDTH,
+        ring_size: int = IQ_RING_SIZE,
+    ):
+        """
+        Puts the device in IQ streaming mode at the given center frequency and starts
+        acquiring. Returns the IQStream, whose background thread keeps its ring buffer
+        filled until stop_iq_stream() is called. The reference power of the sweeps is
+        kept.
+        """
+        if self._stream is not None:
+            raise RuntimeError("Already streaming, stop streaming first")
+        self._check_center(center)
+        is_power_of_two = decimation >= 1 and decimation & (decimation - 1) == 0
+        if not is_power_of_two or decimation > MAX_DECIMATION:
+            raise ValueError(
+                "Decimation must be a power of two up to " + str(MAX_DECIMATION)
+            )
+
+        sa_initiate(self._device_handle, SA_IDLE, SA_FALSE)
+        self._sweep_buffers = None
+        # span is ignored in IQ mode, the bandwidth is set by sa_config_IQ
+        sa_config_center_span(self._device_handle, center, bandwidth)
+        sa_config_level(self._device_handle, self._ref_power)
+        sa_config_IQ(self._device_handle, decimation, bandwidth)
+        sa_initiate(self._device_handle, SA_IQ, SA_FALSE)
+
+        stream_info = sa_query_stream_info(self._device_handle)
+        self._stream = IQStream(
+            self._device_handle,
+            center=center,
+            sample_rate=stream_info["samples_per_second"],
+            bandwidth=stream_info["bandwidth"],
+            ring_size=ring_size,
+        )
+        self._stream.start()
+        return self._stream
+
+    def stop_iq_stream(self):
+        """Stops the IQ stream and restores the last sweep configuration."""
+        self._stop_stream()
+
+    def start_real_time(
+        self,
+        center: float,
+        span: float = MAX_REAL_TIME_SPAN,
+        rbw: float = None,
+        frame_scale: float = DEFAULT_FRAME_SCALE,
+        frame_rate: int = DEFAULT_FRAME_RATE,
+    ):
+        """
+        Puts the device in real-time mode over the given span and starts acquiring
+        frames. Returns the RealTimeMonitor, whose background thread keeps the max hold,
+        average and persistence arrays updated until stop_real_time() is called. The rbw
+        and reference power of the sweeps are kept unless an rbw is given.
+        """
+        if self._stream is not None:
+            raise RuntimeError("Already streaming, stop streaming first")
+        self._check_center(center)
+        if not MIN_SPAN <= span <= MAX_REAL_TIME_SPAN:
+            raise ValueError(
+                "Real-time span must be between "
+                + str(MIN_SPAN)
+                + "-"
+                + str(MAX_REAL_TIME_SPAN)
+            )
+        rbw = self._rbw if rbw is None else rbw
+
+        sa_initiate(self._device_handle, SA_IDLE, SA_FALSE)
+        self._sweep_buffers = None
+        sa_config_center_span(self._device_handle, center, span)
+        sa_config_level(self._device_handle, self._ref_power)
+        sa_config_sweep_coupling(self._device_handle, rbw, rbw, DOES_IMAGE_REJECT)
+        sa_config_real_time(self._device_handle, frame_scale, frame_rate)
+        sa_initiate(self._device_handle, SA_REAL_TIME, SA_FALSE)
+
         sweep_info = sa_query_sweep_info(self._device_handle)
-        frequencies = [
-            sweep_info["start_freq"] + i * sweep_info["bin_size"]
-            for i in range(sweep_info["sweep_length"])
-        ]
-        amplitudes = sa_get_sweep_64f(self._device_handle)["max"]
-        return (np.array(frequencies), np.array(amplitudes))
+        frame_info = sa_query_real_time_frame_info(self._device_handle)
+        frequencies = (
+            sweep_info["start_freq"]
+            + np.arange(sweep_info["sweep_length"]) * sweep_info["bin_size"]
+        )
+        self._stream = RealTimeMonitor(
+            self._device_handle,
+            frequencies=frequencies,
+            frame_shape=(frame_info["frame_height"], frame_info["frame_width"]),
+            ref_power=self._ref_power,
+            frame_scale=frame_scale,
+        )
+        self._stream.start()
+        return self._stream
+
+    def stop_real_time(self):
+        """Stops real-time acquisition and restores the last sweep configuration."""
+        self._stop_stream()
+
+    def _stop_stream(self):
+        if self._stream is None:
+            return
+        self._stream.stop()
+        self._stream = None
+        self._configure_sweep(
+            center=self._center,
+            span=self._span,
+            rbw=self._rbw,
+            ref_power=self._ref_power,
+        )
 
     def disconnect(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream = None
         sa_close_device(self._device_handle)
         del ACTIVE_SA_CONNECTIONS[self._uid]
-        #print(self._name + " disconnected!")
+        # print(self._name + " disconnected!")
 
     @property  # sweep parameters getter
     def parameters(self):
@@ -278,3 +540,281 @@ class Sa124(PhysicalInstrument):
             REF_POWER: self._ref_power,
             "bin_size": "{:.3E}".format(sweep_info["bin_size"]),
         }
+
+
+class IQStream:
+    """
+    Continuous IQ acquisition from an Sa124 in IQ streaming mode, created by
+    Sa124.start_iq_stream(). A background thread fetches blocks of complex64 samples
+    from the device into a ring buffer, which consumers drain with read() or by
+    iterating over blocks().
+
+    If the consumers fall more than `ring_size` samples behind, the oldest unread
+    samples are overwritten. This is counted in `num_overflows` and
+    `num_dropped_samples`. Samples lost on the device side, because the device buffer
+    was not emptied fast enough, are counted in `num_sample_losses`. Samples at index i
+    are spaced 1 / sample_rate apart, as long as neither counter changes.
+    """
+
+    def __init__(
+        self,
+        device_handle: int,
+        center: float,
+        sample_rate: float,
+        bandwidth: float,
+        ring_size: int = IQ_RING_SIZE,
+        block_size: int = IQ_BLOCK_SIZE,
+    ):
+        if ring_size < block_size:
+            raise ValueError("Ring size must be at least the block size")
+
+        self.center = center  # in Hz
+        self.sample_rate = sample_rate  # in samples per second
+        self.bandwidth = bandwidth  # in Hz
+        self.num_overflows = 0  # times unread samples were overwritten
+        self.num_dropped_samples = 0  # unread samples that were overwritten
+        self.num_sample_losses = 0  # device reported sample loss events
+
+        self._device_handle = device_handle
+        self._block = np.zeros(block_size, dtype=np.complex64)
+        self._ring = np.zeros(ring_size, dtype=np.complex64)
+        self._num_written = 0  # total samples written to the ring buffer
+        self._num_read = 0  # total samples read from the ring buffer
+        self._condition = threading.Condition()
+        self._is_running = False
+        self._thread = None
+        self.error = None  # exception that stopped the acquisition thread, if any
+
+    @property
+    def is_running(self) -> bool:
+        return self._is_running
+
+    @property
+    def num_available(self) -> int:
+        """Number of unread samples in the ring buffer."""
+        with self._condition:
+            return self._num_written - self._num_read
+
+    def start(self):
+        self._is_running = True
+        self._thread = threading.Thread(target=self._acquire, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._is_running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def read(self, num_samples: int, timeout: float = None) -> np.ndarray:
+        """
+        Returns the next num_samples unread samples, waiting for them to be acquired if
+        needed. Returns fewer samples if the stream stops or the timeout (in seconds)
+        expires first.
+        """
+        if num_samples > len(self._ring):
+            raise ValueError("Cannot read more samples than the ring buffer size")
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._num_written - self._num_read >= num_samples
+                or not self._is_running,
+                timeout,
+            )
+            num_samples = min(num_samples, self._num_written - self._num_read)
+            samples = self._copy_from_ring(self._num_read, num_samples)
+            self._num_read += num_samples
+        return samples
+
+    def blocks(self, block_size: int = IQ_BLOCK_SIZE):
+        """Yields consecutive blocks of block_size samples until the stream stops."""
+        while True:
+            samples = self.read(block_size)
+            if len(samples):
+                yield samples
+            if len(samples) < block_size and not self._is_running:
+                return
+
+    def _copy_from_ring(self, start: int, num_samples: int) -> np.ndarray:
+        ring_size = len(self._ring)
+        first = start % ring_size
+        if first + num_samples <= ring_size:
+            return self._ring[first : first + num_samples].copy()
+        num_wrapped = first + num_samples - ring_size
+        return np.concatenate((self._ring[first:], self._ring[:num_wrapped]))
+
+    def _write_to_ring(self, samples: np.ndarray):
+        ring_size = len(self._ring)
+        first = self._num_written % ring_size
+        num_to_end = min(len(samples), ring_size - first)
+        self._ring[first : first + num_to_end] = samples[:num_to_end]
+        self._ring[: len(samples) - num_to_end] = samples[num_to_end:]
+        self._num_written += len(samples)
+
+        num_unread = self._num_written - self._num_read
+        if num_unread > ring_size:  # the oldest unread samples were overwritten
+            self.num_overflows += 1
+            self.num_dropped_samples += num_unread - ring_size
+            self._num_read = self._num_written - ring_size
+
+    def _acquire(self):
+        purge = SA_TRUE  # discard samples buffered before the stream started
+        try:
+            while self._is_running:
+                result = sa_get_IQ_data_unpacked(
+                    self._device_handle, len(self._block), purge, self._block
+                )
+                purge = SA_FALSE
+                if result["sample_loss"]:
+                    self.num_sample_losses += 1
+                with self._condition:
+                    self._write_to_ring(self._block)
+                    self._condition.notify_all()
+        except RuntimeError as error:  # raised by sa_api on device errors
+            self.error = error
+            print("IQ stream stopped: " + str(error))
+        finally:
+            with self._condition:
+                self._is_running = False
+                self._condition.notify_all()
+
+
+class RealTimeMonitor:
+    """
+    Continuous spectrum monitoring from an Sa124 in real-time mode, created by
+    Sa124.start_real_time(). A background thread pulls every frame from the device into
+    preallocated buffers and accumulates:
+        max hold: the max power seen in each frequency bin.
+        average: the mean power of each frequency bin, averaged in linear units.
+        persistence: a histogram of how often each frequency bin was at each power
+            level, with `frame_shape[0]` levels from ref_power - frame_scale to
+            ref_power.
+    The device also renders its own persistence frame, which is kept as `frame`. The
+    getters return copies, so they are safe to use while acquisition continues. reset()
+    clears the accumulated arrays.
+    """
+
+    def __init__(
+        self,
+        device_handle: int,
+        frequencies: np.ndarray,
+        frame_shape: tuple,
+        ref_power: float,
+        frame_scale: float,
+    ):
+        self.frequencies = frequencies  # in Hz
+        self.frame_shape = frame_shape  # (height, width) of the persistence frames
+        self.ref_power = ref_power  # in dBm, top of the persistence frames
+        self.frame_scale = frame_scale  # in dB, height of the persistence frames
+        self.num_frames = 0  # frames accumulated since the last reset
+        self.error = None  # exception that stopped the acquisition thread, if any
+
+        sweep_length = len(frequencies)
+        num_levels, frame_width = frame_shape
+        self._device_handle = device_handle
+        self._lock = threading.Lock()
+        self._is_running = False
+        self._thread = None
+
+        # buffers filled by the device on every frame
+        self._sweep_min = np.zeros(sweep_length, dtype=np.float32)
+        self._sweep_max = np.zeros(sweep_length, dtype=np.float32)
+        self._color_frame = np.zeros(num_levels * frame_width, dtype=np.float32)
+        self._alpha_frame = np.zeros(num_levels * frame_width, dtype=np.float32)
+
+        # accumulators, updated in place on every frame
+        self._latest = np.full(sweep_length, -np.inf)
+        self._max_hold = np.full(sweep_length, -np.inf)
+        self._power_sum = np.zeros(sweep_length)  # in mW
+        self._linear_power = np.zeros(sweep_length)  # scratch buffer, in mW
+        # the device frame width need not match the sweep, we histogram sweep bins
+        self._persistence = np.zeros((num_levels, sweep_length), dtype=np.int64)
+        self._levels = np.zeros(sweep_length, dtype=np.intp)  # scratch buffer
+        self._bins = np.arange(sweep_length)
+
+    @property
+    def is_running(self) -> bool:
+        return self._is_running
+
+    def start(self):
+        self._is_running = True
+        self._thread = threading.Thread(target=self._acquire, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._is_running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def reset(self):
+        with self._lock:
+            self._max_hold.fill(-np.inf)
+            self._power_sum.fill(0)
+            self._persistence.fill(0)
+            self.num_frames = 0
+
+    def get_latest(self) -> np.ndarray:
+        """Power in dBm of each frequency bin in the latest frame."""
+        with self._lock:
+            return self._latest.copy()
+
+    def get_max_hold(self) -> np.ndarray:
+        """Max power in dBm of each frequency bin since the last reset."""
+        with self._lock:
+            return self._max_hold.copy()
+
+    def get_average(self) -> np.ndarray:
+        """Mean power in dBm of each frequency bin since the last reset."""
+        with self._lock:
+            if not self.num_frames:
+                return np.full(len(self.frequencies), -np.inf)
+            return 10 * np.log10(self._power_sum / self.num_frames)
+
+    def get_persistence(self) -> np.ndarray:
+        """
+        Fraction of frames in which each frequency bin was at each power level, with
+        shape (num levels, num bins). Row 0 is the lowest power level.
+        """
+        with self._lock:
+            return self._persistence / max(self.num_frames, 1)
+
+    def get_frame(self) -> np.ndarray:
+        """The latest persistence frame rendered by the device, of shape frame_shape."""
+        with self._lock:
+            return self._color_frame.reshape(self.frame_shape).copy()
+
+    def _accumulate(self):
+        sweep = self._sweep_max
+        np.copyto(self._latest, sweep)
+        np.maximum(self._max_hold, sweep, out=self._max_hold)
+        np.power(10.0, sweep / 10, out=self._linear_power)
+        self._power_sum += self._linear_power
+
+        # quantise the power in each bin to a persistence level
+        num_levels = self.frame_shape[0]
+        floor = self.ref_power - self.frame_scale
+        levels = (sweep - floor) * (num_levels / self.frame_scale)
+        np.clip(levels, 0, num_levels - 1, out=levels)
+        self._levels[:] = levels
+        self._persistence[self._levels, self._bins] += 1  # bins are unique
+        self.num_frames += 1
+
+    def _acquire(self):
+        try:
+            while self._is_running:
+                sa_get_real_time_frame(
+                    self._device_handle,
+                    self._sweep_min,
+                    self._sweep_max,
+                    self._color_frame,
+                    self._alpha_frame,
+                )
+                with self._lock:
+                    self._accumulate()
+        except Exception as error:  # sa_api raises RuntimeError on device errors
+            self.error = error  # anything else would otherwise end the thread silently
+            print("Real-time acquisition stopped: " + repr(error))
+        finally:
+            self._is_running = False
@@ -7,11 +7,14 @@ from ctypes import *
 import numpy
 from pathlib import Path # changes made by Atharv are signed as 'aj'
 
+from qcrew.codebase.instruments.simulated.backends import SimulatedSaLibrary, load_library
+
 # dll must be in the same directory as this api # aj
 DLL_NAME = 'sa_api.dll' # aj
 PATH_TO_DLL = Path(__file__).resolve().parent / DLL_NAME # aj
 #salib = CDLL("sadevice/sa_api.dll") # aj
-salib = CDLL(str(PATH_TO_DLL)) # aj
+# set QCREW_BACKEND=simulated to run without the dll, see simulated/backends.py
+salib = load_library(PATH_TO_DLL, SimulatedSaLibrary)
 
 # ---------------------------------- Defines -----------------------------------
 
@@ -396,10 +399,12 @@ def sa_query_diagnostics(device):
     }
 
 @error_check
-def sa_get_sweep_32f(device):
-    sweep_length = sa_query_sweep_info(device)["sweep_length"]
-    sweep_min = numpy.zeros(sweep_length).astype(numpy.float32)
-    sweep_max = numpy.zeros(sweep_length).astype(numpy.float32)
+def sa_get_sweep_32f(device, sweep_min=None, sweep_max=None):
+    # pass in preallocated sweep_length float32 buffers to skip the sweep info query and allocations
+    if sweep_min is None or sweep_max is None:
+        sweep_length = sa_query_sweep_info(device)["sweep_length"]
+        sweep_min = numpy.zeros(sweep_length).astype(numpy.float32)
+        sweep_max = numpy.zeros(sweep_length).astype(numpy.float32)
     status = saGetSweep_32f(device, sweep_min, sweep_max)
     return {
         "status": status,
@@ -408,10 +413,12 @@ def sa_get_sweep_32f(device):
     }
 
 @error_check
-def sa_get_sweep_64f(device):
-    sweep_length = sa_query_sweep_info(device)["sweep_length"]
-    sweep_min = numpy.zeros(sweep_length).astype(numpy.float64)
-    sweep_max = numpy.zeros(sweep_length).astype(numpy.float64)
+def sa_get_sweep_64f(device, sweep_min=None, sweep_max=None):
+    # pass in preallocated sweep_length float64 buffers to skip the sweep info query and allocations
+    if sweep_min is None or sweep_max is None:
+        sweep_length = sa_query_sweep_info(device)["sweep_length"]
+        sweep_min = numpy.zeros(sweep_length).astype(numpy.float64)
+        sweep_max = numpy.zeros(sweep_length).astype(numpy.float64)
     status = saGetSweep_64f(device, sweep_min, sweep_max)
     return {
         "status": status,
@@ -420,10 +427,12 @@ def sa_get_sweep_64f(device):
     }
 
 @error_check
-def sa_get_partial_sweep_32f(device):
-    sweep_length = sa_query_sweep_info(device)["sweep_length"]
-    sweep_min = numpy.zeros(sweep_length).astype(numpy.float32)
-    sweep_max = numpy.zeros(sweep_length).astype(numpy.float32)
+def sa_get_partial_sweep_32f(device, sweep_min=None, sweep_max=None):
+    # pass in preallocated sweep_length float32 buffers to skip the sweep info query and allocations
+    if sweep_min is None or sweep_max is None:
+        sweep_length = sa_query_sweep_info(device)["sweep_length"]
+        sweep_min = numpy.zeros(sweep_length).astype(numpy.float32)
+        sweep_max = numpy.zeros(sweep_length).astype(numpy.float32)
     start = c_int(-1)
     stop = c_int(-1)
     status = saGetPartialSweep_32f(device, sweep_min, sweep_max, byref(start), byref(stop))
@@ -436,10 +445,12 @@ def sa_get_partial_sweep_32f(device):
     }
 
 @error_check
-def sa_get_partial_sweep_64f(device):
-    sweep_length = sa_query_sweep_info(device)["sweep_length"]
-    sweep_min = numpy.zeros(sweep_length).astype(numpy.float64)
-    sweep_max = numpy.zeros(sweep_length).astype(numpy.float64)
+def sa_get_partial_sweep_64f(device, sweep_min=None, sweep_max=None):
+    # pass in preallocated sweep_length float64 buffers to skip the sweep info query and allocations
+    if sweep_min is None or sweep_max is None:
+        sweep_length = sa_query_sweep_info(device)["sweep_length"]
+        sweep_min = numpy.zeros(sweep_length).astype(numpy.float64)
+        sweep_max = numpy.zeros(sweep_length).astype(numpy.float64)
     start = c_int(-1)
     stop = c_int(-1)
     status = saGetPartialSweep_64f(device, sweep_min, sweep_max, byref(start), byref(stop))
@@ -452,15 +463,17 @@ def sa_get_partial_sweep_64f(device):
     }
 
 @error_check
-def sa_get_real_time_frame(device):
-    sweep_length = sa_query_sweep_info(device)["sweep_length"]
-    query = sa_query_real_time_frame_info(device)
-    frame_width = query["frame_width"]
-    frame_height = query["frame_height"]
-    sweep_min = numpy.zeros(sweep_length).astype(numpy.float32)
-    sweep_max = numpy.zeros(sweep_length).astype(numpy.float32)
-    color_frame = numpy.zeros(frame_width * frame_height).astype(numpy.float32)
-    alpha_frame = numpy.zeros(frame_width * frame_height).astype(numpy.float32)
+def sa_get_real_time_frame(device, sweep_min=None, sweep_max=None, color_frame=None, alpha_frame=None):
+    # pass in all four preallocated float32 buffers to skip the info queries and allocations
+    if sweep_min is None or sweep_max is None or color_frame is None or alpha_frame is None:
+        sweep_length = sa_query_sweep_info(device)["sweep_length"]
+        query = sa_query_real_time_frame_info(device)
+        frame_width = query["frame_width"]
+        frame_height = query["frame_height"]
+        sweep_min = numpy.zeros(sweep_length).astype(numpy.float32)
+        sweep_max = numpy.zeros(sweep_length).astype(numpy.float32)
+        color_frame = numpy.zeros(frame_width * frame_height).astype(numpy.float32)
+        alpha_frame = numpy.zeros(frame_width * frame_height).astype(numpy.float32)
     status = saGetRealTimeFrame(device, sweep_min, sweep_max, color_frame, alpha_frame)
     return {
         "status": status,
@@ -471,9 +484,11 @@ def sa_get_real_time_frame(device):
     }
 
 @error_check
-def sa_get_IQ_32f(device):
-    return_len = sa_query_stream_info(device)["return_len"]
-    iq = numpy.zeros(return_len).astype(numpy.complex64)
+def sa_get_IQ_32f(device, iq=None):
+    # pass in a preallocated return_len complex64 buffer to skip the stream info query and allocation
+    if iq is None:
+        return_len = sa_query_stream_info(device)["return_len"]
+        iq = numpy.zeros(return_len).astype(numpy.complex64)
     status = saGetIQ_32f(device, iq)
     return {
         "status": status,
@@ -481,9 +496,11 @@ def sa_get_IQ_32f(device):
     }
 
 @error_check
-def sa_get_IQ_64f(device):
-    return_len = sa_query_stream_info(device)["return_len"]
-    iq = numpy.zeros(return_len).astype(numpy.complex128)
+def sa_get_IQ_64f(device, iq=None):
+    # pass in a preallocated return_len complex128 buffer to skip the stream info query and allocation
+    if iq is None:
+        return_len = sa_query_stream_info(device)["return_len"]
+        iq = numpy.zeros(return_len).astype(numpy.complex128)
     status = saGetIQ_64f(device, iq)
     return {
         "status": status,
@@ -491,8 +508,10 @@ def sa_get_IQ_64f(device):
     }
 
 @error_check
-def sa_get_IQ_data_unpacked(device, iq_count, purge):
-    iq_data = numpy.zeros(iq_count).astype(numpy.complex64)
+def sa_get_IQ_data_unpacked(device, iq_count, purge, iq_data=None):
+    # pass in a preallocated complex64 buffer of at least iq_count samples to skip the allocation
+    if iq_data is None:
+        iq_data = numpy.zeros(iq_count).astype(numpy.complex64)
     data_remaining = c_int(-1)
     sample_loss = c_int(-1)
     sec = c_int(-1)
@@ -0,0 +1,315 @@
+"""
+Pluggable instrument backends.
+
+The Signal Hound and Vaunix drivers call into vendor DLLs that only exist on the
+lab PCs. load_library() returns the DLL by default, or a pure Python simulation
+of it when the QCREW_BACKEND environment variable is set to "simulated", so the
+drivers and the code built on them run, and can be benchmarked, on any machine.
+The simulations sample the shared LeakageLandscape in landscape.py.
+
+Usage:
+    $ QCREW_BACKEND=simulated python mixer_tuning.py
+
+    from qcrew.codebase.instruments.simulated.landscape import LANDSCAPE
+    LANDSCAPE.add_mixer("mixer_rr", element="rr", lo_freq=8e9, int_freq=-50e6)
+    sa = Sa124(name="sa", serial_number=1)  # any serial number connects
+    sa_api.salib.sweep_latency = 0.05  # make sweeps take as long as on hardware
+"""
+
+from ctypes import c_int
+import ctypes
+import os
+import time
+
+import numpy as np
+
+from qcrew.codebase.instruments.simulated.landscape import LANDSCAPE, LeakageLandscape
+
+BACKEND_ENV_VAR = "QCREW_BACKEND"
+HARDWARE = "hardware"
+SIMULATED = "simulated"
+
+
+def is_simulated() -> bool:
+    backend = os.environ.get(BACKEND_ENV_VAR, HARDWARE)
+    if backend not in (HARDWARE, SIMULATED):
+        raise ValueError(f"{BACKEND_ENV_VAR} must be '{HARDWARE}' or '{SIMULATED}'")
+    return backend == SIMULATED
+
+
+def load_library(path, simulated_library_cls):
+    """Loads the DLL at path, or an instance of simulated_library_cls if simulating."""
+    if is_simulated():
+        return simulated_library_cls()
+    return ctypes.CDLL(str(path))
+
+
+def _get_value(arg):
+    """Unwraps c_int / c_double arguments, passes plain Python values through."""
+    return getattr(arg, "value", arg)
+
+
+def _set_value(pointer, value):
+    """Sets the value pointed to by a byref() argument."""
+    pointer._obj.value = value
+
+
+class SimulatedFunction:
+    """Stands in for a DLL function, accepts argtypes and restype like one."""
+
+    def __init__(self, call=None):
+        self.argtypes = None
+        self.restype = c_int
+        self._call = call
+
+    def __call__(self, *args):
+        return self._call(*args) if self._call is not None else 0
+
+
+class SimulatedLibrary:
+    """
+    Base class of the DLL simulations. Every `_sim_<name>` method is exposed as the DLL
+    function `<name>`, the rest of the functions of the DLL do nothing and return 0.
+    """
+
+    def __init__(self, landscape: LeakageLandscape = LANDSCAPE):
+        self.landscape = landscape
+
+    def __getattr__(self, name):
+        method = getattr(type(self), "_sim_" + name, None)
+        function = SimulatedFunction(None if method is None else method.__get__(self))
+        setattr(self, name, function)  # so argtypes and restype persist
+        return function
+
+
+# ------------------------------ Signal Hound ----------------------------------
+SA_NO_ERROR = 0
+SA_INVALID_MODE_ERR = -7
+SA_MODE_IDLE, SA_MODE_SWEEPING, SA_MODE_REAL_TIME, SA_MODE_IQ = -1, 0, 1, 2
+IQ_BASE_SAMPLE_RATE = 486111.111  # in samples per second, at decimation 1
+IQ_RETURN_LEN = 16384  # samples returned by saGetIQ
+RT_FRAME_HEIGHT = 100  # rows of the real-time persistence frame
+BIN_SIZE_PER_RBW = 0.5  # bins are half an rbw wide
+
+
+class SimulatedSaLibrary(SimulatedLibrary):
+    """
+    Simulation of sa_api.dll for one SA124 in sweep, real-time and IQ streaming modes.
+    Sweeps take `sweep_latency` seconds plus `bin_latency` per frequency bin, to mimic
+    the time the hardware spends sweeping.
+    """
+
+    def __init__(
+        self,
+        landscape: LeakageLandscape = LANDSCAPE,
+        sweep_latency: float = 0.0,
+        bin_latency: float = 0.0,
+    ):
+        super().__init__(landscape)
+        self.sweep_latency = sweep_latency  # in s
+        self.bin_latency = bin_latency  # in s
+        self.num_sweeps = 0  # sweeps and real-time frames delivered so far
+
+        self._mode = SA_MODE_IDLE
+        self._center, self._span = 6e9, 1e6
+        self._rbw = 250e3
+        self._decimation = 1
+        self._num_iq_samples = 0  # streamed since the last saInitiate
+
+    def _get_sweep_info(self):
+        bin_size = self._rbw * BIN_SIZE_PER_RBW
+        sweep_length = int(np.ceil(self._span / bin_size)) + 1
+        start_freq = self._center - (sweep_length - 1) * bin_size / 2
+        return sweep_length, start_freq, bin_size
+
+    def _sweep(self):
+        sweep_length, start_freq, bin_size = self._get_sweep_info()
+        time.sleep(self.sweep_latency + self.bin_latency * sweep_length)
+        frequencies = start_freq + np.arange(sweep_length) * bin_size
+        self.num_sweeps += 1
+        return self.landscape.get_spectrum(frequencies, self._rbw)
+
+    def _sim_saOpenDeviceBySerialNumber(self, device, serial_number):
+        _set_value(device, 0)
+        return SA_NO_ERROR
+
+    def _sim_saConfigCenterSpan(self, device, center, span):
+        self._center, self._span = _get_value(center), _get_value(span)
+        return SA_NO_ERROR
+
+    def _sim_saConfigSweepCoupling(self, device, rbw, vbw, reject):
+        self._rbw = _get_value(rbw)
+        return SA_NO_ERROR
+
+    def _sim_saConfigIQ(self, device, decimation, bandwidth):
+        self._decimation = _get_value(decimation)
+        return SA_NO_ERROR
+
+    def _sim_saInitiate(self, device, mode, flag):
+        self._mode = _get_value(mode)
+        self._num_iq_samples = 0
+        return SA_NO_ERROR
+
+    def _sim_saQuerySweepInfo(self, device, sweep_length, start_freq, bin_size):
+        for pointer, value in zip(
+            (sweep_length, start_freq, bin_size), self._get_sweep_info()
+        ):
+            _set_value(pointer, value)
+        return SA_NO_ERROR
+
+    def _sim_saGetSweep_32f(self, device, sweep_min, sweep_max):
+        if self._mode != SA_MODE_SWEEPING:
+            return SA_INVALID_MODE_ERR
+        sweep_max[:] = self._sweep()
+        sweep_min[:] = sweep_max
+        return SA_NO_ERROR
+
+    _sim_saGetSweep_64f = _sim_saGetSweep_32f
+
+    def _sim_saGetPartialSweep_32f(self, device, sweep_min, sweep_max, start, stop):
+        status = self._sim_saGetSweep_32f(device, sweep_min, sweep_max)
+        _set_value(start, 0)
+        _set_value(stop, len(sweep_max))
+        return status
+
+    _sim_saGetPartialSweep_64f = _sim_saGetPartialSweep_32f
+
+    def _sim_saQueryRealTimeFrameInfo(self, device, frame_width, frame_height):
+        _set_value(frame_width, self._get_sweep_info()[0])
+        _set_value(frame_height, RT_FRAME_HEIGHT)
+        return SA_NO_ERROR
+
+    def _sim_saGetRealTimeFrame(
+        self, device, sweep_min, sweep_max, color_frame, alpha_frame
+    ):
+        if self._mode != SA_MODE_REAL_TIME:
+            return SA_INVALID_MODE_ERR
+        sweep_max[:] = self._sweep()
+        sweep_min[:] = sweep_max
+        # the device frame only shows the latest sweep, it has no persistence
+        frame = color_frame.reshape(RT_FRAME_HEIGHT, -1)
+        rows = np.clip(sweep_max - sweep_max.min(), 0, RT_FRAME_HEIGHT - 1).astype(int)
+        frame.fill(0)
+        frame[rows, np.arange(frame.shape[1])] = 1
+        alpha_frame[:] = color_frame
+        return SA_NO_ERROR
+
+    def _sim_saQueryStreamInfo(self, device, return_len, bandwidth, samples_per_second):
+        sample_rate = IQ_BASE_SAMPLE_RATE / self._decimation
+        _set_value(return_len, IQ_RETURN_LEN)
+        _set_value(bandwidth, 0.8 * sample_rate)
+        _set_value(samples_per_second, sample_rate)
+        return SA_NO_ERROR
+
+    def _get_iq(self, iq):
+        if self._mode != SA_MODE_IQ:
+            return SA_INVALID_MODE_ERR
+        sample_rate = IQ_BASE_SAMPLE_RATE / self._decimation
+        time.sleep(len(iq) / sample_rate)  # samples arrive in real time
+        iq[:] = self.landscape.get_iq(
+            self._center, sample_rate, self._num_iq_samples, len(iq)
+        )
+        self._num_iq_samples += len(iq)
+        return SA_NO_ERROR
+
+    def _sim_saGetIQ_32f(self, device, iq):
+        return self._get_iq(iq)
+
+    _sim_saGetIQ_64f = _sim_saGetIQ_32f
+
+    def _sim_saGetIQDataUnpacked(
+        self, device, iq_data, iq_count, purge, data_remaining, sample_loss, sec, milli
+    ):
+        status = self._get_iq(iq_data[: _get_value(iq_count)])
+        now = time.time()
+        for pointer, value in zip(
+            (data_remaining, sample_loss, sec, milli),
+            (0, 0, int(now), int(now * 1e3) % 1000),
+        ):
+            _set_value(pointer, value)
+        return status
+
+    def _sim_saGetErrorString(self, status):
+        return f"simulated sa_api status {status}".encode()
+
+
+# ---------------------------------- Vaunix ------------------------------------
+LMS_MIN_FREQUENCY = 4e9  # in Hz, LMS-802
+LMS_MAX_FREQUENCY = 8e9  # in Hz
+LMS_MIN_POWER = -40  # in dBm
+LMS_MAX_POWER = 20  # in dBm, covers the LO powers used on our stages
+LMS_FREQUENCY_UNIT = 10  # in Hz, frequencies are encoded in 10Hz steps
+LMS_POWER_UNIT = 0.25  # in dB, power levels are encoded in 0.25dB steps
+
+
+class SimulatedLabBrickLibrary(SimulatedLibrary):
+    """
+    Simulation of vnx_fmsynth.dll. It finds one LabBrick per `lo_serial_number` of the
+    landscape mixers, plus the serial numbers in `serial_numbers`, and sets the LO of
+    the mixers they drive.
+    """
+
+    def __init__(self, landscape: LeakageLandscape = LANDSCAPE):
+        super().__init__(landscape)
+        self.serial_numbers = []  # extra LabBricks not driving any mixer
+        self._devices = {}  # device id: state dict
+
+    def _get_serial_numbers(self):
+        serial_numbers = [
+            mixer.lo_serial_number
+            for mixer in self.landscape.mixers.values()
+            if mixer.lo_serial_number is not None
+        ]
+        return list(dict.fromkeys(serial_numbers + self.serial_numbers))
+
+    def _sim_fnLMS_GetNumDevices(self):
+        return len(self._get_serial_numbers())
+
+    def _sim_fnLMS_GetDevInfo(self, device_ids):
+        for index, serial_number in enumerate(self._get_serial_numbers()):
+            device_id = index + 1
+            device_ids[index] = device_id
+            self._devices.setdefault(
+                device_id,
+                {"serial_number": serial_number, "frequency": 0, "level": 0},
+            )
+        return len(self._devices)
+
+    def _sim_fnLMS_GetSerialNumber(self, device_id):
+        return self._devices[device_id]["serial_number"]
+
+    def _sim_fnLMS_GetMinFreq(self, device_id):
+        return int(LMS_MIN_FREQUENCY / LMS_FREQUENCY_UNIT)
+
+    def _sim_fnLMS_GetMaxFreq(self, device_id):
+        return int(LMS_MAX_FREQUENCY / LMS_FREQUENCY_UNIT)
+
+    def _sim_fnLMS_GetMinPwr(self, device_id):
+        return int(LMS_MIN_POWER / LMS_POWER_UNIT)
+
+    def _sim_fnLMS_GetMaxPwr(self, device_id):
+        return int(LMS_MAX_POWER / LMS_POWER_UNIT)
+
+    def _sim_fnLMS_SetFrequency(self, device_id, frequency):
+        device = self._devices[device_id]
+        device["frequency"] = frequency
+        self.landscape.set_lo(
+            device["serial_number"], frequency=frequency * LMS_FREQUENCY_UNIT
+        )
+        return 0
+
+    def _sim_fnLMS_GetFrequency(self, device_id):
+        return self._devices[device_id]["frequency"]
+
+    def _sim_fnLMS_SetPowerLevel(self, device_id, level):
+        self._devices[device_id]["level"] = level
+        return 0
+
+    def _sim_fnLMS_GetPowerLevel(self, device_id):
+        # the device reports attenuation from max power in 0.25dB steps
+        max_level = int(LMS_MAX_POWER / LMS_POWER_UNIT)
+        return max_level - self._devices[device_id]["level"]
+
+    def _sim_fnLMS_SetRFOn(self, device_id, is_on):
+        self.landscape.set_lo(self._devices[device_id]["serial_number"], is_on=is_on)
+        return 0
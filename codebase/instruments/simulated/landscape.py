@@ -0,0 +1,248 @@
+"""
+Simulated IQ mixer leakage landscape.
+
+Models what a spectrum analyser sees at the output of the IQ mixers of a setup
+while the OPX plays a continuous IF tone to each element. Every mixer has a
+hidden DC offset and gain/phase imbalance. The LO leakage depends on how far
+the DC offsets applied by the OPX are from the hidden ones, and the image
+sideband leakage depends on how well the applied correction matrix undoes the
+hidden imbalance. The simulated SA124 backend samples this landscape, and the
+simulated LabBrick backend switches and tunes the LO of its mixers.
+
+Usage:
+    mixer = LANDSCAPE.add_mixer(
+        "mixer_qubit", element="qubit", lo_freq=5e9, int_freq=-50e6,
+        i_offset=0.012, q_offset=-0.004, gain_offset=0.02, phase_offset=0.03,
+    )
+    qm = SimulatedQM(LANDSCAPE)  # stands in for the QuantumMachine in tuners
+"""
+
+import numpy as np
+
+from qcrew.codebase.utils import mixer_correction_table
+
+# ------------------------------ Default model ---------------------------------
+NOISE_FLOOR = -100.0  # in dBm, displayed average noise level at 250kHz rbw
+NOISE_STDEV = 0.5  # in dB, jitter of the noise floor from sweep to sweep
+SIGNAL_POWER = -10.0  # in dBm, power of the wanted sideband
+IF_AMPLITUDE = 0.25  # in V, amplitude of the IF tone played by the OPX
+LO_ISOLATION = -70.0  # in dBc, LO leakage left with ideal DC offsets
+IMAGE_ISOLATION = -70.0  # in dBc, image leakage left with ideal correction
+REFERENCE_RBW = 250e3  # in Hz, rbw at which NOISE_FLOOR is specified
+
+
+def get_correction_matrix(gain_offset: float, phase_offset: float) -> np.ndarray:
+    """2x2 mixer correction matrix, as applied by the OPX, for the given imbalance."""
+    matrix = mixer_correction_table.get_correction_matrix(gain_offset, phase_offset)
+    return np.reshape(matrix, (2, 2))
+
+
+class SimulatedMixer:
+    """
+    An IQ mixer driven by an LO and by the IF tone the OPX plays to `element`. The
+    hidden offsets are the values a perfect tuner would find, that is, the DC offsets
+    and the gain/phase offsets of the correction matrix that null the LO and image
+    leakage.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        element: str,
+        lo_freq: float,
+        int_freq: float,
+        i_offset: float = 0.0,
+        q_offset: float = 0.0,
+        gain_offset: float = 0.0,
+        phase_offset: float = 0.0,
+        gain_slope: float = 0.0,
+        phase_slope: float = 0.0,
+        lo_serial_number: int = None,
+    ):
+        self.name = name
+        self.element = element
+        self.lo_freq = lo_freq  # in Hz, set by the simulated LabBrick if any
+        self.int_freq = int_freq  # in Hz, changed by SimulatedQM
+        self.lo_serial_number = lo_serial_number  # LabBrick driving this mixer
+        self.is_lo_on = True
+        self.is_playing = False  # True while a SimulatedJob plays to the element
+
+        # hidden imperfections of the mixer, offsets as in the config mixer_offsets
+        # the gain and phase offsets drift linearly with the IF, by slope per Hz
+        self.offsets = {
+            "I": i_offset,
+            "Q": q_offset,
+            "G": gain_offset,
+            "P": phase_offset,
+        }
+        self.dc_offset = complex(i_offset, q_offset)
+        self.reference_int_freq = int_freq  # IF at which G and P are gain/phase_offset
+        self.slopes = {"G": gain_slope, "P": phase_slope}
+
+        # settings applied by the OPX, the OPX keeps a correction matrix per IF
+        self.applied_dc_offset = 0j
+        self.applied_corrections = {}  # int_freq: correction matrix
+
+    def get_offsets_at(self, int_freq: float) -> tuple:
+        """The hidden (gain offset, phase offset) of the mixer at the given IF."""
+        detuning = int_freq - self.reference_int_freq
+        gain_offset = self.offsets["G"] + self.slopes["G"] * detuning
+        phase_offset = self.offsets["P"] + self.slopes["P"] * detuning
+        return gain_offset, phase_offset
+
+    @property
+    def imbalance(self) -> np.ndarray:
+        return np.linalg.inv(get_correction_matrix(*self.get_offsets_at(self.int_freq)))
+
+    @property
+    def applied_correction(self) -> np.ndarray:
+        """Correction matrix the OPX applies at the current IF, identity if none set."""
+        return self.applied_corrections.get(int(self.int_freq), np.eye(2))
+
+    def get_sideband_amplitudes(self) -> tuple:
+        """
+        Complex amplitudes of the wanted (lo + if) and image (lo - if) sidebands,
+        relative to the IF tone.
+        """
+        # I = a cos + b sin and Q = c cos + d sin, split into e^(+jwt) and e^(-jwt)
+        (a, b), (c, d) = self.imbalance @ self.applied_correction
+        wanted = ((a + d) + 1j * (c - b)) / 2
+        image = ((a - d) + 1j * (c + b)) / 2
+        return wanted, image
+
+    def get_tones(self) -> list:
+        """(frequency, power in dBm) of the LO leakage and of the two sidebands."""
+        if not self.is_lo_on:
+            return []
+        residual = abs(self.applied_dc_offset - self.dc_offset) / IF_AMPLITUDE
+        lo_ratio = residual**2 + 10 ** (LO_ISOLATION / 10)
+        tones = [(self.lo_freq, SIGNAL_POWER + 10 * np.log10(lo_ratio))]
+        if self.is_playing:
+            wanted, image = self.get_sideband_amplitudes()
+            image_ratio = abs(image) ** 2 + 10 ** (IMAGE_ISOLATION / 10)
+            image_power = SIGNAL_POWER + 10 * np.log10(image_ratio)
+            wanted_power = SIGNAL_POWER + 20 * np.log10(max(abs(wanted), 1e-9))
+            tones.append((self.lo_freq + self.int_freq, wanted_power))
+            tones.append((self.lo_freq - self.int_freq, image_power))
+        return tones
+
+
+class LeakageLandscape:
+    """
+    The mixers of a setup as seen by a spectrum analyser. get_spectrum() returns the
+    power in each frequency bin of a sweep, with every tone drawn as a gaussian peak one
+    rbw wide on top of a noisy floor that scales with the rbw. `seed` makes the noise
+    reproducible.
+    """
+
+    def __init__(
+        self,
+        noise_floor: float = NOISE_FLOOR,
+        noise_stdev: float = NOISE_STDEV,
+        seed: int = None,
+    ):
+        self.noise_floor = noise_floor  # in dBm at REFERENCE_RBW
+        self.noise_stdev = noise_stdev  # in dB
+        self.mixers = {}  # mixer name: SimulatedMixer
+        self._rng = np.random.default_rng(seed)
+
+    def add_mixer(self, name: str, **parameters) -> SimulatedMixer:
+        """Adds a SimulatedMixer, see its __init__ for parameters, and returns it."""
+        self.mixers[name] = SimulatedMixer(name, **parameters)
+        return self.mixers[name]
+
+    def get_mixer_by_element(self, element: str) -> SimulatedMixer:
+        for mixer in self.mixers.values():
+            if mixer.element == element:
+                return mixer
+        raise ValueError(f"No simulated mixer drives element '{element}'")
+
+    def set_lo(self, serial_number: int, frequency: float = None, is_on: bool = None):
+        """Updates the mixers whose LO is the LabBrick with the given serial number."""
+        for mixer in self.mixers.values():
+            if mixer.lo_serial_number == serial_number:
+                mixer.lo_freq = mixer.lo_freq if frequency is None else frequency
+                mixer.is_lo_on = mixer.is_lo_on if is_on is None else is_on
+
+    def get_spectrum(self, frequencies: np.ndarray, rbw: float) -> np.ndarray:
+        """Power in dBm of each frequency bin, for a sweep at the given rbw."""
+        floor = self.noise_floor + 10 * np.log10(rbw / REFERENCE_RBW)
+        noise = self._rng.normal(floor, self.noise_stdev, len(frequencies))
+        power = 10 ** (noise / 10)  # in mW
+        sigma = rbw / (2 * np.sqrt(2 * np.log(2)))  # rbw is the full width half max
+        for mixer in self.mixers.values():
+            for freq, tone_power in mixer.get_tones():
+                if abs(freq - frequencies[0]) > 1e3 * rbw + np.ptp(frequencies):
+                    continue  # too far out of the sweep to matter
+                shape = np.exp(-0.5 * ((frequencies - freq) / sigma) ** 2)
+                power += 10 ** (tone_power / 10) * shape
+        return 10 * np.log10(power)
+
+    def get_iq(
+        self, center: float, samples_per_second: float, start: int, num_samples: int
+    ) -> np.ndarray:
+        """
+        Complex baseband samples, in sqrt(mW), of the tones around `center`. `start` is
+        the index of the first sample in the stream, so that consecutive calls are phase
+        continuous.
+        """
+        times = (start + np.arange(num_samples)) / samples_per_second
+        noise_power = 10 ** (self.noise_floor / 10) * samples_per_second / REFERENCE_RBW
+        scale = np.sqrt(noise_power / 2)
+        iq = self._rng.normal(0, scale, num_samples)
+        iq = iq + 1j * self._rng.normal(0, scale, num_samples)
+        for mixer in self.mixers.values():
+            for freq, tone_power in mixer.get_tones():
+                offset = freq - center
+                if abs(offset) < samples_per_second / 2:
+                    amplitude = np.sqrt(10 ** (tone_power / 10))
+                    iq += amplitude * np.exp(2j * np.pi * offset * times)
+        return iq.astype(np.complex64)
+
+
+class SimulatedJob:
+    """Returned by SimulatedQM.execute(), stops the IF tones when halted."""
+
+    def __init__(self, mixers: list):
+        self._mixers = mixers
+
+    def halt(self):
+        for mixer in self._mixers:
+            mixer.is_playing = False
+
+
+class SimulatedQM:
+    """
+    Stands in for a QuantumMachine in mixer tuning code. It applies DC offsets and mixer
+    corrections to the mixers of a LeakageLandscape. QUA programs are not simulated:
+    execute() plays the IF tone to every element of the landscape until the returned job
+    is halted.
+    """
+
+    def __init__(self, landscape: LeakageLandscape):
+        self.landscape = landscape
+
+    def execute(self, program=None) -> SimulatedJob:
+        mixers = list(self.landscape.mixers.values())
+        for mixer in mixers:
+            mixer.is_playing = True
+        return SimulatedJob(mixers)
+
+    def set_output_dc_offset_by_element(self, element: str, input: str, offset: float):
+        mixer = self.landscape.get_mixer_by_element(element)
+        if input == "I":
+            mixer.applied_dc_offset = complex(offset, mixer.applied_dc_offset.imag)
+        elif input == "Q":
+            mixer.applied_dc_offset = complex(mixer.applied_dc_offset.real, offset)
+        else:
+            raise ValueError(f"Input must be 'I' or 'Q', got '{input}'")
+
+    def set_mixer_correction(self, mixer: str, int_freq: int, lo_freq: int, values):
+        corrections = self.landscape.mixers[mixer].applied_corrections
+        corrections[int(int_freq)] = np.reshape(values, (2, 2))
+
+    def set_intermediate_frequency(self, element: str, freq: float):
+        self.landscape.get_mixer_by_element(element).int_freq = freq
+
+
+LANDSCAPE = LeakageLandscape()  # sampled by the simulated backends by default
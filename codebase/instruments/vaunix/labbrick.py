@@ -2,15 +2,20 @@
 Python driver for Vaunix Signal Generator LMS (LabBrick).
 """
 # --------------------------------- Imports ------------------------------------
-from ctypes import CDLL, c_int
+from ctypes import c_int
 from pathlib import Path
 
 from qcrew.codebase.instruments.instrument import PhysicalInstrument
+from qcrew.codebase.instruments.simulated.backends import (
+    SimulatedLabBrickLibrary,
+    load_library,
+)
 
 # --------------------------------- Driver -------------------------------------
 DLL_NAME = "vnx_fmsynth.dll"  # dll must be in the same directory as this driver
 PATH_TO_DLL = Path(__file__).resolve().parent / DLL_NAME  # returns Path object
-VNX = CDLL(str(PATH_TO_DLL))  # cast Path to string
+# set QCREW_BACKEND=simulated to run without the dll, see simulated/backends.py
+VNX = load_library(PATH_TO_DLL, SimulatedLabBrickLibrary)
 
 # --------------------------------- Globals ------------------------------------
 IS_TEST_MODE = False  # we are using actual hardware
@@ -0,0 +1,21 @@
+"""
+Sets up imports for the tests. The repo is imported both as the `codebase` package,
+from its root, and as `qcrew.codebase`, whatever the name of the checkout. The
+instruments are driven by their simulated backends, so no hardware or vendor DLLs
+are needed.
+"""
+
+import os
+import sys
+import types
+from pathlib import Path
+
+os.environ.setdefault("QCREW_BACKEND", "simulated")
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+if "qcrew" not in sys.modules:
+    qcrew = types.ModuleType("qcrew")
+    qcrew.__path__ = [str(ROOT)]
+    sys.modules["qcrew"] = qcrew
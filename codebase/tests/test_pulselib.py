@@ -0,0 +1,195 @@
+""" Tests of waveform samples, their compression and integration weights """
+
+import numpy as np
+import pytest
+
+from codebase.utils import pulselib
+
+
+# ------------------------------ Samples cache ---------------------------------
+def test_equal_waveforms_share_one_read_only_array():
+    first = pulselib.ArbitraryWaveform(
+        name="first", func="gauss_fn", max_amp=0.2, sigma=50, multiple_of_sigma=4
+    )
+    second = pulselib.ArbitraryWaveform(
+        name="second", func="gauss_fn", multiple_of_sigma=4, sigma=50, max_amp=0.2
+    )
+    assert first.key == second.key
+    samples = first.get_samples()
+    assert second.get_samples() is samples
+    assert samples.dtype == pulselib.SAMPLE_DTYPE
+    assert not samples.flags.writeable
+    with pytest.raises(ValueError):
+        samples[0] = 1.0
+
+
+def test_param_change_gives_new_samples():
+    waveform = pulselib.ArbitraryWaveform(
+        name="wf", func="cosine_fn", max_amp=0.2, length=100
+    )
+    key, samples = waveform.key, waveform.get_samples()
+    waveform.func_params["max_amp"] = 0.1
+    assert waveform.key != key
+    assert np.allclose(waveform.get_samples(), samples / 2)
+
+
+def test_constant_waveform_samples_are_a_float():
+    assert pulselib.ConstantWaveform(name="c", amp=0.1).get_samples() == 0.1
+
+
+def test_clear_samples_cache():
+    waveform = pulselib.ArbitraryWaveform(
+        name="wf", func="cosine_fn", max_amp=0.2, length=100
+    )
+    samples = waveform.get_samples()
+    assert waveform.get_samples() is samples
+    pulselib.clear_samples_cache()
+    assert waveform.get_samples() is not samples
+    assert np.array_equal(waveform.get_samples(), samples)
+
+
+# ---------------------------- Sample compression ------------------------------
+def play(stored, decimation: int, num_samples: int) -> np.ndarray:
+    """The OPX playback of stored samples, computed one ns at a time."""
+    played = np.empty(num_samples)
+    for t in range(num_samples):
+        index, remainder = divmod(t, decimation)
+        if index + 1 < len(stored):
+            step = stored[index + 1] - stored[index]
+            played[t] = stored[index] + step * remainder / decimation
+        else:  # the last sample is held until the end of the pulse
+            played[t] = stored[-1]
+    return played
+
+
+@pytest.mark.parametrize(
+    "func, params, ratio",
+    [
+        ("gauss_fn", dict(max_amp=0.25, sigma=1000, multiple_of_sigma=4), 2),
+        ("gauss_fn", dict(max_amp=0.25, sigma=2000, multiple_of_sigma=4), 5),
+        ("cosine_fn", dict(max_amp=0.25, length=2000), 16),
+        (
+            "flat_top_gauss_fn",
+            dict(max_amp=0.25, flat_length=2000, sigma=100, multiple_of_sigma=4),
+            1,
+        ),
+    ],
+)
+def test_compression_ratio_and_played_error(func, params, ratio):
+    samples = pulselib.func_map[func](**params)
+    compressed = pulselib.compress_samples(samples)
+    assert compressed.ratio == ratio
+    assert compressed.num_original == len(samples)
+    assert len(samples) % compressed.decimation == 0
+
+    played = play(compressed.samples, compressed.decimation, len(samples))
+    error = np.max(np.abs(played - samples))
+    assert error <= pulselib.DEFAULT_MAX_ERROR
+    assert error == pytest.approx(compressed.error, abs=1e-7)
+    assert np.allclose(compressed.get_played_samples(), played, atol=1e-7)
+
+
+@pytest.mark.parametrize("max_error", [1e-5, 1e-4, 1e-3, 1e-2])
+def test_compression_stays_within_max_error(max_error):
+    samples = pulselib.cosine_fn(max_amp=0.4, length=4000)
+    compressed = pulselib.compress_samples(samples, max_error)
+    assert len(compressed.samples) >= pulselib.MIN_COMPRESSED_SAMPLES
+    played = play(compressed.samples, compressed.decimation, len(samples))
+    assert np.max(np.abs(played - samples)) <= max_error
+
+
+def test_looser_max_error_compresses_more():
+    samples = pulselib.cosine_fn(max_amp=0.4, length=4000)
+    ratios = [
+        pulselib.compress_samples(samples, max_error).ratio
+        for max_error in (1e-5, 1e-4, 1e-3)
+    ]
+    assert ratios == sorted(ratios) and ratios[0] < ratios[-1]
+
+
+def test_compressed_samples_are_cached_per_max_error():
+    waveform = pulselib.DEFAULT_GAUSS_WF
+    compressed = waveform.get_compressed_samples()
+    assert waveform.get_compressed_samples() is compressed
+    assert waveform.get_compressed_samples(1e-3) is not compressed
+    assert compressed.ratio == 2
+
+
+# ------------------------- Integration weights --------------------------------
+def test_segments_are_kept_as_given():
+    weights = pulselib.IntegrationWeights(
+        "iw", cosine=[(1.0, 200), (0.5, 800)], sine=[(0.0, 1000)]
+    )
+    assert weights.cosine == ((1.0, 200), (0.5, 800))
+    assert weights.sine == ((0.0, 1000),)
+    assert weights.length == 1000
+    assert weights.get_config() == {
+        "cosine": [(1.0, 200), (0.5, 800)],
+        "sine": [(0.0, 1000)],
+    }
+    assert weights.get_config() is weights.get_config()
+
+
+def test_cycle_values_are_merged_into_segments():
+    cosine = [1.0] * 50 + [0.5] * 25
+    sine = [0.0] * 75
+    weights = pulselib.IntegrationWeights("optw", cosine=cosine, sine=sine)
+    assert weights.cosine == ((1.0, 200), (0.5, 100))
+    assert weights.sine == ((0.0, 300),)
+    segments = pulselib.IntegrationWeights(
+        "optw", cosine=[(1.0, 200), (0.5, 100)], sine=[(0.0, 300)]
+    )
+    assert weights.key == segments.key
+
+
+def test_cycle_values_within_max_error_are_merged():
+    cosine = [1.0, 1.0002, 0.9998, 1.0001, 0.5]
+    weights = pulselib.IntegrationWeights(
+        "optw", cosine=cosine, sine=[0.0] * 5, max_error=2e-4
+    )
+    (value, duration), last = weights.cosine
+    assert duration == 4 * pulselib.CLOCK_CYCLE and last == (0.5, 4)
+    assert all(abs(value - v) <= 2e-4 for v in cosine[:4])
+
+    exact = pulselib.IntegrationWeights("optw", cosine=cosine, sine=[0.0] * 5)
+    assert len(exact.cosine) == len(cosine)
+
+
+@pytest.mark.parametrize("duration", [0, -4, 6])
+def test_invalid_segment_durations_raise(duration):
+    with pytest.raises(ValueError):
+        pulselib.IntegrationWeights("iw", cosine=[(1.0, duration)], sine=[])
+
+
+def test_default_weights_follow_the_pulse_length():
+    pulse = pulselib.MeasurementPulse(
+        name="readout", length=1000, waveforms={"I": pulselib.DEFAULT_CONSTANT_WF}
+    )
+    weights = pulse.integration_weights
+    assert sorted(weights) == ["iw1", "iw2", "optw1", "optw2"]
+    assert weights["iw1"].cosine == ((1.0, 1000),)
+    assert weights["iw2"].sine == ((1.0, 1000),)
+    assert pulse.integration_weights["iw1"] is weights["iw1"]
+
+    pulse.length = 2002  # weights cover whole clock cycles only
+    assert pulse.integration_weights["iw1"].cosine == ((1.0, 2000),)
+
+
+def test_pulses_shorter_than_a_clock_cycle_get_empty_weights():
+    pulse = pulselib.MeasurementPulse(
+        name="readout", length=3, waveforms={"I": pulselib.DEFAULT_CONSTANT_WF}
+    )
+    for weights in pulse.integration_weights.values():
+        assert weights.cosine == weights.sine == ()
+        assert weights.length == 0
+        assert weights.get_config() == {"cosine": [], "sine": []}
+
+
+def test_custom_weights_take_precedence():
+    pulse = pulselib.MeasurementPulse(
+        name="readout", length=1000, waveforms={"I": pulselib.DEFAULT_CONSTANT_WF}
+    )
+    optimal = pulselib.IntegrationWeights("optw1", cosine=[0.5] * 250, sine=[0.0] * 250)
+    pulse.add_integration_weights(optimal)
+    assert pulse.integration_weights["optw1"] is optimal
+    assert pulse.integration_weights["optw1"].cosine == ((0.5, 1000),)
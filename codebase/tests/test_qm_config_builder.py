@@ -0,0 +1,109 @@
+""" Tests of the fragment caching of the incremental QM config builder """
+
+import pytest
+
+from codebase.instruments import QuantumElement
+from codebase.instruments.quantum_machines.qm_config_builder import (
+    QmConfigBuilder,
+    build_qm_config,
+)
+from codebase.utils import pulselib
+
+
+@pytest.fixture
+def elements():
+    gauss_wf = pulselib.ArbitraryWaveform(
+        name="gauss_wf", func="gauss_fn", max_amp=0.2, sigma=100, multiple_of_sigma=4
+    )
+    gauss_pulse = pulselib.Pulse(
+        name="gauss_pulse", length=400, waveforms={"I": gauss_wf, "Q": pulselib.ZERO_WF}
+    )
+    readout_pulse = pulselib.MeasurementPulse(
+        name="readout_pulse",
+        length=1000,
+        waveforms={"I": pulselib.DEFAULT_CONSTANT_WF, "Q": pulselib.ZERO_WF},
+    )
+    qubit = QuantumElement(
+        name="qubit",
+        lo_freq=5e9,
+        int_freq=-50e6,
+        ports={"I": 1, "Q": 2},
+        operations={"CW": pulselib.DEFAULT_CW_PULSE, "gaussian": gauss_pulse},
+        mixer=QuantumElement(name="mixer_qubit"),
+    )
+    rr = QuantumElement(
+        name="rr",
+        lo_freq=8e9,
+        int_freq=-50e6,
+        ports={"I": 3, "Q": 4, "out": 1},
+        time_of_flight=180,
+        smearing=0,
+        operations={"CW": pulselib.DEFAULT_CW_PULSE, "readout": readout_pulse},
+        mixer=QuantumElement(name="mixer_rr"),
+    )
+    return qubit, rr
+
+
+def normalise(config: dict) -> str:
+    return repr(sorted((section, repr(entries)) for section, entries in config.items()))
+
+
+def test_build_matches_full_build(elements):
+    builder = QmConfigBuilder()
+    assert normalise(builder.build(set(elements))) == normalise(
+        build_qm_config(set(elements))
+    )
+
+
+def test_unchanged_elements_reuse_all_fragments(elements):
+    builder = QmConfigBuilder()
+    config = builder.build(set(elements))
+    assert builder.num_fragments_built > 0
+
+    rebuilt = builder.build(set(elements))
+    assert builder.num_fragments_built == 0
+    assert builder.diff == dict()
+    assert rebuilt["elements"]["qubit"] is config["elements"]["qubit"]
+    assert rebuilt["waveforms"] == config["waveforms"]
+
+
+def test_int_freq_change_rebuilds_element_and_mixer(elements):
+    qubit, rr = elements
+    builder = QmConfigBuilder()
+    config = builder.build({qubit, rr})
+
+    qubit.int_freq = -60e6
+    rebuilt = builder.build({qubit, rr})
+    assert builder.num_fragments_built == 2
+    assert builder.diff == {"elements": ["qubit"], "mixers": ["mixer_qubit"]}
+    assert rebuilt["elements"]["qubit"]["intermediate_frequency"] == -60e6
+    assert rebuilt["elements"]["rr"] is config["elements"]["rr"]
+    assert normalise(rebuilt) == normalise(build_qm_config({qubit, rr}))
+
+
+def test_waveform_param_change_rebuilds_its_samples(elements):
+    qubit, rr = elements
+    builder = QmConfigBuilder()
+    config = builder.build({qubit, rr})
+    samples = config["waveforms"]["gauss_wf"]["samples"]
+
+    qubit.operations["gaussian"].waveforms["I"].func_params["max_amp"] = 0.1
+    rebuilt = builder.build({qubit, rr})
+    assert builder.changed_sections == ["waveforms"]
+    assert builder.diff["waveforms"] == ["gauss_wf"]
+    assert max(rebuilt["waveforms"]["gauss_wf"]["samples"]) == pytest.approx(
+        max(samples) / 2
+    )
+
+
+def test_pulse_length_change_rebuilds_pulse_and_weights(elements):
+    qubit, rr = elements
+    builder = QmConfigBuilder()
+    builder.build({qubit, rr})
+
+    rr.operations["readout"].length = 2000
+    rebuilt = builder.build({qubit, rr})
+    assert "readout_pulse" in builder.diff["pulses"]
+    assert rebuilt["pulses"]["readout_pulse"]["length"] == 2000
+    assert rebuilt["integration_weights"]["iw1"]["cosine"] == [(1.0, 2000)]
+    assert normalise(rebuilt) == normalise(build_qm_config({qubit, rr}))
@@ -0,0 +1,135 @@
+""" Tests of the mapping of QM config differences to QM API calls """
+
+import copy
+
+import pytest
+
+from codebase.instruments.quantum_machines.qm_config_diff import ConfigDiff, update_qm
+
+CONFIG = {
+    "version": 1,
+    "controllers": {
+        "con1": {
+            "type": "opx1",
+            "analog_outputs": {1: {"offset": 0.0}, 2: {"offset": 0.0}},
+            "analog_inputs": {1: {"offset": 0.0}},
+        }
+    },
+    "elements": {
+        "qubit": {
+            "mixInputs": {
+                "I": ("con1", 1),
+                "Q": ("con1", 2),
+                "lo_frequency": 5e9,
+                "mixer": "mixer_qubit",
+            },
+            "intermediate_frequency": -50e6,
+            "operations": {"CW": "CW"},
+        },
+        "rr": {
+            "singleInput": {"port": ("con1", 3)},
+            "outputs": {"out1": ("con1", 1)},
+            "intermediate_frequency": -50e6,
+            "operations": {"CW": "CW"},
+        },
+    },
+    "pulses": {"CW": {"operation": "control", "length": 1000}},
+    "waveforms": {"constant_wf": {"type": "constant", "sample": 0.25}},
+    "mixers": {
+        "mixer_qubit": [
+            {
+                "intermediate_frequency": -50e6,
+                "lo_frequency": 5e9,
+                "correction": (1.0, 0.0, 0.0, 1.0),
+            }
+        ]
+    },
+}
+
+
+class RecordingQM:
+    """Records the QM API calls made on it."""
+
+    def __init__(self):
+        self.calls = list()
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((name, args))
+
+
+@pytest.fixture
+def new_config():
+    return copy.deepcopy(CONFIG)
+
+
+def test_equal_configs_have_empty_diff(new_config):
+    assert ConfigDiff(CONFIG, new_config).is_empty
+
+
+def test_int_freq_change_maps_to_set_intermediate_frequency(new_config):
+    new_config["elements"]["qubit"]["intermediate_frequency"] = -60e6
+    new_config["mixers"]["mixer_qubit"][0]["intermediate_frequency"] = -60e6
+    diff = ConfigDiff(CONFIG, new_config)
+    assert not diff.requires_reopen
+    assert diff.updates == [
+        ("set_intermediate_frequency", ("qubit", -60e6)),
+        ("set_mixer_correction", ("mixer_qubit", -60e6, 5e9, (1.0, 0.0, 0.0, 1.0))),
+    ]
+
+
+def test_dc_offset_changes_map_to_element_ports(new_config):
+    controller = new_config["controllers"]["con1"]
+    controller["analog_outputs"][2]["offset"] = 0.01
+    controller["analog_inputs"][1]["offset"] = 0.02
+    diff = ConfigDiff(CONFIG, new_config)
+    assert sorted(diff.updates) == [
+        ("set_input_dc_offset_by_element", ("rr", "out1", 0.02)),
+        ("set_output_dc_offset_by_element", ("qubit", "Q", 0.01)),
+    ]
+
+
+def test_mixer_correction_change_maps_to_set_mixer_correction(new_config):
+    new_config["mixers"]["mixer_qubit"][0]["correction"] = (1.01, 0.02, 0.02, 0.99)
+    diff = ConfigDiff(CONFIG, new_config)
+    assert diff.updates == [
+        ("set_mixer_correction", ("mixer_qubit", -50e6, 5e9, (1.01, 0.02, 0.02, 0.99)))
+    ]
+
+
+@pytest.mark.parametrize(
+    "path, value",
+    [
+        (("pulses", "CW", "length"), 2000),
+        (("waveforms", "constant_wf", "sample"), 0.2),
+        (("elements", "qubit", "operations"), {"CW": "CW", "pi": "CW"}),
+        (("elements", "qubit", "mixInputs", "lo_frequency"), 6e9),
+    ],
+)
+def test_structural_changes_require_reopen(new_config, path, value):
+    *keys, last = path
+    entry = new_config
+    for key in keys:
+        entry = entry[key]
+    entry[last] = value
+    diff = ConfigDiff(CONFIG, new_config)
+    assert diff.requires_reopen
+    with pytest.raises(RuntimeError):
+        diff.apply(RecordingQM())
+
+
+def test_apply_calls_qm_methods(new_config):
+    new_config["elements"]["rr"]["intermediate_frequency"] = -40e6
+    qm = RecordingQM()
+    ConfigDiff(CONFIG, new_config).apply(qm)
+    assert qm.calls == [("set_intermediate_frequency", ("rr", -40e6))]
+
+
+def test_update_qm_reopens_only_for_structural_changes(new_config):
+    qmm, qm = RecordingQM(), RecordingQM()
+    new_config["elements"]["rr"]["intermediate_frequency"] = -40e6
+    update_qm(qmm, qm, CONFIG, new_config)
+    assert qmm.calls == [] and len(qm.calls) == 1
+
+    new_config["pulses"]["CW"]["length"] = 2000
+    update_qm(qmm, qm, CONFIG, new_config)
+    assert qmm.calls == [("open_qm", (new_config,))]
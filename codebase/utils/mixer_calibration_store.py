@@ -0,0 +1,198 @@
+"""Persistent store of mixer calibrations, looked up by element, LO, IF and LO power"""
+
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+
+# calibrations are interpolated from neighbours within this distance, measured in
+# units of these scales in (LO freq, IF) space
+LO_FREQ_SCALE = 100e6  # in Hz
+INT_FREQ_SCALE = 20e6  # in Hz
+LO_POWER_TOLERANCE = 1.0  # in dB, only calibrations at the same LO power are used
+MAX_NEIGHBOURS = 4  # calibrations averaged by an interpolated lookup
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS calibrations (
+    element TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    lo_freq REAL NOT NULL,
+    int_freq REAL NOT NULL,
+    lo_power REAL,
+    x REAL NOT NULL,
+    y REAL NOT NULL,
+    leakage REAL NOT NULL,
+    timestamp REAL NOT NULL,
+    h11 REAL,
+    h12 REAL,
+    h22 REAL
+)
+"""
+# hessian of the leakage bowl fitted by the tuner, NULL if it had none, added to
+# stores created before it was kept
+HESSIAN_COLUMNS = ("h11", "h12", "h22")
+CREATE_INDEX = """
+CREATE INDEX IF NOT EXISTS calibrations_by_element ON calibrations (element, kind)
+"""
+
+
+def get_distances(lo_freqs, int_freqs, lo_freq: float, int_freq: float) -> np.ndarray:
+    """Distances of the calibrations from (lo_freq, int_freq) in units of the scales."""
+    return np.hypot(
+        (lo_freqs - lo_freq) / LO_FREQ_SCALE, (int_freqs - int_freq) / INT_FREQ_SCALE
+    )
+
+
+class MixerCalibrationStore:
+    """
+    SQLite table of mixer tuning results. Each row holds the two offsets found by the
+    tuner for one `kind` of leakage ("LO" for the I and Q DC offsets, "SB" for the gain
+    and phase offsets) of an element, at a given LO freq, IF and LO power, with the
+    leakage power they achieved. Tuning the same point again replaces its row.
+
+    lookup() returns the calibration at the exact point if there is one, else an inverse
+    distance weighted average of the nearest calibrations at the same LO power, or None
+    if there are none close enough. lookup_hessian() returns the curvature of the
+    leakage bowl the tuner fitted at the nearest calibration, which lets it retune a
+    drifted calibration in a few measurements.
+
+    Usage:
+        store = MixerCalibrationStore("mixer_calibrations.db")
+        store.save("qubit", "LO", 5e9, -50e6, 15, offsets=(0.01, -0.02), leakage=-80)
+        offsets, leakage = store.lookup("qubit", "LO", 5.01e9, -50e6, 15)
+        hessian = store.lookup_hessian("qubit", "LO", 5.01e9, -50e6, 15)
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str or Path): sqlite database file, created along with its
+                directory if it does not exist.
+        """
+        self.path = Path(path)
+        if str(path) != ":memory:":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.path))
+        with self._connection:
+            self._connection.execute(CREATE_TABLE)
+            self._connection.execute(CREATE_INDEX)
+            cursor = self._connection.execute("PRAGMA table_info(calibrations)")
+            columns = [row[1] for row in cursor]
+            for column in HESSIAN_COLUMNS:
+                if column not in columns:
+                    self._connection.execute(
+                        f"ALTER TABLE calibrations ADD COLUMN {column} REAL"
+                    )
+
+    def save(
+        self,
+        element: str,
+        kind: str,
+        lo_freq: float,
+        int_freq: float,
+        lo_power: float,
+        offsets,
+        leakage: float,
+        hessian=None,
+    ):
+        """
+        Saves the offsets, and the leakage in dBm they achieved, for this point, with
+        the 2x2 hessian of the leakage bowl in mW if the tuner fitted one.
+        """
+        if hessian is None:
+            h11 = h12 = h22 = None
+        else:
+            (h11, h12), (_, h22) = np.asarray(hessian, dtype=float).tolist()
+        with self._connection:
+            self._delete(element, kind, lo_freq, int_freq, lo_power)
+            self._connection.execute(
+                "INSERT INTO calibrations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (element, kind, lo_freq, int_freq, lo_power,
+                 float(offsets[0]), float(offsets[1]), leakage, time.time(),
+                 h11, h12, h22),
+            )  # fmt: skip
+
+    def lookup(
+        self, element: str, kind: str, lo_freq: float, int_freq: float, lo_power: float
+    ):
+        """
+        Returns (offsets, leakage in dBm) calibrated at or interpolated to this point,
+        or None if there is no calibration close enough.
+        """
+        rows = np.array(self._select(element, kind, lo_power), dtype=float)
+        if not len(rows):
+            return None
+        lo_freqs, int_freqs, xs, ys, leakages, *_ = rows.T
+        distances = get_distances(lo_freqs, int_freqs, lo_freq, int_freq)
+        nearest = np.argsort(distances)[:MAX_NEIGHBOURS]
+        nearest = nearest[distances[nearest] <= 1]
+        if not len(nearest):
+            return None
+        if distances[nearest[0]] == 0:
+            index = nearest[0]
+            return np.array([xs[index], ys[index]]), leakages[index]
+
+        weights = 1 / distances[nearest] ** 2
+        weights /= weights.sum()
+        offsets = np.array([xs[nearest] @ weights, ys[nearest] @ weights])
+        # leakage is averaged in linear units, so one bad neighbour stands out
+        leakage = 10 * np.log10(10 ** (leakages[nearest] / 10) @ weights)
+        return offsets, leakage
+
+    def lookup_hessian(
+        self, element: str, kind: str, lo_freq: float, int_freq: float, lo_power: float
+    ):
+        """
+        Returns the 2x2 hessian of the leakage bowl, in mW, of the nearest calibration
+        that has one, or None if there is none close enough. The curvature changes
+        little between neighbouring points, so it is not interpolated.
+        """
+        rows = np.array(self._select(element, kind, lo_power), dtype=float)
+        if not len(rows):
+            return None
+        rows = rows[~np.isnan(rows[:, -1])]  # NULL hessians are NaN
+        if not len(rows):
+            return None
+        lo_freqs, int_freqs, *_, h11s, h12s, h22s = rows.T
+        distances = get_distances(lo_freqs, int_freqs, lo_freq, int_freq)
+        index = np.argmin(distances)
+        if distances[index] > 1:
+            return None
+        return np.array([[h11s[index], h12s[index]], [h12s[index], h22s[index]]])
+
+    def get_calibrations(self, element: str) -> list:
+        """All calibrations of the element as dicts, oldest first."""
+        cursor = self._connection.execute(
+            "SELECT * FROM calibrations WHERE element = ? ORDER BY timestamp",
+            (element,),
+        )
+        names = [column[0] for column in cursor.description]
+        return [dict(zip(names, row)) for row in cursor]
+
+    def close(self):
+        self._connection.close()
+
+    def _select(self, element: str, kind: str, lo_power: float) -> list:
+        query = "SELECT lo_freq, int_freq, x, y, leakage, h11, h12, h22"
+        query += " FROM calibrations"
+        query += " WHERE element = ? AND kind = ? AND "
+        if lo_power is None:
+            return self._connection.execute(
+                query + "lo_power IS NULL", (element, kind)
+            ).fetchall()
+        return self._connection.execute(
+            query + "ABS(lo_power - ?) <= ?",
+            (element, kind, lo_power, LO_POWER_TOLERANCE),
+        ).fetchall()
+
+    def _delete(self, element, kind, lo_freq, int_freq, lo_power):
+        query = "DELETE FROM calibrations WHERE element = ? AND kind = ?"
+        query += " AND lo_freq = ? AND int_freq = ? AND lo_power IS ?"
+        self._connection.execute(query, (element, kind, lo_freq, int_freq, lo_power))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
@@ -0,0 +1,57 @@
+""" Mixer correction matrices, and tables of them over a range of IFs """
+import numpy as np
+
+# A correction table is a list of [int_freq, gain_offset, phase_offset] rows, one
+# per IF at which the image sideband was tuned, sorted by IF. It is kept as a plain
+# list so that it can be stored as a QuantumElement parameter and dumped to yaml.
+# The QM config holds one correction matrix per (IF, LO) pair of a mixer, and the
+# OPX switches between them when update_frequency() changes the IF of an element.
+
+
+def get_correction_matrix(gain_offset: float, phase_offset: float) -> list:
+    """Flattened 2x2 mixer correction matrix for the given gain and phase imbalance."""
+    cos = np.cos(phase_offset)
+    sin = np.sin(phase_offset)
+    coeff = 1 / ((1 - gain_offset ** 2) * (2 * cos ** 2 - 1))
+    return [
+        float(coeff * x)
+        for x in [
+            (1 - gain_offset) * cos,
+            (1 + gain_offset) * sin,
+            (1 - gain_offset) * sin,
+            (1 + gain_offset) * cos,
+        ]
+    ]
+
+
+def get_table_offsets(table: list, int_freq: float) -> tuple:
+    """
+    (gain offset, phase offset) at int_freq, linearly interpolated between the rows of the table. IFs outside the table get the offsets of its nearest end.
+    """
+    int_freqs, gain_offsets, phase_offsets = np.array(table, dtype=float).T
+    gain_offset = np.interp(int_freq, int_freqs, gain_offsets)
+    phase_offset = np.interp(int_freq, int_freqs, phase_offsets)
+    return float(gain_offset), float(phase_offset)
+
+
+def resample_table(table: list, int_freqs) -> list:
+    """
+    A new table with a row at each of int_freqs, interpolated from the given table. Use it to cover a sweep with a finer IF step than the tuned points.
+    """
+    return [[int(f), *get_table_offsets(table, f)] for f in sorted(set(int_freqs))]
+
+
+def get_mixer_config_entries(table: list, lo_freq: float, int_freqs=None) -> list:
+    """
+    The QM config mixers entries of a mixer at lo_freq, one per row of the table, or one per IF in int_freqs interpolated from the table if given.
+    """
+    if int_freqs is not None:
+        table = resample_table(table, int_freqs)
+    return [
+        {
+            "intermediate_frequency": int(int_freq),
+            "lo_frequency": int(lo_freq),
+            "correction": get_correction_matrix(gain_offset, phase_offset),
+        }
+        for int_freq, gain_offset, phase_offset in table
+    ]
@@ -0,0 +1,199 @@
+""" Model based minimisation of mixer leakage in a handful of measurements """
+import numpy as np
+
+# LO leakage in linear power is a quadratic bowl in the (I, Q) DC offsets, and so
+# is image leakage in the (gain, phase) offsets close to their optimum. Instead of
+# searching for the minimum point by point, we measure a few probe points, fit
+# p(x, y) = c0 + c1 x + c2 y + c3 x^2 + c4 xy + c5 y^2 in mW, and jump to its
+# analytic minimum. If the leakage measured there is higher than the model says,
+# the far probe points have bent the fit. We then keep the curvature of the bowl,
+# measure two points close to the jump, re-centre the bowl on them and jump again.
+# The curvature of a mixer's bowl barely drifts, so a tuner given the hessian of an
+# earlier tuning skips the probe points and only re-centres the bowl around x0.
+
+DEFAULT_SCALE = 0.1  # distance of the probe points from the initial guess
+DEFAULT_XATOL = 0.0001  # converged once a jump moves less than this
+DEFAULT_FTOL = 1.0  # in dB, converged once a jump is this close to the predicted min
+DEFAULT_MAX_MEASUREMENTS = 10
+MAX_JUMP = 4  # in units of scale, jumps further than this are cut short
+LOCAL_RISE = 10  # local probes are placed where the model predicts 10x the leakage
+
+# probe points in units of scale around the initial guess, enough to fit 6 coeffs
+PROBE_DESIGN = np.array([[0, 0], [1, 0], [-1, 0], [0, 1], [0, -1], [1, 1]])
+
+
+def fit_paraboloid(points: np.ndarray, powers: np.ndarray) -> np.ndarray:
+    """
+    Least squares fit of c0 + c1 x + c2 y + c3 x^2 + c4 xy + c5 y^2 to the powers, in mW, measured at points, with shape (n, 2). Residuals are relative, so points near the minimum count as much as those far up the bowl. Returns the 6 coefficients.
+    """
+    x, y = points[:, 0], points[:, 1]
+    design = np.column_stack((np.ones_like(x), x, y, x ** 2, x * y, y ** 2))
+    coeffs, *_ = np.linalg.lstsq(design / powers[:, None], np.ones_like(x), rcond=None)
+    return coeffs
+
+
+def get_hessian(coeffs: np.ndarray) -> np.ndarray:
+    _, _, _, c3, c4, c5 = coeffs
+    return np.array([[2 * c3, c4], [c4, 2 * c5]])
+
+
+def get_bowl(coeffs: np.ndarray):
+    """
+    Returns (minimum point, minimum power in mW) of the paraboloid, or None if it has no minimum.
+    """
+    hessian = get_hessian(coeffs)
+    if np.any(np.linalg.eigvalsh(hessian) <= 0):
+        return None  # saddle or upside down bowl, the fit can't be trusted
+    minimum = np.linalg.solve(hessian, -coeffs[1:3])
+    return minimum, coeffs[0] + coeffs[1:3] @ minimum / 2
+
+
+def recenter_bowl(hessian: np.ndarray, points: np.ndarray, powers: np.ndarray):
+    """
+    Least squares fit of the centre and the minimum power, in mW, of a bowl with the given hessian to powers measured at points. Needs at least 3 points. Returns (minimum point, minimum power in mW).
+    """
+    # p = (x - m)' H (x - m) / 2 + p_min is linear in b = -H m and k once H is known
+    curvature = 0.5 * np.einsum("ni,ij,nj->n", points, hessian, points)
+    design = np.column_stack((points, np.ones(len(points)))) / powers[:, None]
+    (b1, b2, k), *_ = np.linalg.lstsq(design, 1 - curvature / powers, rcond=None)
+    minimum = np.linalg.solve(hessian, [-b1, -b2])
+    return minimum, k - 0.5 * minimum @ hessian @ minimum
+
+
+class ParaboloidTuner:
+    """
+    Ask/tell minimiser of leakage power over two offsets. Call ask() for the next offsets to apply, measure the leakage power in dBm there and tell() it, until is_done. `best` is the best point measured so far.
+
+    Usage:
+        tuner = ParaboloidTuner(x0=[0.0, 0.0], scale=0.1)
+        while not tuner.is_done:
+            offsets = tuner.ask()
+            tuner.tell(offsets, measure_power(offsets))
+        offsets, power = tuner.best
+    """
+
+    def __init__(
+        self,
+        x0,
+        scale: float = DEFAULT_SCALE,
+        floor: float = None,
+        xatol: float = DEFAULT_XATOL,
+        ftol: float = DEFAULT_FTOL,
+        max_measurements: int = DEFAULT_MAX_MEASUREMENTS,
+        hessian=None,
+    ):
+        """
+        Args:
+            x0 (array-like): initial guess of the two offsets.
+            scale (float): distance of the probe points from x0, should reach well up the leakage bowl.
+            floor (float): noise floor in dBm, if known. Tuning stops once the leakage is within ftol of it.
+            xatol (float): absolute change in the offsets between jumps that is acceptable for convergence.
+            ftol (float): in dB, tuning stops once the leakage measured after a jump is within ftol of the minimum predicted by the model.
+            max_measurements (int): tuning stops after this many measurements.
+            hessian (array-like): 2x2 curvature of the bowl in mW, as fitted by an
+                earlier tuning of the same leakage. x0 is then measured and checked as
+                if it were a jump, which needs ~4 measurements instead of 7 or more.
+        """
+        self.scale = scale
+        self.floor = floor
+        self.xatol = xatol
+        self.ftol = ftol
+        self.max_measurements = max_measurements
+        self.is_done = False
+
+        self.points = []  # offsets measured so far
+        self.powers = []  # in dBm, leakage power measured at each point
+        self._center = np.asarray(x0, dtype=float)
+        self._pending = list(self._center + scale * PROBE_DESIGN)
+        self._hessian = None  # curvature of the bowl, once fitted
+        self._jump = None  # (point, predicted power in mW) of the latest jump
+        self._local = []  # indices of the points measured around the latest jump
+        if hessian is not None:  # warm start, x0 stands in for the first jump
+            self._hessian = np.asarray(hessian, dtype=float)
+            self._jump = (self._center, 0.0)  # predicts nothing, so x0 is probed
+            self._local = [0]
+            self._pending = [self._center]
+
+    @property
+    def num_measurements(self) -> int:
+        return len(self.powers)
+
+    @property
+    def hessian(self) -> np.ndarray:
+        """2x2 curvature of the fitted bowl in mW, None until the probes are fitted."""
+        return self._hessian
+
+    @property
+    def best(self) -> tuple:
+        """(offsets, power in dBm) of the lowest leakage measured so far."""
+        index = int(np.argmin(self.powers))
+        return self.points[index], self.powers[index]
+
+    def ask(self) -> np.ndarray:
+        """The next offsets to measure."""
+        if self.is_done:
+            raise RuntimeError("Tuning is done, no more points to measure")
+        return self._pending[0]
+
+    def tell(self, point, power: float):
+        """Records the leakage power, in dBm, measured at point."""
+        self.points.append(np.asarray(point, dtype=float))
+        self.powers.append(power)
+        if self._pending and np.allclose(self._pending[0], point):
+            self._pending.pop(0)
+        if self.num_measurements >= self.max_measurements:
+            self.is_done = True
+        elif not self._pending:
+            self._plan_next()
+
+    def _plan_next(self):
+        powers = 10 ** (np.array(self.powers) / 10)  # in mW
+        if self._hessian is None:
+            self._fit_bowl(np.array(self.points), powers)
+        elif len(self._local) == 1:
+            self._check_jump(powers[-1])
+        else:
+            points = np.array(self.points)[self._local]
+            minimum, min_power = recenter_bowl(self._hessian, points, powers[self._local])
+            self._jump_to(minimum, min_power)
+
+    def _fit_bowl(self, points: np.ndarray, powers: np.ndarray):
+        coeffs = fit_paraboloid(points, powers)
+        bowl = get_bowl(coeffs)
+        if bowl is None:
+            # probe a tighter ring around the best point, where the bowl is convex
+            self.scale /= 2
+            self._center = self.best[0]
+            self._pending = list(self._center + self.scale * PROBE_DESIGN[1:])
+            return
+        self._hessian = get_hessian(coeffs)
+        minimum, min_power = bowl
+        # don't trust the model far outside the probed region
+        step = minimum - self._center
+        max_step = MAX_JUMP * self.scale
+        if np.linalg.norm(step) > max_step:
+            minimum = self._center + step * max_step / np.linalg.norm(step)
+        self._jump_to(minimum, min_power)
+
+    def _jump_to(self, minimum: np.ndarray, min_power: float):
+        if self._jump is not None and np.max(np.abs(minimum - self._jump[0])) < self.xatol:
+            self.is_done = True
+            return
+        self._jump = (minimum, min_power)
+        self._local = [self.num_measurements]  # the jump is the first local point
+        self._pending = [minimum]
+
+    def _check_jump(self, power: float):
+        """Stops if the leakage at the jump is what the model predicts, else probes around it."""
+        is_at_floor = self.floor is not None and power < 10 ** ((self.floor + self.ftol) / 10)
+        # a prediction far off in either direction means the fit is bent
+        predicted = self._jump[1]
+        is_predicted = predicted > 0 and abs(10 * np.log10(power / predicted)) < self.ftol
+        if is_at_floor or is_predicted:
+            self.is_done = True
+            return
+        # probe along the principal axes of the bowl, LOCAL_RISE times up its walls
+        eigenvalues, eigenvectors = np.linalg.eigh(self._hessian)
+        radii = np.sqrt(2 * LOCAL_RISE * power / eigenvalues)
+        self._local += [self.num_measurements, self.num_measurements + 1]
+        self._pending = list(self.points[-1] + (eigenvectors * radii).T)
@@ -1,9 +1,18 @@
 """ Qcrew plotter v1.0 """
 
+from typing import Callable
+import threading
+import time
+
 import matplotlib.pyplot as plt
+import numpy as np
 from IPython import display
 from qcrew.codebase.analysis import fit
 
+AXIS_MARGIN = 0.05  # fraction of the data range padded on each side of live plots
+AUTOSCALE_MIN_FILL = 0.5  # live plot limits shrink if data fills less than this
+MAX_PIXELS = 512  # max 2D live plot pixels along an axis, larger grids are binned
+
 # class Plotter:
 #     """Single axis x-y plotter. Supports line, scatter, and errorbar plot. Provides a rudimentary live plotting routine."""
 
@@ -61,10 +70,115 @@ from qcrew.codebase.analysis import fit
 #         plt.plot(x, y, color="m", lw=2, label=label)
 
 
+class RenderGovernor:
+    """
+    Calls a render function at most `max_fps` times per second. Updates submitted faster than that are coalesced: each one replaces the previous pending update, so only the latest state is ever rendered and stale frames are dropped.
+
+    Without a thread, a pending update is rendered by the first submit() after the frame interval has passed, or by flush(). With a thread, a daemon render thread picks up the latest pending update as soon as the frame interval allows, so submit() always returns immediately.
+    """
+
+    def __init__(self, render: Callable, max_fps: float, threaded: bool = False):
+        if max_fps <= 0:
+            raise ValueError(f"Max fps must be positive, got {max_fps}")
+
+        self.render = render
+        self.min_interval = 1 / max_fps  # in seconds
+        self.threaded = threaded
+        self.num_submitted = 0  # total number of updates submitted
+        self.num_rendered = 0  # total number of updates rendered
+
+        self._pending = None  # (args, kwargs) of the latest update not yet rendered
+        self._last_render_time = -np.inf
+        self._is_rendering = False
+        self._is_flushing = False
+        self._condition = threading.Condition()
+
+        self._thread = None
+        if threaded:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    @property
+    def num_coalesced(self) -> int:
+        """Number of submitted updates that were replaced before being rendered."""
+        with self._condition:
+            num_pending = 0 if self._pending is None else 1
+            return self.num_submitted - self.num_rendered - num_pending
+
+    def submit(self, *args, **kwargs):
+        """Submits an update, the arguments are passed to the render function."""
+        with self._condition:
+            self._pending = (args, kwargs)
+            self.num_submitted += 1
+            self._condition.notify_all()
+
+        if not self.threaded and self._get_wait_time() <= 0:
+            self._render_pending()
+
+    def flush(self, timeout: float = None):
+        """Renders the pending update now, in threaded mode waits until it has been rendered."""
+        if not self.threaded:
+            self._render_pending()
+            return
+
+        with self._condition:
+            self._is_flushing = True
+            self._condition.notify_all()
+            self._condition.wait_for(
+                lambda: self._pending is None and not self._is_rendering, timeout
+            )
+            self._is_flushing = False
+
+    def _get_wait_time(self) -> float:
+        return self._last_render_time + self.min_interval - time.perf_counter()
+
+    def _render_pending(self):
+        with self._condition:
+            pending, self._pending = self._pending, None
+            if pending is None:
+                return
+            self._is_rendering = True
+
+        try:
+            args, kwargs = pending
+            self.render(*args, **kwargs)
+        finally:
+            with self._condition:
+                self._last_render_time = time.perf_counter()
+                self.num_rendered += 1
+                self._is_rendering = False
+                self._condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending is not None)
+                wait_time = self._get_wait_time()
+                if wait_time > 0 and not self._is_flushing:
+                    # newer updates submitted while waiting replace this one
+                    self._condition.wait(wait_time)
+                    continue
+            try:
+                self._render_pending()
+            except Exception as e:  # keep the render thread alive for later updates
+                print(f"Live plot render failed: {e}")
+
+
 class Plotter:
     """Single axis x-y plotter. Supports line, scatter, and errorbar plot. Provides a rudimentary live plotting routine."""
 
-    def __init__(self, title: str, xlabel: str, ylabel: str = "Signal (A.U.)"):
+    def __init__(
+        self,
+        title: str,
+        xlabel: str,
+        ylabel: str = "Signal (A.U.)",
+        retained: bool = True,
+        max_fps: float = None,
+        threaded: bool = False,
+    ):
+        """Set `retained` to False to clear and redraw the axis on every live plot refresh instead of updating the existing artists.
+
+        Set `max_fps` to limit the live plot refresh rate, updates that arrive faster are coalesced and only the latest one is drawn. With `threaded` True, fitting and rendering run on a separate thread so they never hold up fetching. Threaded rendering is meant for IPython inline figures, GUI backends must be drawn from the main thread."""
 
         self.title = title
         self.xlabel = xlabel
@@ -91,10 +205,27 @@ class Plotter:
         self.ax = self.fig.add_subplot(1, 1, 1)
         self.hdisplay = display.display("", display_id=True)
 
-    def fit(self, xs, ys, fit_func) -> tuple:
+        self.live_fitter = None  # warm-started fitter, created on first fit
+
+        self.retained = retained
+        self._artists = dict()  # live plot artists, created on first refresh
+        self._layout = None  # (plot_type, has_err, has_fit, label) of the artists
+        self._is_blitting = False
+        self._background = None  # canvas without the animated artists
+        self.fig.canvas.mpl_connect("draw_event", self._on_draw)
+
+        self.governor = None
+        if max_fps is not None:
+            self.governor = RenderGovernor(self._refresh, max_fps, threaded)
 
-        # get fit parameters
-        params = fit.do_fit(fit_func, xs, ys)
+        self.exporter = None  # SnapshotExporter fed with every live plot update
+
+    def fit(self, xs, ys, fit_func, err=None) -> tuple:
+
+        # get fit parameters, warm-started from the previous live plot refresh
+        if self.live_fitter is None or self.live_fitter.fit_func != fit_func:
+            self.live_fitter = fit.LiveFitter(fit_func)
+        params = self.live_fitter.fit(xs, ys, err=err)
         fit_ys = fit.eval_fit(fit_func, params, xs)
 
         # convert param values into formated string
@@ -117,8 +248,77 @@ class Plotter:
         err=None,
         plot_type="scatter",
     ):
-        """ " If `live_plot(data)` is called in an IPython terminal context, the axis is refreshed and plotted with the new data using IPython `display` tools."""
+        """ " If `live_plot(data)` is called in an IPython terminal context, the axis is refreshed and plotted with the new data using IPython `display` tools.
+
+        The plot artists are created on the first call and only their data is updated on subsequent calls. If the figure is shown in a GUI window that supports it, only the updated artists are re-rendered (blitting).
+
+        If the Plotter has a `max_fps`, the refresh goes through its render governor and may be deferred; call `flush()` after the last `live_plot()` to make sure the final data is drawn."""
+
+        if self.exporter is not None:
+            title = self.title + f": {n} repetition"
+            self.exporter.submit_plot(title, self.xlabel, self.ylabel, x, y, err)
+
+        if self.governor is None:
+            self._refresh(x, y, n, label, fit_fn, err, plot_type)
+            return
+
+        # copy the arrays, callers are free to modify them before they are rendered
+        err = None if err is None else np.array(err)
+        self.governor.submit(np.array(x), np.array(y), n, label, fit_fn, err, plot_type)
+
+    def flush(self):
+        """Renders the latest live plot update held back by the render governor, if any."""
+        if self.governor is not None:
+            self.governor.flush()
+
+    def _refresh(self, x, y, n, label, fit_fn, err, plot_type):
+        if not self.retained:
+            self.redraw_plot(x, y, n, label, fit_fn, err, plot_type)
+            return
+
+        label = label or "data"
+        has_err = plot_type == "scatter" and err is not None
+        layout = (plot_type, has_err, bool(fit_fn), label)
+        is_new_layout = layout != self._layout
+        if is_new_layout:
+            self._create_artists(*layout)
+
+        x, y = np.asarray(x), np.asarray(y)
+        data = self._artists["data"]
+        ys = (y,)
+        if has_err:
+            err = np.asarray(err)
+            self._update_errorbar(x, y, err)
+            ys = (y - err, y + err)
+        elif plot_type == "scatter":
+            data.set_offsets(np.column_stack((x, y)))
+        else:
+            data.set_data(x, y)
+
+        if fit_fn:
+            fit_text, fit_y = self.fit(x, y, fit_func=fit_fn, err=err)
+            self._artists["fit"].set_data(x, fit_y)
+            self._artists["fit_text"].set_text(fit_text)
+            ys += (fit_y,)
+
+        self._artists["title"].set_text(self.title + f": {n} repetition")
+
+        is_rescaled = self._rescale(x, *ys, force=is_new_layout)
+        self._render(redraw=is_rescaled)
+
+    def redraw_plot(
+        self,
+        x,
+        y,
+        n,
+        label=None,
+        fit_fn=None,
+        err=None,
+        plot_type="scatter",
+    ):
+        """Clears the axis and plots the data from scratch, the immediate mode counterpart of `live_plot()`."""
 
+        self._layout = None  # live plot artists are removed by clearing the axis
         self.ax.clear()
         # plot the data
         label = label or "data"
@@ -133,7 +333,7 @@ class Plotter:
 
         if fit_fn:
             # plot the fit curve
-            fit_text, fit_y = self.fit(x, y, fit_func=fit_fn)
+            fit_text, fit_y = self.fit(x, y, fit_func=fit_fn, err=err)
             left = 0
             bottom = -0.1
             self.ax.text(
@@ -153,6 +353,134 @@ class Plotter:
 
         self.hdisplay.update(self.fig)
 
+    @property
+    def can_blit(self) -> bool:
+        """True if the figure is shown in a GUI window whose canvas supports blitting."""
+        canvas = self.fig.canvas
+        is_gui = canvas.required_interactive_framework is not None
+        return is_gui and canvas.supports_blit
+
+    def _create_artists(self, plot_type, has_err, has_fit, label):
+        """Creates the live plot artists with placeholder data for the given layout."""
+        self.ax.clear()
+        empty = np.full(1, np.nan)  # errorbar() skips the caps for empty data
+        artists = dict()
+
+        if has_err:
+            self.plot_errorbar(empty, empty, self.ax, empty, label)
+            container = self.ax.containers[-1]
+            artists["data"], artists["caps"], artists["bars"] = container.lines
+        elif plot_type == "scatter":
+            self.plot_scatter(empty, empty, self.ax, label)
+            artists["data"] = self.ax.collections[-1]
+        else:
+            self.plot_line(empty, empty, self.ax, label)
+            artists["data"] = self.ax.lines[-1]
+
+        if has_fit:
+            self.plot_line(empty, empty, self.ax, label="fit", color="r")
+            artists["fit"] = self.ax.lines[-1]
+            artists["fit_text"] = self.ax.text(
+                0,
+                -0.1,
+                "",
+                horizontalalignment="left",
+                verticalalignment="top",
+                transform=self.ax.transAxes,
+            )
+
+        artists["title"] = self.ax.set_title(self.title)
+        self.ax.set_xlabel(self.xlabel)
+        self.ax.set_ylabel(self.ylabel)
+        self.ax.legend()
+
+        # animated artists are left out of full canvas draws and are blitted on top
+        self._is_blitting = self.can_blit
+        for artist in self._get_animated_artists(artists):
+            artist.set_animated(self._is_blitting)
+
+        self._artists = artists
+        self._layout = (plot_type, has_err, has_fit, label)
+        self._background = None
+
+    def _get_animated_artists(self, artists=None) -> list:
+        animated = list()
+        for artist in (artists or self._artists).values():
+            if isinstance(artist, tuple):  # errorbar caps and bars
+                animated.extend(artist)
+            else:
+                animated.append(artist)
+        return animated
+
+    def _update_errorbar(self, x, y, err):
+        lows, highs = y - err, y + err
+        self._artists["data"].set_data(x, y)
+        if self._artists["caps"]:
+            low_caps, high_caps = self._artists["caps"]
+            low_caps.set_data(x, lows)
+            high_caps.set_data(x, highs)
+        # each bar is a segment from (x, y - err) to (x, y + err)
+        segments = np.stack(
+            (np.column_stack((x, lows)), np.column_stack((x, highs))), axis=1
+        )
+        self._artists["bars"][0].set_segments(segments)
+
+    def _rescale(self, x, *ys, force: bool = False) -> bool:
+        """Updates the axis limits to the data, returns True if they changed."""
+        xlim = self._get_new_limits(self.ax.get_xlim(), (x,), force)
+        ylim = self._get_new_limits(self.ax.get_ylim(), ys, force)
+        if xlim is not None:
+            self.ax.set_xlim(xlim)
+        if ylim is not None:
+            self.ax.set_ylim(ylim)
+        return xlim is not None or ylim is not None
+
+    def _get_new_limits(self, limits, arrays, force: bool):
+        """
+        Returns new (low, high) axis limits, or None if the current limits are good enough. Limits are only changed when the data leaves them or shrinks to a small fraction of them, so that slowly converging averages do not force a full redraw on every refresh.
+        """
+        finite = [array[np.isfinite(array)] for array in arrays]
+        finite = [array for array in finite if array.size]
+        if not finite:
+            return None
+        low = min(np.min(array) for array in finite)
+        high = max(np.max(array) for array in finite)
+
+        span = high - low
+        lim_low, lim_high = min(limits), max(limits)
+        is_inside = lim_low <= low and high <= lim_high
+        if is_inside and not force:
+            if span >= AUTOSCALE_MIN_FILL * (lim_high - lim_low):
+                return None
+
+        pad = AXIS_MARGIN * (span or abs(high) or 1.0)
+        return low - pad, high + pad
+
+    def _render(self, redraw: bool):
+        if not self._is_blitting:
+            self.hdisplay.update(self.fig)
+            return
+
+        canvas = self.fig.canvas
+        if redraw or self._background is None:
+            canvas.draw()  # grabs a new background in _on_draw()
+        else:
+            canvas.restore_region(self._background)
+            self._draw_animated_artists()
+        canvas.blit(self.fig.bbox)
+        canvas.flush_events()
+
+    def _on_draw(self, event):
+        """Grabs the background every time the full canvas is drawn e.g. on window resize."""
+        if self._layout is None or not self._is_blitting:
+            return
+        self._background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_animated_artists()
+
+    def _draw_animated_artists(self):
+        for artist in self._get_animated_artists():
+            self.fig.draw_artist(artist)
+
     def plot_errorbar(self, x, y, axis, yerr, label: str):
         axis.errorbar(
             x,
@@ -175,3 +503,209 @@ class Plotter:
 
     def plot_line(self, x, y, axis, label, color="b"):
         axis.plot(x, y, color=color, lw=2, label=label)
+
+
+class Plotter2D(Plotter):
+    """
+    Live heatmap plotter for sweeps over two variables, e.g. readout frequency vs readout amplitude. The heatmap is a single image whose array is updated in place on every refresh, so the cost per frame does not depend on the number of refreshes. Grids larger than `max_pixels` along an axis are shown as nan-aware block means, and the colour limits follow the data with the same hysteresis as the 1D live plot axis limits.
+
+    The image assumes evenly spaced sweep points, the axis ticks run linearly from the first to the last point along each axis.
+    """
+
+    def __init__(
+        self,
+        title: str,
+        xlabel: str,
+        ylabel: str,
+        zlabel: str = "Signal (A.U.)",
+        cmap: str = "viridis",
+        clim: tuple = None,
+        max_pixels: int = MAX_PIXELS,
+        max_fps: float = None,
+        threaded: bool = False,
+    ):
+        """Set `clim` to (vmin, vmax) to fix the colour limits instead of following the data."""
+        super().__init__(title, xlabel, ylabel, max_fps=max_fps, threaded=threaded)
+        self.zlabel = zlabel
+        self.cmap = cmap
+        self.clim = clim
+        self.max_pixels = max_pixels
+
+        self.colorbar = None
+        self._block_shape = None  # (rows, cols) of zs averaged into one pixel
+        self._padded = None  # zs padded with nans to a whole number of blocks
+
+    def live_plot(self, xs, ys, zs, n):
+        """Plots zs, with shape (len(ys), len(xs)), as a heatmap with xs along the horizontal axis and ys along the vertical axis."""
+        if self.exporter is not None:
+            title = self.title + f": {n} repetition"
+            self.exporter.submit_heatmap(
+                title, self.xlabel, self.ylabel, self.zlabel, xs, ys, zs
+            )
+
+        if self.governor is None:
+            self._refresh(xs, ys, zs, n)
+            return
+
+        # copy the arrays, callers are free to modify them before they are rendered
+        self.governor.submit(np.array(xs), np.array(ys), np.array(zs), n)
+
+    def _refresh(self, xs, ys, zs, n):
+        xs, ys = np.asarray(xs, dtype=float), np.asarray(ys, dtype=float)
+        zs = np.asarray(zs, dtype=float)
+        if zs.shape != (len(ys), len(xs)):
+            raise ValueError(
+                f"Expect zs with shape {(len(ys), len(xs))}, got {zs.shape}"
+            )
+
+        layout = (zs.shape, xs[0], xs[-1], ys[0], ys[-1])
+        is_new_layout = layout != self._layout
+        if is_new_layout:
+            self._create_image(xs, ys, zs.shape)
+            self._layout = layout
+
+        image_data = self._downsample(zs)
+        self._artists["image"].set_data(image_data)
+        self._artists["title"].set_text(self.title + f": {n} repetition")
+
+        is_rescaled = False
+        if self.clim is None:
+            clim = self._artists["image"].get_clim()
+            clim = self._get_new_limits(clim, (image_data,), is_new_layout)
+            if clim is not None:
+                self._artists["image"].set_clim(clim)
+                is_rescaled = True
+        self._render(redraw=is_rescaled or is_new_layout)
+
+    def _create_image(self, xs, ys, shape):
+        self.ax.clear()
+        if self.colorbar is not None:
+            self.colorbar.remove()
+
+        rows, cols = shape
+        self._block_shape = (
+            -(-rows // self.max_pixels),  # ceil division
+            -(-cols // self.max_pixels),
+        )
+        block_rows, block_cols = self._block_shape
+        self._padded = np.full(
+            (-(-rows // block_rows) * block_rows, -(-cols // block_cols) * block_cols),
+            np.nan,
+        )
+
+        image = self.ax.imshow(
+            self._downsample(np.full(shape, np.nan)),
+            cmap=self.cmap,
+            aspect="auto",
+            origin="lower",
+            interpolation="nearest",
+            extent=(*_get_extent(xs), *_get_extent(ys)),
+        )
+        if self.clim is not None:
+            image.set_clim(self.clim)
+        self.colorbar = self.fig.colorbar(image, ax=self.ax, label=self.zlabel)
+
+        title = self.ax.set_title(self.title)
+        self.ax.set_xlabel(self.xlabel)
+        self.ax.set_ylabel(self.ylabel)
+
+        self._artists = {"image": image, "title": title}
+        self._is_blitting = self.can_blit
+        for artist in self._artists.values():
+            artist.set_animated(self._is_blitting)
+        self._background = None
+
+    def _downsample(self, zs) -> np.ndarray:
+        """Means of zs over blocks of `_block_shape`, ignoring nans."""
+        if self._block_shape == (1, 1):
+            return zs
+
+        rows, cols = zs.shape
+        self._padded[:rows, :cols] = zs
+        block_rows, block_cols = self._block_shape
+        blocks = self._padded.reshape(
+            self._padded.shape[0] // block_rows,
+            block_rows,
+            self._padded.shape[1] // block_cols,
+            block_cols,
+        )
+        is_finite = np.isfinite(blocks)
+        sums = np.where(is_finite, blocks, 0).sum(axis=(1, 3))
+        counts = is_finite.sum(axis=(1, 3))
+        with np.errstate(invalid="ignore"):
+            return sums / counts  # nan for blocks without any data yet
+
+
+def _get_extent(values) -> tuple:
+    """Image extent along an axis whose pixel centers are at the sweep points."""
+    first, last = values[0], values[-1]
+    step = (last - first) / (len(values) - 1) if len(values) > 1 else 1.0
+    return first - step / 2, last + step / 2
+
+
+class EnvelopeLine:
+    """
+    Line plot of a long 1D trace, e.g. a raw ADC capture or a fine spectrum analyzer sweep, drawn through a min/max decimation envelope. The visible x range is split into one bin per pixel column and only the min and max of each bin are drawn, so narrow peaks such as LO leakage spikes are never lost while a million point trace renders as a few thousand points. The envelope is recomputed whenever the x limits change, so zooming in reveals the full resolution data.
+    """
+
+    def __init__(self, axis, x, y, num_bins: int = None, **line_kwargs):
+        """
+        Args:
+            axis (Axes): axis to plot on.
+            x, y (array-like): the trace, x is sorted if it is not already.
+            num_bins (int): number of bins across the visible x range, defaults to the axis width in pixels.
+            line_kwargs: passed on to `axis.plot()`.
+        """
+        self.axis = axis
+        self.num_bins = num_bins
+        (self.line,) = axis.plot([], [], **line_kwargs)
+        self.set_data(x, y)
+        # matplotlib holds callbacks weakly, the line keeps this envelope alive for
+        # as long as it is plotted, whether or not callers keep a reference
+        self.line.envelope = self
+        axis.callbacks.connect("xlim_changed", self._on_xlim_changed)
+
+    def set_data(self, x, y):
+        # copied, since the envelope is recomputed from them long after plotting
+        x, y = np.array(x, dtype=float), np.array(y, dtype=float)
+        if np.any(np.diff(x) < 0):
+            order = np.argsort(x, kind="stable")
+            x, y = x[order], y[order]
+        self.x, self.y = x, y
+
+        # the data limits are those of the full trace, not of the envelope
+        self.axis.update_datalim(
+            [(x[0], np.nanmin(y)), (x[-1], np.nanmax(y))] if len(x) else []
+        )
+        self.axis.autoscale_view()
+        self._update(*self.axis.get_xlim())
+
+    def _on_xlim_changed(self, axis):
+        self._update(*axis.get_xlim())
+
+    def _update(self, xmin, xmax):
+        num_bins = self.num_bins or max(int(self.axis.bbox.width), 1)
+        self.line.set_data(*get_envelope(self.x, self.y, xmin, xmax, num_bins))
+
+
+def get_envelope(x, y, xmin, xmax, num_bins: int) -> tuple:
+    """
+    Min/max decimation of the sorted trace (x, y) between xmin and xmax. Returns (x, y) with the min and max of each of num_bins equal width bins, in that order, at the x of the first point in the bin. Returns the raw points if there are fewer than two per bin. The points just outside the range are included so the line runs on to the edges of the axis.
+    """
+    xmin, xmax = min(xmin, xmax), max(xmin, xmax)
+    start = max(np.searchsorted(x, xmin, side="left") - 1, 0)
+    stop = min(np.searchsorted(x, xmax, side="right") + 1, len(x))
+    x, y = x[start:stop], y[start:stop]
+    if len(x) <= 2 * num_bins:
+        return x, y
+
+    edges = np.linspace(x[0], x[-1], num_bins + 1)[:-1]
+    starts = np.unique(np.searchsorted(x, edges, side="left"))
+    mins = np.fmin.reduceat(y, starts)  # fmin and fmax ignore nans
+    maxs = np.fmax.reduceat(y, starts)
+    return np.repeat(x[starts], 2), np.column_stack((mins, maxs)).ravel()
+
+
+def plot_envelope(axis, x, y, num_bins: int = None, **line_kwargs) -> EnvelopeLine:
+    """Plots a long 1D trace on the axis through a min/max envelope, see `EnvelopeLine`."""
+    return EnvelopeLine(axis, x, y, num_bins, **line_kwargs)
@@ -1,17 +1,27 @@
 """
 Pulse lib. Classes - Pulse, Waveform.
-Utils - gauss, other funcs for generating arbitrary waveforms.
+Utils - gauss, DRAG, cosine, flat top, chirp, sum and product funcs for generating
+arbitrary waveforms, and get_batch_samples() for families of them.
 Globals (dicts defining instances of pulse and waveform)
 these globals will be used by elements to define their operations, and then the
 qm config builder will build config based on the elements' defined operations.
 the user can add more pulses to this library and add them to the elements as
 well.
 """
+
 import numpy as np
 
 from qcrew.codebase.utils.yamlizer import Yamlable
 
 # --------------------- Waveform generator functions ---------------------------
+# arbitrary waveform generators return float32 numpy arrays, one sample per ns,
+# computed in one vectorised pass. Envelopes of odd-multiple-of-sigma lengths are
+# centred on sample int(length / 2), as gauss_fn has always done.
+SAMPLE_DTYPE = np.float32
+SAMPLING_RATE = 1e9  # in samples per second, for frequencies in Hz
+AMPLITUDE_PARAM = "max_amp"  # generators scale linearly in this param, if they have it
+
+
 # constant value function
 def constant_fn(amp):
     """
@@ -20,16 +30,134 @@ def constant_fn(amp):
     return amp
 
 
+def _get_gaussian(sigma: float, multiple_of_sigma: int):
+    """
+    (times from the centre, unit height gaussian) of int(multiple_of_sigma * sigma)
+    samples.
+    """
+    length = int(multiple_of_sigma * sigma)
+    t = np.arange(length) - int(np.floor(length / 2))
+    return t, np.exp(-(t**2) / (2 * sigma**2))
+
+
 # gaussian function
 def gauss_fn(max_amp: float, sigma: float, multiple_of_sigma: int):
     """
-    Gaussian fn. TODO write proper docu.
+    Gaussian of height max_amp and std dev sigma, in ns, truncated to multiple_of_sigma
+    * sigma samples.
     """
-    length = int(multiple_of_sigma * sigma)
-    mu = int(np.floor(length / 2))
-    t = np.linspace(0, length - 1, length)
-    gaussian = max_amp * np.exp(-((t - mu) ** 2) / (2 * sigma ** 2))
-    return [float(x) for x in gaussian]
+    _, gaussian = _get_gaussian(sigma, multiple_of_sigma)
+    return (max_amp * gaussian).astype(SAMPLE_DTYPE)
+
+
+def drag_fn(max_amp: float, sigma: float, multiple_of_sigma: int, drag: float):
+    """
+    DRAG quadrature of gauss_fn(max_amp, sigma, multiple_of_sigma), that is -drag times
+    its time derivative in ns. Play it on Q with the gaussian on I.
+    """
+    t, gaussian = _get_gaussian(sigma, multiple_of_sigma)
+    return (drag * max_amp * gaussian * t / sigma**2).astype(SAMPLE_DTYPE)
+
+
+def cosine_fn(max_amp: float, length: int):
+    """Raised cosine (Hann) envelope of height max_amp and the given length in ns."""
+    t = np.arange(int(length))
+    envelope = max_amp * 0.5 * (1 - np.cos(2 * np.pi * t / int(length)))
+    return envelope.astype(SAMPLE_DTYPE)
+
+
+def flat_top_gauss_fn(
+    max_amp: float, flat_length: int, sigma: float, multiple_of_sigma: int
+):
+    """
+    Flat top of height max_amp and flat_length ns, with the halves of gauss_fn(max_amp,
+    sigma, multiple_of_sigma) as rising and falling edges.
+    """
+    _, gaussian = _get_gaussian(sigma, multiple_of_sigma)
+    return _get_flat_top(max_amp, flat_length, gaussian)
+
+
+def flat_top_cosine_fn(max_amp: float, flat_length: int, rise_length: int):
+    """
+    Flat top of height max_amp and flat_length ns, with raised cosine edges of
+    rise_length ns.
+    """
+    t = np.arange(2 * int(rise_length))
+    edges = 0.5 * (1 - np.cos(np.pi * t / int(rise_length)))
+    return _get_flat_top(max_amp, flat_length, edges)
+
+
+def _get_flat_top(max_amp: float, flat_length: int, edges: np.ndarray) -> np.ndarray:
+    """Puts flat_length ones between the two halves of the unit height edges."""
+    rise_length = len(edges) // 2
+    envelope = np.concatenate(
+        (
+            edges[:rise_length],
+            np.ones(int(flat_length)),
+            edges[len(edges) - rise_length :],
+        )
+    )
+    return (max_amp * envelope).astype(SAMPLE_DTYPE)
+
+
+def chirp_fn(
+    max_amp: float,
+    length: int,
+    start_freq: float,
+    stop_freq: float,
+    phase: float = 0.0,
+    quadrature: str = "I",
+):
+    """
+    Constant amplitude linear chirp from start_freq to stop_freq, in Hz, over length ns.
+    Play quadrature "I" (cosine) and "Q" (sine) on the I and Q ports for a single
+    sideband chirp.
+    """
+    t = np.arange(int(length)) / SAMPLING_RATE
+    duration = int(length) / SAMPLING_RATE
+    rate = (stop_freq - start_freq) / duration  # in Hz per second
+    phases = 2 * np.pi * (start_freq * t + rate * t**2 / 2) + phase
+    if quadrature == "I":
+        return (max_amp * np.cos(phases)).astype(SAMPLE_DTYPE)
+    if quadrature == "Q":
+        return (max_amp * np.sin(phases)).astype(SAMPLE_DTYPE)
+    raise ValueError(f"quadrature must be 'I' or 'Q', got '{quadrature}'")
+
+
+def sum_fn(terms: list):
+    """
+    Sum of the envelopes given as terms, dicts of a "func" name in func_map and its
+    params. Shorter envelopes are padded with zeros at the end.
+    """
+    envelopes = [np.atleast_1d(_get_term_samples(term)) for term in terms]
+    total = np.zeros(max(len(envelope) for envelope in envelopes), dtype=SAMPLE_DTYPE)
+    for envelope in envelopes:
+        if len(envelope) == 1:  # constant term
+            total += envelope[0]
+        else:
+            total[: len(envelope)] += envelope
+    return total
+
+
+def product_fn(terms: list):
+    """
+    Product of the envelopes given as terms, dicts of a "func" name in func_map and its
+    params. All envelopes must have the same length, constant terms scale the product.
+    """
+    product = np.ones(1, dtype=SAMPLE_DTYPE)
+    for term in terms:
+        envelope = np.atleast_1d(_get_term_samples(term))
+        if len(product) > 1 and len(envelope) > 1 and len(envelope) != len(product):
+            raise ValueError(
+                "Envelopes multiplied by product_fn must have equal lengths"
+            )
+        product = product * envelope
+    return product.astype(SAMPLE_DTYPE)
+
+
+def _get_term_samples(term: dict):
+    params = {key: value for key, value in term.items() if key != "func"}
+    return func_map[term["func"]](**params)
 
 
 # map of strings to functions
@@ -38,8 +166,167 @@ def gauss_fn(max_amp: float, sigma: float, multiple_of_sigma: int):
 func_map = {
     "constant_fn": constant_fn,
     "gauss_fn": gauss_fn,
+    "drag_fn": drag_fn,
+    "cosine_fn": cosine_fn,
+    "flat_top_gauss_fn": flat_top_gauss_fn,
+    "flat_top_cosine_fn": flat_top_cosine_fn,
+    "chirp_fn": chirp_fn,
+    "sum_fn": sum_fn,
+    "product_fn": product_fn,
 }
 
+
+def get_batch_samples(func: str, **parameters) -> np.ndarray:
+    """
+    Samples of a family of waveforms as a 2D array, one row per member. Params given as
+    sequences are swept together, all others are shared by the family, e.g.
+    get_batch_samples("gauss_fn", max_amp=np.linspace(0, 0.5, 100), sigma=40,
+    multiple_of_sigma=4). Sweeping only max_amp costs a single waveform evaluation. Rows
+    shorter than the longest, e.g. when sweeping sigma, are padded with zeros at the
+    end.
+    """
+    swept = {
+        key: np.asarray(value)
+        for key, value in parameters.items()
+        if isinstance(value, (list, tuple, np.ndarray)) and key != "terms"
+    }
+    if not swept:
+        raise ValueError("Pass at least one param as a sequence of values to sweep")
+    sizes = {len(values) for values in swept.values()}
+    if len(sizes) > 1:
+        raise ValueError("Swept params must all have the same number of values")
+
+    if list(swept) == [AMPLITUDE_PARAM]:  # waveforms are linear in their amplitude
+        unit = np.atleast_1d(func_map[func](**{**parameters, AMPLITUDE_PARAM: 1.0}))
+        return np.outer(swept[AMPLITUDE_PARAM], unit).astype(SAMPLE_DTYPE)
+
+    rows = [
+        np.atleast_1d(func_map[func](**{**parameters, **dict(zip(swept, values))}))
+        for values in zip(*swept.values())
+    ]
+    batch = np.zeros((len(rows), max(len(row) for row in rows)), dtype=SAMPLE_DTYPE)
+    for index, row in enumerate(rows):
+        batch[index, : len(row)] = row
+    return batch
+
+
+# ------------------------------ Sample cache ----------------------------------
+# samples are cached by content, that is by (func name, func params), so waveforms
+# with the same func and params share one read-only numpy array, whatever their
+# names. Samples stay numpy arrays until the qm config builder converts them.
+_samples_cache = dict()  # waveform key: samples
+
+
+def get_waveform_key(func_name: str, func_params: dict) -> tuple:
+    """Hashable content address of the samples of func_name called with func_params."""
+    return (func_name, freeze(func_params))
+
+
+def clear_samples_cache():
+    _samples_cache.clear()
+    _compressed_cache.clear()
+
+
+def freeze(value):
+    """Hashable, comparable snapshot of a parameter value."""
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, np.ndarray):
+        return (value.shape, value.tobytes())
+    return value
+
+
+# ---------------------------- Sample compression ------------------------------
+# the OPX plays arbitrary waveforms stored at a sampling rate below 1 GS/s by
+# interpolating between the stored samples. Smooth envelopes lose nothing that
+# matters when stored at a fraction of the rate, and take a fraction of the
+# waveform memory and config upload time. compress_samples() stores n / k samples,
+# with k a divisor of the number of samples n so the duration is unchanged, for
+# the largest k whose played waveform stays within max_error everywhere.
+# Stored sample i is played at i * k ns, with linear interpolation in between, so
+# the last one is held over the final partial step of k - 1 ns. On the steep
+# edges of truncated envelopes this hold, not the interpolation, limits k.
+DEFAULT_MAX_ERROR = 1e-4  # in V, a few LSBs of the OPX DACs
+MIN_COMPRESSED_SAMPLES = 4  # compressed waveforms keep at least this many samples
+_compressed_cache = dict()  # (waveform key, max error): CompressedSamples
+
+
+class CompressedSamples:
+    """
+    Samples of a waveform stored at 1 / `decimation` of 1 GS/s, played at
+    sampling_rate.
+    """
+
+    def __init__(
+        self, samples: np.ndarray, decimation: int, num_original: int, error: float
+    ):
+        self.samples = samples
+        self.decimation = decimation
+        self.sampling_rate = SAMPLING_RATE / decimation  # in samples per second
+        self.num_original = num_original  # samples at the full 1 GS/s
+        self.error = error  # max abs deviation of the played waveform from the original
+
+    @property
+    def ratio(self) -> float:
+        """Compression ratio, original over stored samples."""
+        return self.num_original / len(self.samples)
+
+    def get_played_samples(self) -> np.ndarray:
+        """The waveform at 1 GS/s that the OPX plays from the stored samples."""
+        return get_played_samples(self.samples, self.decimation, self.num_original)
+
+    def __repr__(self):
+        return (
+            f"CompressedSamples({len(self.samples)} of {self.num_original} samples, "
+            f"ratio {self.ratio:.4g}, sampling rate {self.sampling_rate:.4g}S/s, "
+            f"error {self.error:.3g})"
+        )
+
+
+def get_played_samples(samples, decimation: int, num_samples: int) -> np.ndarray:
+    """
+    The num_samples long waveform at 1 GS/s that the OPX plays from samples stored
+    at 1 / decimation of that rate: sample i at i * decimation ns, linearly
+    interpolated in between, and the last sample held until the end of the pulse.
+    """
+    stored_times = np.arange(len(samples)) * decimation
+    return np.interp(np.arange(num_samples), stored_times, samples)
+
+
+def compress_samples(
+    samples, max_error: float = DEFAULT_MAX_ERROR
+) -> CompressedSamples:
+    """
+    Lowest sampling rate representation of samples, at 1 GS/s, whose played
+    waveform (see get_played_samples()) is within max_error of every sample. Every
+    k-th sample is kept, except the last one, which is held over the final partial
+    step and is set to the middle of the range of the samples there. Returns the
+    samples unchanged if no lower rate is good enough.
+    """
+    samples = np.asarray(samples, dtype=SAMPLE_DTYPE)
+    num_samples = len(samples)
+    compressed = CompressedSamples(samples, 1, num_samples, 0.0)
+    for decimation in _get_divisors(num_samples)[1:]:
+        num_stored = num_samples // decimation
+        if num_stored < MIN_COMPRESSED_SAMPLES:
+            break
+        decimated = samples[::decimation].copy()
+        tail = samples[(num_stored - 1) * decimation :]
+        decimated[-1] = (tail.min() + tail.max()) / 2
+        played = get_played_samples(decimated, decimation, num_samples)
+        error = float(np.max(np.abs(played - samples)))
+        if error <= max_error:  # the largest decimation within bounds wins
+            compressed = CompressedSamples(decimated, decimation, num_samples, error)
+    return compressed
+
+
+def _get_divisors(number: int) -> list:
+    small = [k for k in range(1, int(np.sqrt(number)) + 1) if number % k == 0]
+    return sorted(set(small + [number // k for k in small]))
+
+
 # --------------------------- Waveform classes ---------------------------------
 # pylint: disable=abstract-method
 # TODO validate waveform params (max, min amp etc) against QM accepted range
@@ -62,8 +349,28 @@ class Waveform(Yamlable):
 
         super().__init__(name=name)
 
+    @property
+    def key(self) -> tuple:
+        """Content address of the samples, equal for waveforms with equal samples."""
+        return get_waveform_key(self.func_name, self.func_params)
+
     def get_samples(self):
-        return self.func(**self.func_params)
+        """Cached samples, a read-only numpy array or a float for constant waveforms."""
+        key = self.key
+        if key not in _samples_cache:
+            samples = self.func(**self.func_params)
+            if isinstance(samples, (list, tuple, np.ndarray)):
+                samples = np.asarray(samples, dtype=SAMPLE_DTYPE)
+                samples.flags.writeable = False  # it is shared by all equal waveforms
+            _samples_cache[key] = samples
+        return _samples_cache[key]
+
+    def get_compressed_samples(self, max_error: float = DEFAULT_MAX_ERROR):
+        """Cached compress_samples() of the samples, see CompressedSamples."""
+        key = (self.key, max_error)
+        if key not in _compressed_cache:
+            _compressed_cache[key] = compress_samples(self.get_samples(), max_error)
+        return _compressed_cache[key]
 
 
 class ConstantWaveform(Waveform):
@@ -110,6 +417,95 @@ DEFAULT_GAUSS_WF = ArbitraryWaveform(
     name="gauss_wf", func="gauss_fn", max_amp=0.25, sigma=1000, multiple_of_sigma=4
 )
 
+# ------------------------- Integration weights --------------------------------
+CLOCK_CYCLE = 4  # in ns, integration weights have one value per clock cycle
+
+
+class IntegrationWeights(Yamlable):
+    """
+    Integration weights of a measurement pulse, stored as cosine and sine segments
+    [(value, duration in ns)], the compact form QM accepts. Weights can also be given in
+    the older form of one value per 4ns clock cycle, e.g. optimised weights from a
+    readout calibration. These are compressed into segments by merging runs of values
+    within max_error of each other. Instances are immutable, so segments, key and config
+    are computed once.
+
+    Usage:
+        flat = IntegrationWeights("iw1", cosine=[(1.0, 2000)], sine=[(0.0, 2000)])
+        optimal = IntegrationWeights("optw1", cosine=weights_cos, sine=weights_sin)
+    """
+
+    def __init__(self, name: str, cosine, sine, max_error: float = 0.0):
+        self._cosine = _get_segments(cosine, max_error)
+        self._sine = _get_segments(sine, max_error)
+        self._config = None
+        super().__init__(name=name)
+
+    @property
+    def cosine(self) -> tuple:
+        return self._cosine
+
+    @property
+    def sine(self) -> tuple:
+        return self._sine
+
+    @property
+    def length(self) -> int:
+        """Duration in ns covered by the cosine weights."""
+        return sum(duration for _, duration in self._cosine)
+
+    @property
+    def key(self) -> tuple:
+        """Content address, equal for weights with equal segments."""
+        return (self._cosine, self._sine)
+
+    def get_config(self) -> dict:
+        """QM config entry of the weights, built once and shared, so don't mutate it."""
+        if self._config is None:
+            self._config = {"cosine": list(self._cosine), "sine": list(self._sine)}
+        return self._config
+
+    @classmethod
+    def from_yaml(cls, loader, node):
+        # segments are compressed on construction, so they must be loaded by then
+        return cls(**loader.construct_mapping(node, deep=True))
+
+    def _create_yaml_map(self):
+        return {
+            "name": self.name,
+            "cosine": [list(segment) for segment in self._cosine],
+            "sine": [list(segment) for segment in self._sine],
+        }
+
+
+def _get_segments(weights, max_error: float) -> tuple:
+    """((value, duration), ...) of weights given as segments or one value per cycle."""
+    weights = list(weights)
+    if weights and np.ndim(weights[0]) == 1:  # already segments
+        segments = [(float(value), int(duration)) for value, duration in weights]
+        for _, duration in segments:
+            if duration <= 0 or duration % CLOCK_CYCLE:
+                raise ValueError(
+                    f"Durations must be positive multiples of {CLOCK_CYCLE}ns"
+                )
+    else:
+        segments = [(float(value), CLOCK_CYCLE) for value in weights]
+
+    merged = list()  # [[value, duration, min value, max value]]
+    for value, duration in segments:
+        if (
+            merged
+            and max(merged[-1][3], value) - min(merged[-1][2], value) <= 2 * max_error
+        ):
+            run = merged[-1]
+            run[2], run[3] = min(run[2], value), max(run[3], value)
+            run[0] = (run[2] + run[3]) / 2  # within max_error of every value of the run
+            run[1] += duration
+        else:
+            merged.append([value, duration, value, value])
+    return tuple((value, duration) for value, duration, _, _ in merged)
+
+
 # ----------------------------- Pulse classes ----------------------------------
 # all pulses are control pulses, some are also measurement pulses.
 class Pulse(Yamlable):
@@ -136,36 +532,56 @@ class Pulse(Yamlable):
 class MeasurementPulse(Pulse):
     """
     Encapsulates a measurement pulse.
-    Has a getter method for integration weights, weights are calculated acc to
-    the pulse length.
+    Has a getter method for integration weights, which are IntegrationWeights by
+    name. Default weights are built lazily for the current pulse length and
+    cached until it changes, custom weights such as optimised ones are added
+    with add_integration_weights() and take precedence.
     """
 
+    def __init__(
+        self, name: str, length: int, waveforms: dict, integration_weights: dict = None
+    ):
+        # name: IntegrationWeights, kept by reference like waveforms, as the yaml
+        # loader fills nested mappings after construction
+        self._custom_weights = (
+            dict() if integration_weights is None else integration_weights
+        )
+        self._default_weights = None  # (length, weights by name)
+        super().__init__(name=name, length=length, waveforms=waveforms)
+
+    def add_integration_weights(self, weights: IntegrationWeights):
+        self._custom_weights[weights.name] = weights
+
     @property  # integration weights getter
-    def integration_weights(self):
+    def integration_weights(self) -> dict:
         """
-        Default integration weights for a measurement pulse.
+        Integration weights by name, the default ones followed by the custom ones.
         """
-        # TODO remove hard-coded global 4, and ones and zeros in sine/cosine
-        num_clock_cycles = int(self.length / 4)
-        integration_weights = {
-            "iw1": {
-                "cosine": np.ones(num_clock_cycles),
-                "sine": np.zeros(num_clock_cycles),
-            },
-            "iw2": {
-                "cosine": np.zeros(num_clock_cycles),
-                "sine": np.ones(num_clock_cycles),
-            },
-            "optw1": {
-                "cosine": np.ones(num_clock_cycles),
-                "sine": np.zeros(num_clock_cycles),
-            },
-            "optw2": {
-                "cosine": np.zeros(num_clock_cycles),
-                "sine": np.ones(num_clock_cycles),
-            },
-        }
-        return integration_weights
+        if self._default_weights is None or self._default_weights[0] != self.length:
+            self._default_weights = (self.length, _get_default_weights(self.length))
+        return {**self._default_weights[1], **self._custom_weights}
+
+    def _create_yaml_map(self):
+        yaml_map = super()._create_yaml_map()
+        if self._custom_weights:
+            yaml_map["integration_weights"] = self._custom_weights
+        return yaml_map
+
+
+def _get_default_weights(length: int) -> dict:
+    """Flat weights integrating I (iw1, optw1) and Q (iw2, optw2) over length ns."""
+    # TODO remove hard-coded ones and zeros in sine/cosine
+    duration = CLOCK_CYCLE * int(length / CLOCK_CYCLE)
+    if duration == 0:  # pulses shorter than a clock cycle get empty weights
+        ones = zeros = []
+    else:
+        ones, zeros = [(1.0, duration)], [(0.0, duration)]
+    return {
+        "iw1": IntegrationWeights("iw1", cosine=ones, sine=zeros),
+        "iw2": IntegrationWeights("iw2", cosine=zeros, sine=ones),
+        "optw1": IntegrationWeights("optw1", cosine=ones, sine=zeros),
+        "optw2": IntegrationWeights("optw2", cosine=zeros, sine=ones),
+    }
 
 
 # ------------------------- Archetypical pulses --------------------------------
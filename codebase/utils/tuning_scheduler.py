@@ -0,0 +1,72 @@
+"""Interleaved tuning of several mixer leakages with shared analyser sweeps"""
+
+# leakage tones closer than this are measured in the same sweep. A sweep costs a
+# fixed latency plus time per frequency bin, and at the 50kHz fine rbw a few MHz
+# add ~100 bins to a narrow sweep, far less than a sweep of their own. The LO and
+# image of an element, 2 IF apart, are too far apart to share a sweep.
+DEFAULT_MAX_SPAN = 5e6
+
+
+class TuningScheduler:
+    """
+    Runs several ask/tell tuners, such as ParaboloidTuner, at once. Each tuner
+    minimises the leakage power at one frequency by applying offsets through its
+    apply_fn. Every round, all unfinished tuners apply their next offsets, the leakage
+    frequencies are grouped into windows no wider than max_span, and each window is
+    measured with a single sweep. Sweeps are saved only when leakage tones are close,
+    such as those of mixers on neighbouring LOs, otherwise interleaving just takes the
+    same sweeps in a different order.
+
+    Usage:
+        scheduler = TuningScheduler(sa, rbw=50e3)
+        scheduler.add("qubit LO", tuner, qubit.lo_freq, apply_qubit_dc_offsets)
+        results = scheduler.run()  # name: (offsets, power in dBm)
+    """
+
+    def __init__(self, sa, rbw: float, max_span: float = DEFAULT_MAX_SPAN):
+        self.sa = sa  # Sa124
+        self.rbw = rbw
+        self.max_span = max_span
+        self.num_sweeps = 0  # sweeps taken by run(), one per window per round
+        self.num_rounds = 0
+        self._jobs = {}  # name: (tuner, freq, apply_fn)
+
+    def add(self, name: str, tuner, freq: float, apply_fn):
+        """Schedules tuner to minimise the power at freq, apply_fn applies offsets."""
+        if name in self._jobs:
+            raise ValueError(f"A tuner named '{name}' is already scheduled")
+        self._jobs[name] = (tuner, freq, apply_fn)
+
+    def get_windows(self, names: list) -> list:
+        """Groups the named jobs into lists whose frequencies span at most max_span."""
+        names = sorted(names, key=lambda name: self._jobs[name][1])
+        windows = []
+        for name in names:
+            freq = self._jobs[name][1]
+            if windows and freq - self._jobs[windows[-1][0]][1] <= self.max_span:
+                windows[-1].append(name)
+            else:
+                windows.append([name])
+        return windows
+
+    def run(self) -> dict:
+        """Runs all tuners to completion, returns name: (offsets, power in dBm)."""
+        active = [name for name, (tuner, *_) in self._jobs.items() if not tuner.is_done]
+        while active:
+            offsets = {}
+            for name in active:
+                tuner, _, apply_fn = self._jobs[name]
+                offsets[name] = tuner.ask()
+                apply_fn(offsets[name])
+
+            for window in self.get_windows(active):
+                freqs = [self._jobs[name][1] for name in window]
+                powers = self.sa.powers_at(freqs, self.rbw)
+                self.num_sweeps += 1
+                for name, power in zip(window, powers):
+                    self._jobs[name][0].tell(offsets[name], power)
+
+            self.num_rounds += 1
+            active = [name for name in active if not self._jobs[name][0].is_done]
+
+        return {name: tuner.best for name, (tuner, *_) in self._jobs.items()}
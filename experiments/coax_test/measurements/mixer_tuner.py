@@ -1,6 +1,10 @@
-""" Run this script as-is. It prints results to stdout"""
+"""Run this script as-is. It prints results to stdout"""
+
 """ Please copy-paste the offsets into the config file in the appropriate place """
 """ So that the OPX can apply them the next time you run a measurement """
+import functools
+import os
+from pathlib import Path
 import time
 
 import matplotlib.pyplot as plt
@@ -9,15 +13,41 @@ from qm.qua import infinite_loop_, play, program
 from scipy.optimize import minimize
 
 from qcrew.codebase.instruments import MetaInstrument, QuantumElement, Sa124
+from qcrew.codebase.utils.mixer_calibration_store import MixerCalibrationStore
+from qcrew.codebase.utils.mixer_correction_table import (
+    get_correction_matrix,
+    get_table_offsets,
+)
+from qcrew.codebase.utils.paraboloid_tuner import ParaboloidTuner
+from qcrew.codebase.utils.plotter import plot_envelope
+from qcrew.codebase.utils.tuning_scheduler import DEFAULT_MAX_SPAN, TuningScheduler
 from qcrew.experiments.coax_test.imports.stage import qubit, rr, qm, lb_qubit, lb_rr
 
 DEFAULT_NAME = "mixer_tuner"
 
+# tuning results are kept here, relative to the working directory, and reused while
+# they still hold. Set the QCREW_MIXER_CALIBRATION_DB environment variable to keep
+# them elsewhere.
+CALIBRATION_DB_ENV_VAR = "QCREW_MIXER_CALIBRATION_DB"
+DEFAULT_CALIBRATION_DB_PATH = Path("data") / "mixer_calibrations.db"
+LO, SB = "LO", "SB"  # kinds of leakage in the calibration store
+
+# a cached calibration is reused if its leakage has not risen by more than this
+DEFAULT_DRIFT_TOLERANCE = 3  # in dB
+
 # default minimization parameters
 # these will be used only if initial guesses from prior tuning are not available
 
-# Nelder-Mead works well in our case, so let's not to change it unless necessary
-DEFAULT_METHOD = "Nelder-Mead"
+# "paraboloid" fits the leakage bowl and jumps to its minimum, it needs ~10 sweeps
+# instead of ~50 for Nelder-Mead, which is still available as a fallback. Retuning
+# a drifted calibration reuses the stored bowl curvature and needs ~4 sweeps.
+PARABOLOID = "paraboloid"
+DEFAULT_METHOD = PARABOLOID
+
+# distance of the paraboloid tuner probe points from the initial guess
+# the image leakage bowl is only quadratic close to its minimum, so probe closer
+DEFAULT_SCALE_LO = 0.1
+DEFAULT_SCALE_SB = 0.05
 
 # initial simplex guess
 # the guesses below have been informed by the offset bounds and scans of the
@@ -44,40 +74,42 @@ COARSE_SWEEP_SPAN_SCALAR = 4
 FINE_SWEEP_RBW = 50e3
 FINE_SWEEP_SPAN_SCALAR = 1e-3
 
-# get qua program to run
+
+def get_calibration_db_path() -> Path:
+    """
+    Path of the calibration store, resolved when it is opened rather than on import,
+    so that it follows changes of the working directory and environment.
+    """
+    path = os.environ.get(CALIBRATION_DB_ENV_VAR)
+    return Path(path) if path else Path.cwd() / DEFAULT_CALIBRATION_DB_PATH
+
+
+# get qua program to run, elements play in parallel
 # assume element has pulse 'CW' defined - pls change this in the future
-def get_qua_program(element: QuantumElement):
+def get_qua_program(*elements: QuantumElement):
     with program() as qua_program:
         with infinite_loop_():
-            play("CW", element.name)  # TODO remove hard coding
+            for element in elements:
+                play("CW", element.name)  # TODO remove hard coding
     return qua_program
 
 
-# this fn must be a property of OPX
-def mixer_correction(gain_offset, phase_offset):
-    # returns mixer correction matrix from gain and phase imbalances
-    cos = np.cos(phase_offset)
-    sin = np.sin(phase_offset)
-    coeff = 1 / ((1 - gain_offset ** 2) * (2 * cos ** 2 - 1))
-    return [
-        float(coeff * x)
-        for x in [
-            (1 - gain_offset) * cos,
-            (1 + gain_offset) * sin,
-            (1 - gain_offset) * sin,
-            (1 + gain_offset) * cos,
-        ]
-    ]
-
-
 class MixerTuner(MetaInstrument):
     """
     TODO write proper docu
     """
 
-    def __init__(self, sa: Sa124, qm, name: str = DEFAULT_NAME, **parameters):
+    def __init__(
+        self,
+        sa: Sa124,
+        qm,
+        name: str = DEFAULT_NAME,
+        store: MixerCalibrationStore = None,
+        **parameters,
+    ):
         self.sa = sa
         self.qm = qm
+        self.store = store  # optional, tuning always starts from scratch without it
         super().__init__(name, **parameters)
 
     # public methods
@@ -90,7 +122,185 @@ class MixerTuner(MetaInstrument):
     def tune_sb(self, *elements):
         self._tune(*elements, is_tune_lo=False, is_tune_sb=True)
 
+    def tune_parallel(self, *elements):
+        """
+        Tunes the LO and SB leakage of all elements at once with the paraboloid tuner.
+        The elements play in one QUA program, and a TuningScheduler interleaves their
+        tuners, measuring leakage tones that are close together in one sweep.
+        """
+        elements = [elem for elem in elements if isinstance(elem, QuantumElement)]
+        if not elements:
+            print("ERROR: no elements passed, what are you even tuning?")
+            return
+
+        job = self.qm.execute(get_qua_program(*elements))  # play int freq to all
+        max_span = getattr(self, "max_span", DEFAULT_MAX_SPAN)
+        scheduler = TuningScheduler(self.sa, FINE_SWEEP_RBW, max_span)
+        xatol = getattr(self, "xatol", DEFAULT_XATOL)
+        fatol = getattr(self, "fatol", DEFAULT_FATOL)
+        init_simplex_lo = getattr(self, "init_simplex_lo", DEFAULT_INIT_SIMPLEX_LO)
+        init_simplex_sb = getattr(self, "init_simplex_sb", DEFAULT_INIT_SIMPLEX_SB)
+        scale_lo = getattr(self, "scale_lo", DEFAULT_SCALE_LO)
+        scale_sb = getattr(self, "scale_sb", DEFAULT_SCALE_SB)
+
+        results = {}  # "element kind": (offsets, amp)
+        tuners = {}  # "element kind": ParaboloidTuner
+        for element in elements:
+            print("Coarse sweep before tuning {} mixer...".format(element.name))
+            self._get_coarse_sweep(element)
+            sb_freq = element.lo_freq - element.int_freq
+            apply_lo, apply_sb = self._apply_lo_offsets, self._apply_sb_offsets
+            for kind, freq, apply_fn, init_simplex, scale in (
+                (LO, element.lo_freq, apply_lo, init_simplex_lo, scale_lo),
+                (SB, sb_freq, apply_sb, init_simplex_sb, scale_sb),
+            ):
+                cached, is_tuned = self._verify_cached(element, kind, freq, apply_fn)
+                if is_tuned:
+                    results[element.name + " " + kind] = cached
+                    continue
+                # the fine sweep floor lets the tuner stop once leakage is buried
+                floor = np.mean(self._get_fine_sweep(freq)[1])
+                x0, hessian = init_simplex[0], None
+                if cached is not None:  # a drifted calibration is still the best guess
+                    x0 = cached[0]
+                    hessian, floor = self._get_warm_start(element, kind, floor)
+                tuner = ParaboloidTuner(
+                    x0, scale, floor=floor, xatol=xatol, ftol=fatol, hessian=hessian
+                )
+                if cached is not None:  # the drift check already measured x0
+                    tuner.tell(*cached)
+                apply_to_element = functools.partial(apply_fn, element)
+                tuners[element.name + " " + kind] = tuner
+                scheduler.add(element.name + " " + kind, tuner, freq, apply_to_element)
+
+        tuned = scheduler.run()
+        print(
+            "Tuned {} leakages in {} rounds of {} sweeps in total".format(
+                len(tuned), scheduler.num_rounds, scheduler.num_sweeps
+            )
+        )
+        results.update(tuned)
+
+        for element in elements:
+            for kind in (LO, SB):
+                name = element.name + " " + kind
+                if name in tuned:
+                    offsets, amp = tuned[name]
+                    hessian = tuners[name].hessian
+                    self._save_calibration(element, kind, offsets, amp, hessian)
+            lo_offsets, lo_amp = results[element.name + " " + LO]
+            sb_offsets, sb_amp = results[element.name + " " + SB]
+            print("{} LO: {:.5}dB, SB: {:.5}dB".format(element.name, lo_amp, sb_amp))
+            self._apply_lo_offsets(element, lo_offsets)
+            self._apply_sb_offsets(element, sb_offsets)
+            element.mixer.i_offset, element.mixer.q_offset = lo_offsets
+            element.mixer.gain_offset, element.mixer.phase_offset = sb_offsets
+            print("Coarse sweep after tuning {} mixer...".format(element.name))
+            self._get_coarse_sweep(element)
+
+        job.halt()
+
+    def tune_sb_sweep(self, element: QuantumElement, int_freqs):
+        """
+        Tunes the SB leakage of the element at each IF in int_freqs and sets the results
+        as the correction_table of its mixer, from which qm_config_builder builds one
+        mixer correction per IF. Each IF is tuned as in tune_sb(), so with a store, IFs
+        tuned before that have not drifted cost one measurement, and the others start
+        from the calibrations at neighbouring IFs. Returns the table.
+        """
+        if not isinstance(element, QuantumElement):
+            print("ERROR: element must be QuantumElement...")
+            return
+
+        int_freq = element.int_freq
+        job = self.qm.execute(get_qua_program(element))  # play int freq to element
+        table = []  # [int_freq, gain_offset, phase_offset] rows
+        for freq in sorted(int_freqs):
+            element.int_freq = freq
+            self.qm.set_intermediate_frequency(element.name, freq)
+            print(f"Tuning {element.name} SB leakage at IF {freq / 1e6:.5}MHz...")
+            self._tune_sb(element)
+            mixer = element.mixer
+            gain_offset, phase_offset = mixer.gain_offset, mixer.phase_offset
+            table.append([int(freq), float(gain_offset), float(phase_offset)])
+        element.int_freq = int_freq
+        self.qm.set_intermediate_frequency(element.name, int_freq)
+        job.halt()
+
+        if hasattr(element.mixer, "correction_table"):
+            element.mixer.correction_table = table
+        else:
+            element.mixer.add_parameter("correction_table", table)
+        # offsets at the element's own IF, in case it is not one of the tuned IFs
+        gain_offset, phase_offset = get_table_offsets(table, int_freq)
+        element.mixer.gain_offset = gain_offset
+        element.mixer.phase_offset = phase_offset
+        return table
+
     # internal methods
+    def _verify_cached(self, element: QuantumElement, kind: str, freq: float, apply_fn):
+        """
+        Looks up the stored calibration of this kind for the element, applies it and
+        measures the leakage at freq once. Returns ((offsets, amp), is_tuned), with
+        is_tuned True if the leakage is within the drift tolerance of what it was at
+        calibration time, or (None, False) if there is no stored calibration.
+        """
+        if self.store is None:
+            return None, False
+        lo_power = getattr(element, "lo_power", None)
+        cached = self.store.lookup(
+            element.name, kind, element.lo_freq, element.int_freq, lo_power
+        )
+        if cached is None:
+            return None, False
+
+        offsets, calibrated_amp = cached
+        apply_fn(element, offsets)
+        amp = self.sa.power_at(freq, FINE_SWEEP_RBW)
+        drift_tolerance = getattr(self, "drift_tolerance", DEFAULT_DRIFT_TOLERANCE)
+        is_tuned = amp <= calibrated_amp + drift_tolerance
+        print(
+            "Cached {} {} calibration: {:.5}dB, was {:.5}dB, {}".format(
+                element.name, kind, amp, calibrated_amp,
+                "reusing it" if is_tuned else "retuning",
+            )
+        )  # fmt: skip
+        return (offsets, amp), is_tuned
+
+    def _get_warm_start(self, element: QuantumElement, kind: str, floor: float):
+        """
+        Returns the leakage bowl curvature stored with the nearest calibration, or
+        None, and the floor to tune down to. A drifted calibration is retuned until
+        its leakage is back within fatol of what it was, not of the noise floor.
+        """
+        lo_power = getattr(element, "lo_power", None)
+        point = (element.name, kind, element.lo_freq, element.int_freq, lo_power)
+        _, calibrated_amp = self.store.lookup(*point)
+        return self.store.lookup_hessian(*point), max(floor, calibrated_amp)
+
+    def _save_calibration(
+        self, element: QuantumElement, kind: str, offsets, amp, hessian=None
+    ):
+        if self.store is None:
+            return
+        lo_power = getattr(element, "lo_power", None)
+        self.store.save(
+            element.name, kind, element.lo_freq, element.int_freq, lo_power,
+            offsets, amp, hessian,
+        )  # fmt: skip
+
+    def _apply_lo_offsets(self, element: QuantumElement, offsets):
+        self.qm.set_output_dc_offset_by_element(element.name, "I", offsets[0])
+        self.qm.set_output_dc_offset_by_element(element.name, "Q", offsets[1])
+
+    def _apply_sb_offsets(self, element: QuantumElement, offsets):
+        self.qm.set_mixer_correction(
+            element.mixer.name,  # assume element has only 1 mixer
+            int(element.int_freq),
+            int(element.lo_freq),
+            get_correction_matrix(offsets[0], offsets[1]),
+        )
+
     def _tune(self, *elements, is_tune_lo: bool, is_tune_sb: bool):
         if not elements:
             print("ERROR: no elements passed, what are you even tuning?")
@@ -119,6 +329,14 @@ class MixerTuner(MetaInstrument):
     def _tune_lo(self, element: QuantumElement):
         # int freq is alr playing to element
 
+        # a stored calibration that still holds saves the fine sweep and minimization
+        cached, is_tuned = self._verify_cached(
+            element, LO, element.lo_freq, self._apply_lo_offsets
+        )
+        if is_tuned:
+            element.mixer.i_offset, element.mixer.q_offset = cached[0]
+            return
+
         # get and show fine sweep
         # this also configures the SA for minimization (desired side effect)
         print("Zooming in to {} LO leakage...".format(element.name))
@@ -134,55 +352,70 @@ class MixerTuner(MetaInstrument):
         print("amp: {:.5}dB, contrast: {:.5}dB".format(init_amp, init_contrast))
         print()  # spacer
 
-        is_tuned = False  # temp hotfix
-        # is_tuned = abs(init_contrast) < abs(stdev)
-
         objective_fn = self._get_lo_callback_fn(element)
-
-        if is_tuned:
-            # already tuned, apply current offsets, show coarse sweep, exit
-            # print("Already tuned! Applying offsets...")
-            offsets = [element.mixer.i_offset, element.mixer.q_offset]
-            objective_fn(offsets, floor)
-        else:
-            # use default guesses if none available as attributes
-            init_simplex = getattr(self, "init_simplex_lo", DEFAULT_INIT_SIMPLEX_LO)
-            # perform minimization
-            results = self._minimize(element, objective_fn, init_simplex, floor)
-            # save results
-            element.mixer.i_offset = results[0]
-            element.mixer.q_offset = results[1]
-
-    def _get_lo_callback_fn(self, element: QuantumElement):
-        elem_name = element.name
+        power_fn = self._get_lo_power_fn(element)
+
+        # use default guesses if none available as attributes
+        init_simplex = getattr(self, "init_simplex_lo", DEFAULT_INIT_SIMPLEX_LO)
+        init_simplex = np.asarray(init_simplex, dtype=float)
+        warm_start = None
+        if cached is not None:  # a drifted calibration is still the best guess
+            init_simplex = init_simplex - init_simplex[0] + cached[0]
+            warm_start = self._get_warm_start(element, LO, floor)
+        scale = getattr(self, "scale_lo", DEFAULT_SCALE_LO)
+        # perform minimization
+        results, hessian = self._minimize(
+            element, objective_fn, power_fn, init_simplex, floor, scale,
+            cached, warm_start,
+        )  # fmt: skip
+        # save results
+        element.mixer.i_offset = results[0]
+        element.mixer.q_offset = results[1]
+        amp = self.sa.power_at(element.lo_freq, FINE_SWEEP_RBW)
+        self._save_calibration(element, LO, results, amp, hessian)
+
+    def _get_lo_power_fn(self, element: QuantumElement):
         lo_freq = element.lo_freq
 
-        def objective_fn(offsets, *args):
-            floor = args[0]
-            self.qm.set_output_dc_offset_by_element(elem_name, "I", offsets[0])
-            self.qm.set_output_dc_offset_by_element(elem_name, "Q", offsets[1])
-            freqs, amps = self.sa.sweep()  # guaranteed to be configured properly
-            # guaranteed that sa output is sorted
-            amp_at_lo_freq = amps[np.searchsorted(freqs, lo_freq)]
-            contrast = abs(amp_at_lo_freq - floor)
+        def power_fn(offsets):
+            self._apply_lo_offsets(element, offsets)
+            # narrow sweep at the fine sweep rbw so it compares with the floor
+            amp_at_lo_freq = self.sa.power_at(lo_freq, FINE_SWEEP_RBW)
             # print string for debugging
             print(
-                "I: {:.5}, Q: {:.5}, contrast: {:.5}".format(
-                    offsets[0], offsets[1], contrast
+                "I: {:.5}, Q: {:.5}, amp: {:.5}dB".format(
+                    offsets[0], offsets[1], amp_at_lo_freq
                 )
             )
-            return contrast
+            return amp_at_lo_freq
+
+        return power_fn
+
+    def _get_lo_callback_fn(self, element: QuantumElement):
+        power_fn = self._get_lo_power_fn(element)
+
+        def objective_fn(offsets, *args):
+            floor = args[0]
+            return abs(power_fn(offsets) - floor)  # contrast
 
         return objective_fn
 
     def _tune_sb(self, element: QuantumElement):
         # int freq is alr playing to element
+        # int_freq is the sideband we want to keep, we want to remove sb_freq
+        sb_freq = element.lo_freq - element.int_freq
+
+        # a stored calibration that still holds saves the fine sweep and minimization
+        cached, is_tuned = self._verify_cached(
+            element, SB, sb_freq, self._apply_sb_offsets
+        )
+        if is_tuned:
+            element.mixer.gain_offset, element.mixer.phase_offset = cached[0]
+            return
 
         # get and show fine sweep
         # this also configures the SA for minimization (desired side effect)
         print("Zooming in to {} SB leakage...".format(element.name))
-        # int_freq is the sideband we want to keep, we want to remove sb_freq
-        sb_freq = element.lo_freq - element.int_freq
         freqs, amps = self._get_fine_sweep(sb_freq)
 
         # find signal floor and stdev from fine sweep
@@ -194,53 +427,73 @@ class MixerTuner(MetaInstrument):
         init_contrast = init_amp - floor
         print("amp: {:.5}dB, contrast: {:.5}dB".format(init_amp, init_contrast))
         print()  # spacer
-        # is_tuned = abs(init_contrast) < abs(stdev)
-        is_tuned = False  # temp hotfix
 
         objective_fn = self._get_sb_callback_fn(element)
-
-        if is_tuned:
-            # already tuned, apply current offsets, show coarse sweep, exit
-            # print("Already tuned! Applying offsets...")
-            offsets = [element.mixer.gain_offset, element.mixer.phase_offset]
-            objective_fn(offsets, floor)
-        else:
-            # use default guesses if none available as attributes
-            init_simplex = getattr(self, "init_simplex_sb", DEFAULT_INIT_SIMPLEX_SB)
-            # perform minimization
-            results = self._minimize(element, objective_fn, init_simplex, floor)
-            # save results
-            element.mixer.gain_offset = results[0]
-            element.mixer.phase_offset = results[1]
-
-    def _get_sb_callback_fn(self, element: QuantumElement):
-        mixer_name = element.mixer.name  # assume element has only 1 mixer
+        power_fn = self._get_sb_power_fn(element)
+
+        # use default guesses if none available as attributes
+        init_simplex = getattr(self, "init_simplex_sb", DEFAULT_INIT_SIMPLEX_SB)
+        init_simplex = np.asarray(init_simplex, dtype=float)
+        warm_start = None
+        if cached is not None:  # a drifted calibration is still the best guess
+            init_simplex = init_simplex - init_simplex[0] + cached[0]
+            warm_start = self._get_warm_start(element, SB, floor)
+        scale = getattr(self, "scale_sb", DEFAULT_SCALE_SB)
+        # perform minimization
+        results, hessian = self._minimize(
+            element, objective_fn, power_fn, init_simplex, floor, scale,
+            cached, warm_start,
+        )  # fmt: skip
+        # save results
+        element.mixer.gain_offset = results[0]
+        element.mixer.phase_offset = results[1]
+        amp = self.sa.power_at(sb_freq, FINE_SWEEP_RBW)
+        self._save_calibration(element, SB, results, amp, hessian)
+
+    def _get_sb_power_fn(self, element: QuantumElement):
         sb_freq = element.lo_freq - element.int_freq
 
-        def objective_fn(offsets, *args):
-            floor = args[0]
-            self.qm.set_mixer_correction(
-                mixer_name,
-                int(element.int_freq),
-                int(element.lo_freq),
-                mixer_correction(offsets[0], offsets[1]),
-            )
-            freqs, amps = self.sa.sweep()  # guaranteed to be configured properly
-            # guaranteed that sa output is sorted
-            amp_at_sb_freq = amps[np.searchsorted(freqs, sb_freq)]
-            contrast = abs(amp_at_sb_freq - floor)
+        def power_fn(offsets):
+            self._apply_sb_offsets(element, offsets)
+            # narrow sweep at the fine sweep rbw so it compares with the floor
+            amp_at_sb_freq = self.sa.power_at(sb_freq, FINE_SWEEP_RBW)
 
             # print string for debugging
             print(
-                "G: {:.5}, P: {:.5}, contrast: {:.5}".format(
-                    offsets[0], offsets[1], contrast
+                "G: {:.5}, P: {:.5}, amp: {:.5}dB".format(
+                    offsets[0], offsets[1], amp_at_sb_freq
                 )
             )
-            return contrast
+            return amp_at_sb_freq
+
+        return power_fn
+
+    def _get_sb_callback_fn(self, element: QuantumElement):
+        power_fn = self._get_sb_power_fn(element)
+
+        def objective_fn(offsets, *args):
+            floor = args[0]
+            return abs(power_fn(offsets) - floor)  # contrast
 
         return objective_fn
 
-    def _minimize(self, element, objective_fn, init_simplex, floor):
+    def _minimize(
+        self,
+        element,
+        objective_fn,
+        power_fn,
+        init_simplex,
+        floor,
+        scale,
+        cached=None,
+        warm_start=None,
+    ):
+        """
+        Minimizes the leakage from init_simplex, returns (offsets, hessian of the
+        leakage bowl in mW or None). cached is the (offsets, amp) measured by the
+        drift check at init_simplex[0], if any, and warm_start the (hessian, floor)
+        the paraboloid tuner retunes it with.
+        """
         # start_time = time.perf_counter()
         # print("Performing minimization...")
 
@@ -256,6 +509,17 @@ class MixerTuner(MetaInstrument):
         #    )
         # )
 
+        if method == PARABOLOID:
+            hessian = None
+            if warm_start is not None:
+                hessian, floor = warm_start
+            results, hessian = self._minimize_paraboloid(
+                power_fn, init_simplex[0], floor, scale, xatol, fatol, cached, hessian
+            )
+            print("Coarse sweep after tuning {} mixer...".format(element.name))
+            self._get_coarse_sweep(element)
+            return results, hessian
+
         # perform minimization and give results, time it, plot final sweep
         # call scipy optimize minimize fn with nelder-mead method
         result = minimize(
@@ -293,12 +557,29 @@ class MixerTuner(MetaInstrument):
         print("Coarse sweep after tuning {} mixer...".format(element.name))
         self._get_coarse_sweep(element)
 
-        return results
+        return results, None
+
+    def _minimize_paraboloid(
+        self, power_fn, x0, floor, scale, xatol, fatol, cached=None, hessian=None
+    ):
+        # the tuner fits the raw leakage power, which must not be folded at the floor
+        tuner = ParaboloidTuner(
+            x0, scale, floor=floor, xatol=xatol, ftol=fatol, hessian=hessian
+        )
+        if cached is not None:  # the drift check already measured x0
+            tuner.tell(*cached)
+        while not tuner.is_done:
+            offsets = tuner.ask()
+            tuner.tell(offsets, power_fn(offsets))
+        results, amp = tuner.best
+        print("Tuned to {:.5}dB in {} measurements".format(amp, tuner.num_measurements))
+        power_fn(results)  # apply the offsets
+        return results, tuner.hessian
 
     def _get_sweep(self, **parameters):
         # start_time = time.perf_counter()
         freqs, amps = self.sa.sweep(**parameters)
-        plt.plot(freqs, amps)
+        plot_envelope(plt.gca(), freqs, amps)  # keeps the LO and sideband peaks
         plt.show()
         # elapsed_time = time.perf_counter() - start_time
         # print("Sweep took {:.5}s".format(elapsed_time))
@@ -330,14 +611,17 @@ if __name__ == "__main__":
     sa = Sa124(name="sa", serial_number=19184645)
     lb_qubit.frequency = qubit.lo_freq
     lb_rr.frequency = rr.lo_freq
-    mixer_tuner = MixerTuner(sa=sa, qm=qm)
+    # calibrations are stored per LO power, elements carry the power of their LO
+    qubit.add_parameter("lo_power", lb_qubit.power)
+    rr.add_parameter("lo_power", lb_rr.power)
+    store = MixerCalibrationStore(get_calibration_db_path())
+    mixer_tuner = MixerTuner(sa=sa, qm=qm, store=store)
 
     print("\n" * 30)
     print("Mixer Tuner is running, please wait for about 30s...")
     start_time = time.perf_counter()
 
-    mixer_tuner.tune(qubit)
-    mixer_tuner.tune(rr)
+    mixer_tuner.tune_parallel(qubit, rr)
 
     print("\n" * 3)
 
@@ -365,4 +649,5 @@ if __name__ == "__main__":
     print("Please copy paste these results in the QM config!")
     print("\n" * 20)
 
+    store.close()
     sa.disconnect()
@@ -58,9 +58,10 @@ fft_freqs = np.arange(0, 0.5, 1 / pulse_len)[:] * SAMPLING_RATE
 fft_amps = results_fft[: int(np.ceil(pulse_len / 2))]
 
 f, (ax1, ax2) = plt.subplots(1, 2, figsize=(13, 5))
-ax1.plot(results / ADC_RESOLUTION)
+# long traces are drawn through a min/max envelope that is recomputed on zoom
+plot_envelope(ax1, np.arange(len(results)), results / ADC_RESOLUTION)
 # NOTE: The FFT plot ignores the DC offset
-ax2.plot(fft_freqs[5:] / 1e6, fft_amps[5:])
+plot_envelope(ax2, fft_freqs[5:] / 1e6, fft_amps[5:])
 
 ########################################################################################
 ############################           SAVE RESULTS         ############################
@@ -8,33 +8,24 @@ BASE_AMP = 0.2
 ########################################################################################
 import numpy as np
 
+from qcrew.codebase.utils.mixer_correction_table import get_correction_matrix
+from qcrew.codebase.utils.pulselib import drag_fn, gauss_fn
 
-def gaussian_fn(maximum: float, sigma: float, multiple_of_sigma: int) -> np.ndarray:
-    length = int(multiple_of_sigma * sigma)
-    mu = int(np.floor(length / 2))
-    t = np.linspace(0, length - 1, length)
-    gaussian = maximum * np.exp(-((t - mu) ** 2) / (2 * sigma ** 2))
-    return [float(x) for x in gaussian]
+# thin wrappers around the pulselib generators, kept for the scripts that call them
+
+
+def gaussian_fn(maximum: float, sigma: float, multiple_of_sigma: int) -> list[float]:
+    return gauss_fn(maximum, sigma, multiple_of_sigma).tolist()
 
 
 def gaussian_derivative_fn(
     gauss_A: float, drag: float, sigma: float, multiple_of_sigma: int
 ) -> np.ndarray:
-    length = int(multiple_of_sigma * sigma)
-    mu = int(np.floor(length / 2))
-    t = np.linspace(0, length - 1, length)
-    gaussian = gauss_A * np.exp(-((t - mu) ** 2) / (2 * sigma ** 2))
-    gaussian_derivative = drag * gaussian * (t - mu) / (sigma ** 2)
-    return gaussian_derivative
-
-
-def IQ_imbalance(gain: float, phase: float):
-    cos = np.cos(phase)
-    sin = np.sin(phase)
-    coeff = 1 / ((1 - gain ** 2) * (2 * cos ** 2 - 1))
-    matrix = [(1 - gain) * cos, (1 + gain) * sin, (1 - gain) * sin, (1 + gain) * cos]
-    correction_matrix = [float(coeff * x) for x in matrix]
-    return correction_matrix
+    return drag_fn(gauss_A, sigma, multiple_of_sigma, drag).astype(float)
+
+
+def IQ_imbalance(gain: float, phase: float) -> list[float]:
+    return get_correction_matrix(gain, phase)
 
 
 def get_gaussian_waveforms(ampx: float, drag: float, sigma: float, chop: int):